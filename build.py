@@ -9,18 +9,19 @@ if __name__ == '__main__':
         # Try to detect the script file name
         app_name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'build.py'
 
+    # Forward the command to a running daemon, unless it manages the daemon itself
+    if sys.argv[1:2] != ['daemon'] and os.environ.get(config.pybite.daemon.DAEMON_ENV, '1') != '0':
+        exit_code = config.pybite.daemon.run_client(config.pybite.Host.get_daemon_socket_path(), sys.argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
     host = config.pybite.Host(
         app=app_name,
         description='Bite build engine command line interface',
     )
 
     host.load_modules()
-    args, unknown = host.get_argparser().parse_known_args()
-
-    if host.requested_sdk is not None:
-        print(f'Installing .NET SDK {host.requested_sdk}')
-        host._install_sdk()
+    host.execute()
 
-    host.dispatch(args, unknown)
-    
-    config.pybite.download.cleanup_temp_folders()
+    if config.pybite.is_loaded('download'):
+        config.pybite.download.cleanup_temp_folders()
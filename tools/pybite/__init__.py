@@ -1,6 +1,49 @@
-from .host import Host
-from .global_json import GlobalJson
-from .msbuild import MSBuildFile
-from .download import create_temp_folder, cleanup_temp_folders, download_folder, download_file
-from .module import Module
+import importlib
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List
 
+# Submodules and their public names are imported on first attribute access,
+# so commands that never download or parse MSBuild files don't pay for them.
+_SUBMODULES: List[str] = ['host', 'global_json', 'msbuild', 'download', 'module', 'handlers', 'sdk', 'incremental', 'solution', 'scheduler', 'daemon', 'watch', 'process', 'perf', 'history', 'shard', 'results']
+
+_EXPORTS: Dict[str, str] = {
+    'Host': 'host',
+    'GlobalJson': 'global_json',
+    'MSBuildFile': 'msbuild',
+    'create_temp_folder': 'download',
+    'cleanup_temp_folders': 'download',
+    'download_folder': 'download',
+    'download_file': 'download',
+    'Module': 'module',
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .host import Host
+    from .global_json import GlobalJson
+    from .msbuild import MSBuildFile
+    from .download import create_temp_folder, cleanup_temp_folders, download_folder, download_file
+    from .module import Module
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
+
+
+def is_loaded(name: str) -> bool:
+    """
+    Return True if the given pybite submodule has already been imported.
+    """
+    return f'{__name__}.{name}' in sys.modules
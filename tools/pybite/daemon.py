@@ -0,0 +1,510 @@
+import os
+import struct
+import sys
+import time
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Callable
+
+if TYPE_CHECKING:
+    import socket
+    from .host import Host
+
+# json and socket are imported in the functions that need them, build.py imports this
+# module on every invocation to find out whether a daemon is running.
+
+DAEMON_ENV = 'PYBITE_DAEMON'
+"""Environment variable that disables forwarding commands to a running daemon when set to '0'."""
+
+_HEADER = struct.Struct('>I')
+
+
+def is_supported() -> bool:
+    """
+    Return True if the daemon can be used on this platform.
+    The daemon passes file descriptors over a Unix domain socket and forks a child per command.
+    """
+    import socket
+
+    return os.name == 'posix' and hasattr(socket, 'AF_UNIX') and hasattr(socket, 'send_fds')
+
+
+def get_socket_path(cache_dir: str) -> str:
+    """
+    Get the path of the daemon socket for a cache directory.
+    Unix socket paths are limited to about 100 characters, longer paths are replaced by a
+    path in the temporary directory derived from the cache directory.
+    """
+    path = os.path.join(cache_dir, 'daemon.sock')
+    if len(path.encode()) < 100:
+        return path
+    import hashlib
+    import tempfile
+    digest = hashlib.sha256(os.path.abspath(cache_dir).encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f'pybite-{digest}.sock')
+
+
+def _send(sock: "socket.socket", message: Dict[str, Any], fds: Optional[List[int]] = None) -> None:
+    import json
+    import socket
+
+    data = json.dumps(message).encode('utf-8')
+    packet = _HEADER.pack(len(data)) + data
+    if fds:
+        sent = socket.send_fds(sock, [packet], fds)
+        packet = packet[sent:]
+    if packet:
+        sock.sendall(packet)
+
+
+def _recv(sock: "socket.socket", max_fds: int = 0) -> Optional[tuple]:
+    import json
+    import socket
+
+    fds: List[int] = []
+    if max_fds:
+        data, fds, _, _ = socket.recv_fds(sock, 65536, max_fds)
+    else:
+        data = sock.recv(65536)
+    if not data:
+        return None
+    while len(data) < _HEADER.size or len(data) < _HEADER.size + _HEADER.unpack_from(data)[0]:
+        chunk = sock.recv(65536)
+        if not chunk:
+            for fd in fds:
+                os.close(fd)
+            return None
+        data += chunk
+    size = _HEADER.unpack_from(data)[0]
+    return json.loads(data[_HEADER.size:_HEADER.size + size].decode('utf-8')), list(fds)
+
+
+def _reply(sock: "socket.socket", message: Dict[str, Any]) -> None:
+    import json
+
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def _connect(socket_path: str, timeout: Optional[float] = None) -> Optional["socket.socket"]:
+    # Checking for the socket first avoids importing socket when no daemon is running
+    if not os.path.exists(socket_path) or not is_supported():
+        return None
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(socket_path: str, command: str, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
+    """
+    Send a control command ('status' or 'stop') to the daemon.
+
+    Args:
+        socket_path: Path to the daemon socket.
+        command: The control command.
+        timeout: Timeout in seconds.
+
+    Returns:
+        Optional[Dict[str, Any]]: The reply of the daemon, or None if no daemon is listening.
+    """
+    sock = _connect(socket_path, timeout)
+    if sock is None:
+        return None
+    import json
+
+    with sock:
+        try:
+            _send(sock, {'command': command})
+            with sock.makefile('rb') as f:
+                line = f.readline()
+            return json.loads(line.decode('utf-8')) if line else None
+        except (OSError, ValueError):
+            return None
+
+
+def run_client(socket_path: str, argv: List[str]) -> Optional[int]:
+    """
+    Forward a command line to the daemon and wait for it to finish.
+
+    The standard streams of this process are passed to the daemon, so the command writes
+    directly to them. Ctrl+C is forwarded to the command.
+
+    Args:
+        socket_path: Path to the daemon socket.
+        argv: The command line, including the script name.
+
+    Returns:
+        Optional[int]: The exit code, or None if no daemon is available and the command
+        has to be run in this process.
+    """
+    sock = _connect(socket_path)
+    if sock is None:
+        return None
+    import json
+
+    with sock:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            _send(sock, {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)}, [0, 1, 2])
+        except OSError:
+            return None
+
+        buffer = b''
+        while True:
+            try:
+                chunk = sock.recv(4096)
+            except KeyboardInterrupt:
+                try:
+                    sock.sendall(b'interrupt\n')
+                except OSError:
+                    pass
+                continue
+            except OSError:
+                chunk = b''
+            if not chunk:
+                print("The pybite daemon stopped before the command finished.", file=sys.stderr)
+                return 1
+            buffer += chunk
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                reply = json.loads(line.decode('utf-8'))
+                if 'error' in reply:
+                    print(f"The pybite daemon failed: {reply['error']}", file=sys.stderr)
+                    return None
+                if reply.get('fallback'):
+                    return None
+                if 'exit' in reply:
+                    return int(reply['exit'])
+
+
+def _exit_code(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    print(value, file=sys.stderr)
+    return 1
+
+
+class _Job:
+    def __init__(self, conn: "socket.socket", pid: int) -> None:
+        self.conn = conn
+        self.pid = pid
+
+
+class DaemonServer:
+    """
+    Long-lived pybite process that runs commands for thin clients on a Unix domain socket.
+
+    The Host, its modules and its argument parser are created once. Every command is run
+    in a forked child that inherits them, with the client's standard streams, working
+    directory and environment, so commands can't change the state of the daemon.
+    The Host is created again when the module index, a plugin, global.json or the
+    installed SDKs change. When config.py or the pybite sources change, the daemon stops
+    and asks the client to run the command itself.
+    """
+    def __init__(
+        self,
+        create_host: Callable[[], "Host"],
+        socket_path: str,
+        host: Optional["Host"] = None,
+        idle_timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            create_host: Function that creates a Host with its modules loaded.
+            socket_path: Path to the Unix socket to listen on.
+            host: An already created Host to start with.
+            idle_timeout: Seconds without commands after which the daemon stops.
+        """
+        self.create_host = create_host
+        self.socket_path = socket_path
+        self.host = host or create_host()
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.commands = 0
+        self.reloads = 0
+        self._jobs: Dict[int, _Job] = {}
+        self._running = False
+        self._code_stamp = self._get_code_stamp()
+        self._state_key = self._get_state_key()
+
+    @staticmethod
+    def _get_code_stamp() -> Dict[str, Optional[int]]:
+        files = [os.path.join(os.path.dirname(__file__), f) for f in os.listdir(os.path.dirname(__file__)) if f.endswith('.py')]
+        config = sys.modules.get('config')
+        if config is not None and getattr(config, '__file__', None):
+            files.append(config.__file__)
+        stamp: Dict[str, Optional[int]] = {}
+        for path in files:
+            try:
+                stamp[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                stamp[path] = None
+        return stamp
+
+    def _get_state_key(self) -> str:
+        index = self.host.get_module_index(refresh=True)
+        paths = list(index.plugins) + [
+            os.path.join(self.host.BASE_DIR, 'global.json'),
+            os.path.join(self.host.DOTNET_DIR, 'sdk'),
+        ]
+        stamps = []
+        for path in paths:
+            try:
+                stamps.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        import hashlib
+        import json
+
+        data = json.dumps([index.entries, paths, stamps], sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _refresh_host(self) -> None:
+        key = self._get_state_key()
+        if key != self._state_key:
+            self.host = self.create_host()
+            self.reloads += 1
+            self._state_key = self._get_state_key()
+
+    def _listen(self) -> "socket.socket":
+        if os.path.exists(self.socket_path):
+            if request(self.socket_path, 'status') is not None:
+                raise RuntimeError(f"A pybite daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        import socket
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(16)
+        return listener
+
+    def serve_forever(self) -> None:
+        """
+        Serve commands until a stop request, SIGTERM, the idle timeout or a source change.
+        """
+        import selectors
+        import signal
+        import socket
+
+        listener = self._listen()
+        selector = selectors.DefaultSelector()
+        selector.register(listener, selectors.EVENT_READ)
+        # Wake up as soon as a command finishes instead of polling for exited children
+        wakeup_r, wakeup_w = socket.socketpair()
+        wakeup_r.setblocking(False)
+        wakeup_w.setblocking(False)
+        selector.register(wakeup_r, selectors.EVENT_READ)
+        previous_wakeup = signal.set_wakeup_fd(wakeup_w.fileno())
+        previous_chld = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        previous_term = signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        self._running = True
+        last_activity = time.monotonic()
+        try:
+            while self._running or self._jobs:
+                for key, _ in selector.select(timeout=1.0):
+                    if key.fileobj is wakeup_r:
+                        try:
+                            while wakeup_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif key.fileobj is listener:
+                        if not self._running:
+                            continue
+                        conn, _ = listener.accept()
+                        job = self._accept(conn)
+                        if job is not None:
+                            self._jobs[job.pid] = job
+                            selector.register(conn, selectors.EVENT_READ, job)
+                        last_activity = time.monotonic()
+                    else:
+                        self._read_client(key.data)
+                for job in self._reap():
+                    selector.unregister(job.conn)
+                    job.conn.close()
+                    last_activity = time.monotonic()
+                if self._jobs:
+                    last_activity = time.monotonic()
+                elif self.idle_timeout and time.monotonic() - last_activity > self.idle_timeout:
+                    self.stop()
+        finally:
+            signal.signal(signal.SIGTERM, previous_term)
+            signal.signal(signal.SIGCHLD, previous_chld)
+            signal.set_wakeup_fd(previous_wakeup)
+            selector.close()
+            wakeup_r.close()
+            wakeup_w.close()
+            listener.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        """
+        Stop accepting commands, the daemon exits when the running commands finish.
+        """
+        self._running = False
+
+    def _accept(self, conn: "socket.socket") -> Optional[_Job]:
+        conn.settimeout(5.0)
+        try:
+            received = _recv(conn, max_fds=3)
+        except (OSError, ValueError):
+            received = None
+        if received is None:
+            conn.close()
+            return None
+        message, fds = received
+        try:
+            command = message.get('command')
+            if command == 'status':
+                _reply(conn, self.get_status())
+            elif command == 'stop':
+                self.stop()
+                _reply(conn, {'stopping': True})
+            elif len(fds) != 3 or 'argv' not in message:
+                _reply(conn, {'error': 'invalid request'})
+            elif self._get_code_stamp() != self._code_stamp:
+                # The running code is outdated, let the client run the command itself
+                self.stop()
+                _reply(conn, {'fallback': True})
+            else:
+                self._refresh_host()
+                self.commands += 1
+                pid = self._fork(message, fds, conn)
+                conn.setblocking(False)
+                return _Job(conn, pid)
+        except OSError:
+            pass
+        except Exception as e:
+            try:
+                _reply(conn, {'error': str(e)})
+            except OSError:
+                pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+        conn.close()
+        return None
+
+    def _fork(self, message: Dict[str, Any], fds: List[int], conn: "socket.socket") -> int:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            return pid
+
+        # Child: run the command with the client's streams, directory and environment
+        code = 1
+        try:
+            import signal
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            conn.close()
+            for job in self._jobs.values():
+                job.conn.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            # The streams were created for daemon.log and are block buffered, buffer them like
+            # the interpreter does for the client's streams so prints stay in order with the
+            # output of subprocesses
+            sys.stdout.reconfigure(line_buffering=os.isatty(1))
+            sys.stderr.reconfigure(line_buffering=True)
+
+            os.chdir(message.get('cwd') or self.host.BASE_DIR)
+            env = message.get('env') or {}
+            os.environ.clear()
+            os.environ.update(env)
+            self.host.ENVIRONMENT_VARIABLES['PATH'] = self.host.DOTNET_DIR + os.pathsep + env.get('PATH', '')
+            self.host._set_environment_variables()
+
+            argv = message['argv']
+            sys.argv = list(argv)
+            code = 0
+            try:
+                self.host.execute(argv[1:])
+            except SystemExit as e:
+                code = _exit_code(e.code)
+            except KeyboardInterrupt:
+                code = 130
+            finally:
+                from . import is_loaded
+                if is_loaded('download'):
+                    from . import download
+                    download.cleanup_temp_folders()
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+    def _read_client(self, job: _Job) -> None:
+        import signal
+
+        try:
+            data = job.conn.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        try:
+            if not data:
+                # The client went away, stop its command
+                os.kill(job.pid, signal.SIGTERM)
+            elif b'interrupt' in data:
+                os.kill(job.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> List[_Job]:
+        finished: List[_Job] = []
+        while self._jobs:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            job = self._jobs.pop(pid, None)
+            if job is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code < 0:
+                code = 128 - code
+            try:
+                job.conn.setblocking(True)
+                _reply(job.conn, {'exit': code})
+            except OSError:
+                pass
+            finished.append(job)
+        return finished
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the process id, uptime and counters of the daemon.
+        """
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'commands': self.commands,
+            'reloads': self.reloads,
+            'running': len(self._jobs),
+            'base_dir': self.host.BASE_DIR,
+        }
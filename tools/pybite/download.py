@@ -1,27 +1,36 @@
-import concurrent.futures
 import os
 import re
-import zipfile
-import tempfile
 import time
 import shutil
+import threading
 from urllib.parse import urlparse
-import uuid
 from typing import Optional
-import multiprocessing
 
-import concurrent
+# zipfile, tempfile, uuid, asyncio, concurrent.futures and http.client are imported
+# in the functions that need them to keep the import of this module cheap.
 
-CACHE_DURATION = 7200  # seconds
+CACHE_MAX_AGE = 30 * 86400  # seconds a cached download is kept without being used
+PART_MAX_AGE = 86400  # seconds an interrupted download is kept for resuming
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024  # bytes, smaller downloads are never split into segments
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", None)
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_RAW_URL = "https://raw.githubusercontent.com"
+DOWNLOAD_CONCURRENCY = int(os.environ.get("PYBITE_DOWNLOAD_CONCURRENCY", 8))
+DOWNLOAD_RETRIES = 4
+_RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+EXTRACT_PARALLEL_MIN_SIZE = 1024 * 1024  # bytes, larger archive members are extracted in parallel
+_CHUNK_SIZE = 64 * 1024
+_MAX_REDIRECTS = 10
 _temp_folders: list[str] = []
 
 def get_temp_base() -> str:
+    import tempfile
     base = os.path.join(tempfile.gettempdir(), "pybite")
     os.makedirs(base, exist_ok=True)
     return base
 
 def create_temp_folder() -> str:
+    import uuid
     folder = os.path.join(get_temp_base(), str(uuid.uuid4()))
     os.makedirs(folder, exist_ok=True)
     _temp_folders.append(folder)
@@ -36,12 +45,16 @@ def cleanup_temp_folders() -> None:
     now = time.time()
     for fname in os.listdir(base):
         fpath = os.path.join(base, fname)
-        if fname.endswith(".zip") and os.path.isfile(fpath):
-            if now - os.path.getmtime(fpath) > CACHE_DURATION:
+        if not os.path.isfile(fpath):
+            continue
+        # github_*.zip files are left by versions without the download cache
+        if fname.endswith(".zip") or fname.endswith((".part", ".part.json")):
+            if fname.endswith(".zip") or now - os.path.getmtime(fpath) > PART_MAX_AGE:
                 try:
                     os.remove(fpath)
                 except Exception:
                     pass
+    DownloadCache(os.path.join(base, "cache")).evict(CACHE_MAX_AGE)
 
 def _parse_github_url(url: str) -> tuple[str, str, str, str]:
     parts = urlparse(url)
@@ -106,22 +119,65 @@ def _print_progress(filename: str, downloaded: int, total: int) -> None:
         percent = min(100, downloaded * 100 // total)
         print(f"\rDownloading {filename}: {percent}%", end="", flush=True)
 
+def _copy_zip_member(z, info, target: str) -> None:
+    with z.open(info) as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+    mtime = time.mktime(info.date_time + (0, 0, -1))
+    os.utime(target, (mtime, mtime))
+
 def _extract_folder_from_github_zip(zip_path: str, folder_path: str, dest_dir: str, repo: str, branch: str) -> None:
-    prefix = f"{repo}-{branch}/{folder_path.rstrip('/')}/"
+    """
+    Extract a folder of a GitHub repository archive, keeping the timestamps of the files.
+
+    Members are streamed to disk in chunks. Members larger than EXTRACT_PARALLEL_MIN_SIZE are
+    extracted by a pool of threads, each with its own handle on the archive since a ZipFile
+    can't be read from several threads.
+    """
+    import concurrent.futures
+    import zipfile
+    folder_path = folder_path.strip('/')
+    prefix = f"{repo}-{branch}/{folder_path}/" if folder_path else f"{repo}-{branch}/"
+    dest_dir = os.path.abspath(dest_dir)
     with zipfile.ZipFile(zip_path) as z:
-        for member in z.namelist():
-            if not member.startswith(prefix):
-                continue
-            rel = member[len(prefix):]
-            if not rel:
+        folders = {dest_dir}
+        files = []
+        for info in z.infolist():
+            if not info.filename.startswith(prefix) or len(info.filename) == len(prefix):
                 continue
-            target = os.path.join(dest_dir, rel)
-            if member.endswith('/'):
-                os.makedirs(target, exist_ok=True)
+            target = os.path.normpath(os.path.join(dest_dir, info.filename[len(prefix):]))
+            if not target.startswith(dest_dir + os.sep):
+                raise ValueError(f"Archive member '{info.filename}' is outside of the extracted folder")
+            if info.is_dir():
+                folders.add(target)
             else:
-                os.makedirs(os.path.dirname(target), exist_ok=True)
-                with z.open(member) as src, open(target, 'wb') as dst:
-                    dst.write(src.read())
+                folders.add(os.path.dirname(target))
+                files.append((info, target))
+        for folder in sorted(folders):
+            os.makedirs(folder, exist_ok=True)
+
+        large = [(info, target) for info, target in files if info.file_size >= EXTRACT_PARALLEL_MIN_SIZE]
+        for info, target in files:
+            if info.file_size < EXTRACT_PARALLEL_MIN_SIZE:
+                _copy_zip_member(z, info, target)
+    if not large:
+        return
+
+    local = threading.local()
+    handles = []
+
+    def _extract_large(info, target: str) -> None:
+        if not hasattr(local, 'zip'):
+            local.zip = zipfile.ZipFile(zip_path)
+            handles.append(local.zip)
+        _copy_zip_member(local.zip, info, target)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(large), os.cpu_count() or 1)) as pool:
+            for future in [pool.submit(_extract_large, info, target) for info, target in large]:
+                future.result()
+    finally:
+        for handle in handles:
+            handle.close()
 
 def _has_requests_lib() -> bool:
     """
@@ -162,65 +218,94 @@ def _github_api_request(url: str, headers: Optional[dict] = None, token: Optiona
     """
     if not _has_requests_lib():
         raise ImportError("The 'requests' library is required for GitHub API requests.")
-    import requests
     final_headers = {'Accept': 'application/vnd.github.v3+json'}
-    github_api = "https://api.github.com"
     if url.startswith("/"):
-        url = github_api + url
+        url = GITHUB_API_URL + url
     if token is None:
         token = GITHUB_TOKEN
     if token:
         final_headers['Authorization'] = _build_github_auth_header(token)
     if headers:
         final_headers.update(headers)
-    resp = requests.get(url, headers=final_headers)
+    resp = get_http_pool().session.get(url, headers=final_headers)
     resp.raise_for_status()
     return resp.json()
 
+def _list_github_tree(owner: str, repo: str, branch: str, folder_path: str) -> Optional[list[tuple[str, str]]]:
+    """
+    List the files of a folder of a repository with a single recursive tree request.
+
+    Returns:
+        The path relative to the folder and the raw download URL of every file, or None if
+        GitHub truncated the tree because the repository is too large. The files of private
+        repositories need the Authorization header of the API requests.
+    Raises:
+        ValueError: If the folder doesn't exist.
+    """
+    from urllib.parse import quote
+    result = _github_api_request(f"/repos/{owner}/{repo}/git/trees/{quote(branch, safe='/')}?recursive=1")
+    if result.get('truncated'):
+        return None
+    prefix = folder_path.strip('/')
+    prefix = f"{prefix}/" if prefix else ''
+    files = []
+    found = not prefix
+    for item in result.get('tree', []):
+        path = item['path']
+        if not path.startswith(prefix):
+            found = found or (item['type'] == 'tree' and f"{path}/" == prefix)
+            continue
+        found = True
+        # Submodules and symbolic links are skipped like in the contents listing
+        if item['type'] != 'blob' or item.get('mode') == '120000':
+            continue
+        url = f"{GITHUB_RAW_URL}/{owner}/{repo}/{quote(branch, safe='/')}/{quote(path)}"
+        files.append((path[len(prefix):], url))
+    if not found:
+        raise ValueError(f"Folder '{folder_path}' not found in {owner}/{repo} at '{branch}'")
+    return files
+
 def _download_github_api(owner: str, repo: str, branch: str, folder_path: str, dest_dir: str) -> None:
-    max_workers = multiprocessing.cpu_count()
-    threadpool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
-    downloaded = []
-    requested = 0
+    items = []
 
-    def _download_dir(path: str, dest: str) -> None:
+    def _list_dir(path: str, dest: str) -> None:
         os.makedirs(dest, exist_ok=True)
         api_url = f"/repos/{owner}/{repo}/contents/{path}?ref={branch}" if path else f"/repos/{owner}/{repo}/contents?ref={branch}"
         print(f"Getting informations from: {api_url}")
-        items = _github_api_request(api_url)
-        for item in items:
+        for item in _github_api_request(api_url):
             if item['type'] == 'file':
-                nonlocal requested
-                threadpool.submit(_download_file_from_github, dest, item)
-                requested += 1
+                items.append((item['download_url'], os.path.join(dest, item['name'])))
             elif item['type'] == 'dir':
-                _download_dir(item['path'], os.path.join(dest, item['name']))
+                _list_dir(item['path'], os.path.join(dest, item['name']))
+
+    print(f"Getting the tree of {owner}/{repo} at '{branch}'")
+    files = _list_github_tree(owner, repo, branch, folder_path)
+    if files is None:
+        print("The tree is too large to be listed at once, listing every directory")
+        _list_dir(folder_path, dest_dir)
+    else:
+        for folder in sorted({os.path.dirname(rel) for rel, _ in files} | {''}):
+            os.makedirs(os.path.join(dest_dir, folder), exist_ok=True)
+        items = [(url, os.path.join(dest_dir, rel)) for rel, url in files]
 
-    def _download_file_from_github(dest, item):
-        file_dest = os.path.join(dest, item['name'])
-        download_file(item['download_url'], file_dest, show_progress=False)
-        print(f"Downloaded {item['path']}")
-        downloaded.append(file_dest)
+    headers = {'Authorization': _build_github_auth_header(GITHUB_TOKEN)} if GITHUB_TOKEN else None
+    engine = DownloadEngine(headers=headers)
+    failed = engine.download(items)
+    for url, error in failed:
+        print(f"Failed to download {url}: {error}")
 
-    _download_dir(folder_path, dest_dir)
+    stats = get_http_pool().stats()
+    print(f"Downloaded {len(items) - len(failed)} of {len(items)} files ({engine.retried} retries, "
+          f"{stats['opened']} connections opened, {stats['reused']} reused).")
 
-    threadpool.shutdown(wait=True)
-    
-    print(f"Downloaded {len(downloaded)} of {requested} files.")
-    
-    if requested > 0 and len(downloaded) != requested:
+    if failed:
         raise Exception("Partial download")
 
 def _download_github_zip(owner: str, repo: str, branch: str, folder_path: str, dest_dir: str) -> None:
     zip_url = f"https://github.com/{owner}/{repo}/archive/{branch}.zip"
-    base = get_temp_base()
-    cache_name = f"github_{owner}_{repo}_{branch}.zip"
-    cache_path = os.path.join(base, cache_name)
-    if os.path.exists(cache_path) and (time.time() - os.path.getmtime(cache_path)) < CACHE_DURATION:
-        print(f"Using cached file at {cache_path}")
-    else:
-        print(f"Downloading file from {zip_url}")
-        download_file(zip_url, cache_path)
+    cache = DownloadCache(os.path.join(get_temp_base(), "cache"))
+    print(f"Downloading file from {zip_url}")
+    cache_path = cache.fetch(zip_url)
     print(f"Extracting '{folder_path}' into '{dest_dir}'")
     _extract_folder_from_github_zip(cache_path, folder_path, dest_dir, repo, branch)
 
@@ -238,7 +323,7 @@ def _download_github_folder(url: str, dest_dir: str) -> None:
     if os.path.exists(dest_dir) and not _is_dir_empty(dest_dir):
         raise ValueError(f"Destination folder '{dest_dir}' is not empty.")
     owner, repo, branch, folder_path = _parse_github_url(url)
-    if _has_requests_lib and (rate := _get_github_api_limit()) > 10:
+    if _has_requests_lib() and (rate := _get_github_api_limit()) > 10:
         print(f"Downloading using GitHub API (remaining rate limit: {rate})...")
         _download_github_api(owner, repo, branch, folder_path, dest_dir)
     else:
@@ -248,53 +333,715 @@ def _download_github_folder(url: str, dest_dir: str) -> None:
     print("Download complete.")
 
 def _extract_zip(zip_path: str, dest_dir: str) -> None:
+    import zipfile
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(dest_dir)
 
-def download_file(url: str, dest_path: str, show_progress: bool = True) -> None:
+class _Response:
+    """
+    Streamed HTTP response of either requests or urllib: status, headers and body chunks.
+    """
+    def __init__(self, status: int, headers, chunks, close) -> None:
+        self.status = status
+        self.headers = headers
+        self.chunks = chunks
+        self._close = close
+
+    def close(self) -> None:
+        # Closing twice would give a pooled connection back twice
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+    def __enter__(self) -> "_Response":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class HttpPool:
+    """
+    Keep-alive connections shared by the threads of this module, so downloading many small
+    files doesn't pay a TCP and TLS handshake per file.
+
+    With requests, a single session is used with an adapter pooling up to maxsize
+    connections per host. Without it, idle http.client connections are kept per host.
+    Requests that go through a proxy use urlopen without pooling.
+    """
+    def __init__(self, maxsize: int = 10) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._session = None
+        self._idle: dict[tuple, list] = {}
+        self._opened = 0
+        self._reused = 0
+
+    @property
+    def session(self):
+        """
+        The requests session, only available if requests is installed.
+        """
+        with self._lock:
+            if self._session is None:
+                import requests
+                self._session = requests.Session()
+                self._mount()
+            return self._session
+
+    def _mount(self) -> None:
+        from requests.adapters import HTTPAdapter
+        for prefix in ("https://", "http://"):
+            previous = self._session.adapters.get(prefix)
+            if previous is not None:
+                # Keep the counts of the pools that are dropped
+                opened, reused = self._get_adapter_stats(previous)
+                self._opened += opened
+                self._reused += reused
+                previous.close()
+            self._session.mount(prefix, HTTPAdapter(pool_connections=self.maxsize, pool_maxsize=self.maxsize))
+
+    @staticmethod
+    def _get_adapter_stats(adapter) -> tuple[int, int]:
+        opened = requests = 0
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                requests += pool.num_requests
+        return opened, max(0, requests - opened)
+
+    def resize(self, maxsize: int) -> None:
+        """
+        Grow the number of connections kept per host to at least maxsize, usually the number
+        of worker threads.
+        """
+        with self._lock:
+            if maxsize <= self.maxsize:
+                return
+            self.maxsize = maxsize
+            if self._session is not None:
+                self._mount()
+
+    def stats(self) -> dict:
+        """
+        Return the number of connections 'opened' and of requests that 'reused' one.
+        """
+        with self._lock:
+            opened, reused = self._opened, self._reused
+            if self._session is not None:
+                for prefix in ("https://", "http://"):
+                    adapter_opened, adapter_reused = self._get_adapter_stats(self._session.adapters[prefix])
+                    opened += adapter_opened
+                    reused += adapter_reused
+            return {'opened': opened, 'reused': reused}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle.clear()
+
+    def get(self, url: str, headers: Optional[dict] = None) -> _Response:
+        """
+        Start a streamed GET request. Raises for error statuses, except 416 which range
+        requests have to handle. 304 is returned as well for conditional requests.
+        """
+        if _has_requests_lib():
+            resp = self.session.get(url, headers=headers, stream=True)
+            if resp.status_code not in (304, 416):
+                resp.raise_for_status()
+            return _Response(resp.status_code, resp.headers, resp.iter_content(chunk_size=_CHUNK_SIZE), resp.close)
+        return self._urllib_get(url, {"User-Agent": "python-urllib", **(headers or {})})
+
+    def _urllib_get(self, url: str, headers: dict) -> _Response:
+        from urllib.error import HTTPError
+        from urllib.parse import urljoin
+        from urllib.request import getproxies, proxy_bypass
+        proxies = getproxies()
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urlparse(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ("http", "https") or (scheme in proxies and not proxy_bypass(parts.hostname or '')):
+                return _urlopen_get(url, headers)
+            key = (scheme, parts.hostname, parts.port)
+            target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            conn, resp = self._request(key, target, headers)
+            location = resp.getheader('Location')
+            if resp.status in (301, 302, 303, 307, 308) and location:
+                resp.read()
+                self._release(key, conn, resp)
+                url = urljoin(url, location)
+                if urlparse(url).hostname != parts.hostname:
+                    # Like requests, don't send credentials to another host
+                    headers = {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+                continue
+            if resp.status >= 400 and resp.status != 416:
+                self._release(key, conn, resp)
+                raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            if resp.length == 0:
+                resp.read()
+            return _Response(resp.status, resp.headers, iter(lambda: resp.read(_CHUNK_SIZE), b''),
+                             lambda key=key, conn=conn, resp=resp: self._release(key, conn, resp))
+        raise HTTPError(url, resp.status, "Too many redirects", resp.headers, None)
+
+    def _request(self, key: tuple, target: str, headers: dict) -> tuple:
+        import http.client
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                conn = idle.pop() if idle else None
+                if conn is None:
+                    self._opened += 1
+                else:
+                    self._reused += 1
+            reused = conn is not None
+            if conn is None:
+                scheme, host, port = key
+                if scheme == "https":
+                    import ssl
+                    conn = http.client.HTTPSConnection(host, port, context=ssl.create_default_context())
+                else:
+                    conn = http.client.HTTPConnection(host, port)
+            try:
+                conn.request("GET", target, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server closed the idle connection, try another one
+                if not reused:
+                    raise
+                with self._lock:
+                    self._reused -= 1
+            except BaseException:
+                conn.close()
+                raise
+
+    def _release(self, key: tuple, conn, resp) -> None:
+        # A connection can only be reused once its response was read completely
+        if resp.isclosed() and not resp.will_close:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.maxsize:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+_http_pool: Optional[HttpPool] = None
+_http_pool_lock = threading.Lock()
+
+def get_http_pool(maxsize: int = 0) -> HttpPool:
+    """
+    Get the HTTP connection pool shared by the downloads of this process.
+
+    Args:
+        maxsize: Minimum number of connections to keep per host, usually the number of
+            threads that use the pool.
+    """
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool = HttpPool()
+    if maxsize:
+        _http_pool.resize(maxsize)
+    return _http_pool
+
+def _urlopen_get(url: str, headers: dict) -> _Response:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+    req = Request(url, headers=headers)
+    try:
+        resp = urlopen(req)
+    except HTTPError as e:
+        if e.code not in (304, 416):
+            raise
+        resp = e
+    return _Response(resp.code, resp.headers, iter(lambda: resp.read(_CHUNK_SIZE), b''), resp.close)
+
+def _http_get(url: str, headers: Optional[dict] = None) -> _Response:
+    """
+    Start a streamed GET request on the shared connection pool.
+    """
+    return get_http_pool().get(url, headers)
+
+def _get_validator(headers) -> Optional[str]:
+    """
+    Return the strong ETag or the Last-Modified date of a response, usable in If-Range.
+    """
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+def _parse_content_range(value: Optional[str]) -> tuple[Optional[int], Optional[int]]:
+    """
+    Return the first byte and the total size of a 'bytes first-last/total' Content-Range header.
+    """
+    m = re.fullmatch(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", (value or '').strip())
+    if not m:
+        return None, None
+    first = int(m.group(1)) if m.group(1) else None
+    total = int(m.group(2)) if m.group(2) != '*' else None
+    return first, total
+
+def _read_part_state(state_path: str) -> Optional[dict]:
+    import json
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_part_state(state_path: str, state: dict) -> None:
+    import json
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+def _discard_part(part_path: str, state_path: str) -> None:
+    for path in (part_path, state_path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class _ConnectionClosed(IOError):
+    """
+    Raised when the connection is closed before the whole response body was received.
+    """
+
+class _RangeIgnored(Exception):
+    """
+    Raised when a server answers a range request of a segment with the whole file.
+    """
+
+def _download_segments(url: str, part_path: str, state_path: str, state: dict, show_progress: bool, name: str) -> None:
+    """
+    Download the remaining bytes of every segment of a preallocated .part file in parallel.
+    The progress of every segment is saved when the download stops, so it can be resumed.
+    """
+    import concurrent.futures
+    lock = threading.Lock()
+    total = state['size']
+    segments = state['segments']
+    get_http_pool(len(segments))
+    downloaded = [sum(seg[2] for seg in segments)]
+
+    def _download_segment(seg: list) -> None:
+        start, end = seg[0], seg[1]
+        if start + seg[2] > end:
+            return
+        headers = {'Accept-Encoding': 'identity', 'Range': f"bytes={start + seg[2]}-{end}", 'If-Range': state['validator']}
+        with _http_get(url, headers) as resp:
+            if resp.status != 206 or _parse_content_range(resp.headers.get('Content-Range'))[0] != start + seg[2]:
+                raise _RangeIgnored(url)
+            with open(part_path, 'r+b') as f:
+                f.seek(start + seg[2])
+                for chunk in resp.chunks:
+                    chunk = chunk[:end + 1 - start - seg[2]]
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    with lock:
+                        seg[2] += len(chunk)
+                        downloaded[0] += len(chunk)
+                        if show_progress:
+                            _print_progress(name, downloaded[0], total)
+        if start + seg[2] <= end:
+            raise _ConnectionClosed(f"Connection closed after {seg[2]} of {end + 1 - start} bytes of a segment of {url}")
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            for future in [pool.submit(_download_segment, seg) for seg in segments]:
+                future.result()
+    finally:
+        _write_part_state(state_path, state)
+        if show_progress:
+            print()
+
+def _hash_file(path: str, digest=None):
+    import hashlib
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+def _complete_part(part_path: str, state_path: str, dest_path: str, state: dict, sha256: str) -> dict:
+    os.replace(part_path, dest_path)
+    _discard_part(part_path, state_path)
+    return {'sha256': sha256, 'etag': state.get('etag'), 'last_modified': state.get('last_modified')}
+
+def download_file(url: str, dest_path: str, show_progress: bool = True, segments: int = 1, headers: Optional[dict] = None) -> Optional[dict]:
     """
     Download a file from a URL to a local path.
 
+    The file is written to dest_path + '.part' and renamed when complete. If an earlier
+    download was interrupted, the rest is requested with a Range request validated with
+    If-Range, and the download starts over when the server sends the whole file instead.
+
     Args:
         url: The URL to download from.
         dest_path: The local file path to write to.
         show_progress: If True, print download progress.
+        segments: Number of parallel range requests used for large files of servers that
+            advertise Accept-Ranges.
+        headers: Additional request headers, such as If-None-Match.
+    Returns:
+        The 'sha256' of the file, computed while downloading, and the 'etag' and 'last_modified'
+        validators of the response, or None if the server answered 304 Not Modified.
     Raises:
-        Exception: If download fails.
+        Exception: If download fails. The partial file is kept to resume later.
     """
-    try:
-        import requests
-        resp = requests.get(url, stream=True)
-        resp.raise_for_status()
-        total = int(resp.headers.get('content-length', 0))
-        downloaded = 0
-        with open(dest_path, 'wb') as f:
-            for chunk in resp.iter_content(chunk_size=8192):
+    import hashlib
+    part_path = dest_path + '.part'
+    state_path = part_path + '.json'
+    name = os.path.basename(dest_path)
+    state = _read_part_state(state_path) if os.path.exists(part_path) else None
+    if state is None or state.get('url') != url or not state.get('validator'):
+        _discard_part(part_path, state_path)
+        state = None
+
+    if state and state.get('segments') and os.path.getsize(part_path) == state.get('size'):
+        try:
+            _download_segments(url, part_path, state_path, state, show_progress, name)
+        except _RangeIgnored:
+            # The file changed on the server since the download started, or the server
+            # advertises ranges without supporting them: download it again in one stream
+            _discard_part(part_path, state_path)
+            return download_file(url, dest_path, show_progress, 1, headers)
+        return _complete_part(part_path, state_path, dest_path, state, _hash_file(part_path).hexdigest())
+
+    offset = os.path.getsize(part_path) if state and not state.get('segments') else 0
+    request_headers = dict(headers or {})
+    request_headers['Accept-Encoding'] = 'identity'
+    if offset:
+        request_headers['Range'] = f"bytes={offset}-"
+        request_headers['If-Range'] = state['validator']
+    with _http_get(url, request_headers) as resp:
+        if resp.status == 304:
+            return None
+        if resp.status == 416:
+            _, total = _parse_content_range(resp.headers.get('Content-Range'))
+            if total is None or total != offset:
+                _discard_part(part_path, state_path)
+                return download_file(url, dest_path, show_progress, segments, headers)
+            # The previous download was complete
+            return _complete_part(part_path, state_path, dest_path, state, _hash_file(part_path).hexdigest())
+
+        first, total = _parse_content_range(resp.headers.get('Content-Range'))
+        if resp.status == 206 and first == offset:
+            mode = 'ab'
+        else:
+            # The server ignored the range or the file changed, start over
+            offset, mode = 0, 'wb'
+            total = int(resp.headers.get('Content-Length') or 0) or None
+        validator = _get_validator(resp.headers)
+        state = {'url': url, 'validator': validator, 'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+
+        if (segments > 1 and offset == 0 and validator and total and total >= SEGMENT_MIN_SIZE
+                and resp.headers.get('Accept-Ranges', '').lower() == 'bytes'):
+            resp.close()
+            size = -(-total // segments)
+            state['size'] = total
+            state['segments'] = [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+            _write_part_state(state_path, state)
+            return download_file(url, dest_path, show_progress, segments, headers)
+
+        if validator:
+            _write_part_state(state_path, state)
+        else:
+            _discard_part(part_path, state_path)
+        digest = _hash_file(part_path) if mode == 'ab' else hashlib.sha256()
+        downloaded = offset
+        with open(part_path, mode) as f:
+            for chunk in resp.chunks:
                 if not chunk:
                     continue
                 f.write(chunk)
+                digest.update(chunk)
+                downloaded += len(chunk)
                 if show_progress and total:
-                    downloaded += len(chunk)
-                    _print_progress(os.path.basename(dest_path), downloaded, total)
+                    _print_progress(name, downloaded, total)
         if show_progress and total:
             print()
-    except ImportError:
-        from urllib.request import Request, urlopen
-        req = Request(url, headers={"User-Agent": "python-urllib"})
-        with urlopen(req) as resp:
-            total = resp.length or 0
-            downloaded = 0
-            with open(dest_path, 'wb') as f:
-                while True:
-                    chunk = resp.read(8192)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    if show_progress and total:
-                        downloaded += len(chunk)
-                        _print_progress(os.path.basename(dest_path), downloaded, total)
-            if show_progress and total:
-                print()
+    if total is not None and downloaded != total:
+        raise _ConnectionClosed(f"Connection closed after {downloaded} of {total} bytes of {url}")
+    return _complete_part(part_path, state_path, dest_path, state, digest.hexdigest())
+
+def _get_error_response(error: Exception) -> tuple[Optional[int], dict]:
+    """
+    Return the status and the headers of the response of a failed request, if there is one.
+    """
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code, error.headers or {}
+    response = getattr(error, 'response', None)
+    if response is not None and hasattr(response, 'status_code'):
+        return response.status_code, response.headers
+    return None, {}
+
+def _is_network_error(error: Exception) -> bool:
+    """
+    Return True if a request failed because of the network, such as a refused, reset or timed
+    out connection. Other errors, like a full disk, fail the same way when retried.
+    """
+    import http.client
+    import socket
+    from urllib.error import HTTPError, URLError
+    if isinstance(error, (ConnectionError, TimeoutError, socket.gaierror, http.client.HTTPException, _ConnectionClosed)):
+        return True
+    if isinstance(error, URLError) and not isinstance(error, HTTPError):
+        return True
+    if _has_requests_lib():
+        import requests
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError))
+    return False
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Return the seconds to wait for a Retry-After header, given in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class DownloadEngine:
+    """
+    Download many files concurrently with asyncio.
+
+    At most concurrency downloads run at once, each in a worker thread using the shared
+    connection pool. Requests that failed because of the network or with a temporary status
+    are retried with jittered exponential backoff, other errors fail right away. A
+    Retry-After header, or X-RateLimit-Remaining of 0 with X-RateLimit-Reset, pauses all
+    requests until the server accepts them again. Progress is printed on a single line for
+    all the files.
+    """
+    def __init__(
+        self,
+        concurrency: int = DOWNLOAD_CONCURRENCY,
+        retries: int = DOWNLOAD_RETRIES,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_rate_limit_wait: float = 120.0,
+        show_progress: bool = True,
+        headers: Optional[dict] = None,
+    ) -> None:
+        """
+        Args:
+            concurrency: Maximum number of downloads running at once.
+            retries: Number of times a failed download is retried.
+            backoff: Base delay in seconds, doubled after every attempt.
+            max_backoff: Maximum delay in seconds between two attempts.
+            max_rate_limit_wait: A download fails instead of waiting longer for a rate limit to reset.
+            show_progress: If True, print the progress of the downloads.
+            headers: Request headers sent with every download, such as Authorization.
+        """
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.show_progress = show_progress
+        self.headers = headers
+        self.retried = 0
+        self._paused_until = 0.0
+        self._done = 0
+        self._bytes = 0
+
+    def download(self, items: list[tuple[str, str]]) -> list[tuple[str, Exception]]:
+        """
+        Download files.
+
+        Args:
+            items: The URL and the destination path of every file.
+        Returns:
+            The URL and the error of every download that failed.
+        """
+        import asyncio
+        return asyncio.run(self.download_async(items))
+
+    async def download_async(self, items: list[tuple[str, str]]) -> list[tuple[str, Exception]]:
+        import asyncio
+        import concurrent.futures
+        get_http_pool(self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._done = self._bytes = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = await asyncio.gather(*[self._download(executor, semaphore, url, dest, len(items)) for url, dest in items])
+        if self.show_progress and items:
+            print()
+        return [(url, error) for (url, _), error in zip(items, results) if error is not None]
+
+    async def _download(self, executor, semaphore, url: str, dest_path: str, total: int) -> Optional[Exception]:
+        import asyncio
+        import random
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        async with semaphore:
+            while True:
+                wait = self._paused_until - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await loop.run_in_executor(executor, download_file, url, dest_path, False, 1, self.headers)
+                    break
+                except Exception as e:
+                    status, headers = _get_error_response(e)
+                    delay = self._get_rate_limit_delay(status, headers)
+                    retryable = delay is not None or status in _RETRY_STATUSES or (status is None and _is_network_error(e))
+                    if not retryable or attempt >= self.retries or (delay or 0) > self.max_rate_limit_wait:
+                        return e
+                    if delay is not None:
+                        # The whole host is limited, not only this request
+                        self._paused_until = max(self._paused_until, time.time() + delay)
+                    else:
+                        await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                    attempt += 1
+                    self.retried += 1
+        self._done += 1
+        self._bytes += os.path.getsize(dest_path)
+        if self.show_progress:
+            print(f"\rDownloading files: {self._done}/{total} ({self._bytes / 1048576:.1f} MB)", end="", flush=True)
+        return None
+
+    @staticmethod
+    def _get_rate_limit_delay(status: Optional[int], headers) -> Optional[float]:
+        """
+        Return the seconds to wait before the server accepts requests again, or None if the
+        response wasn't rate limited.
+        """
+        if status not in (403, 429, 503):
+            return None
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+            try:
+                return max(0.0, float(headers['X-RateLimit-Reset']) - time.time())
+            except ValueError:
+                pass
+        return None
+
+class DownloadCache:
+    """
+    Content-addressed cache of downloaded files.
+
+    Files are stored by the SHA-256 of their content, computed while they are downloaded,
+    in blobs/<first two hex digits>/<hash>. index.json maps every URL to the hash of its
+    last download and the ETag and Last-Modified the server sent, so later fetches are
+    conditional requests and an unchanged file only costs a 304 response.
+    """
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+
+    def get_blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "blobs", sha256[:2], sha256)
+
+    def _load_index(self) -> dict:
+        import json
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, update) -> None:
+        import json
+        # Reload so entries written by concurrent invocations are kept
+        index = self._load_index()
+        update(index)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def fetch(self, url: str, show_progress: bool = True) -> str:
+        """
+        Get the path of the cached content of a URL, downloading it if the server has a
+        newer version than the cache.
+
+        Args:
+            url: The URL to download from.
+            show_progress: If True, print download progress.
+        Returns:
+            The path of the blob. It must not be modified.
+        """
+        import hashlib
+        entry = self._load_index().get(url)
+        headers = {}
+        blob_path = self.get_blob_path(entry['sha256']) if entry and entry.get('sha256') else None
+        if blob_path and os.path.isfile(blob_path):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        # Named by URL so an interrupted download is resumed by the next fetch
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+        result = download_file(url, tmp_path, show_progress, headers=headers)
+        if result is None:
+            print(f"Using cached file at {blob_path}")
+            os.utime(blob_path)
+            return blob_path
+
+        blob_path = self.get_blob_path(result['sha256'])
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        size = os.path.getsize(tmp_path)
+        if os.path.isfile(blob_path) and os.path.getsize(blob_path) == size:
+            os.remove(tmp_path)
+            os.utime(blob_path)
+        else:
+            os.replace(tmp_path, blob_path)
+        result['size'] = size
+
+        def update(index: dict) -> None:
+            index[url] = result
+        self._update_index(update)
+        return blob_path
+
+    def evict(self, max_age: float) -> None:
+        """
+        Remove the blobs that were not used for max_age seconds and their index entries, and
+        interrupted downloads older than PART_MAX_AGE.
+        """
+        now = time.time()
+        removed = set()
+        for folder, age in ((os.path.join(self.root, "blobs"), max_age), (os.path.join(self.root, "tmp"), PART_MAX_AGE)):
+            for dirpath, _, filenames in os.walk(folder):
+                for fname in filenames:
+                    fpath = os.path.join(dirpath, fname)
+                    try:
+                        if now - os.path.getmtime(fpath) > age:
+                            os.remove(fpath)
+                            removed.add(fname)
+                    except OSError:
+                        pass
+        if removed:
+            def update(index: dict) -> None:
+                for url in [u for u, e in index.items() if e.get('sha256') in removed]:
+                    del index[url]
+            self._update_index(update)
 
 def _is_url(path: str) -> bool:
     """
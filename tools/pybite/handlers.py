@@ -1,9 +1,12 @@
 import argparse
-from typing import List
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from .msbuild import MSBuildTarget
 from .host import Host
 
+if TYPE_CHECKING:
+    from .msbuild import MSBuildTarget
+
 def handle_dotnet_cli(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
     """
     Handle custom dotnet commands.
@@ -15,8 +18,85 @@ def handle_dotnet_builtin(host: Host, args: argparse.Namespace, extras: List[str
     """
     Handle built-in dotnet commands.
     Passes any extra arguments to the dotnet CLI.
+    With --parallel, the command is run per project of the solution.
+    """
+    parallel = getattr(args, 'parallel', None)
+    timing = getattr(args, 'timing', False)
+    if getattr(args, 'shards', None) is not None or getattr(args, 'shard', None) is not None:
+        handle_test_shards(host, args, extras)
+        return
+    if getattr(args, 'shard_durations', None):
+        host.get_argparser().error("The 'shard-durations' option requires 'shards' or 'shard'.")
+    if parallel is None:
+        host.run_builtin(args.command, *extras, timing=timing)
+        return
+    if timing:
+        host.get_argparser().error("The 'timing' option cannot be used with 'parallel'.")
+    if parallel < 0:
+        host.get_argparser().error("The 'parallel' option must be a positive number of processes.")
+
+    try:
+        scheduler = host.run_parallel(args.command, *extras, max_workers=parallel or None)
+    except ValueError as e:
+        host.get_argparser().error(str(e))
+    if scheduler is None:
+        print("Restore failed, no project was started.")
+        sys.exit(1)
+    scheduler.print_summary()
+    if not scheduler.succeeded:
+        sys.exit(1)
+
+def handle_test_shards(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle 'test' with --shards or --shard, running the tests split by project and class.
+    """
+    if args.shards is not None and args.shard is not None:
+        host.get_argparser().error("The 'shards' and 'shard' options cannot be used together.")
+    if args.parallel is not None or args.timing:
+        host.get_argparser().error("The 'shards' and 'shard' options cannot be used with 'parallel' or 'timing'.")
+    index = None
+    if args.shard is not None:
+        from .shard import parse_shard
+
+        try:
+            index, count = parse_shard(args.shard)
+        except ValueError as e:
+            host.get_argparser().error(str(e))
+    else:
+        count = args.shards
+        if count < 1:
+            host.get_argparser().error("The 'shards' option must be a positive number of shards.")
+
+    import glob
+
+    durations_files: List[str] = []
+    for pattern in args.shard_durations or []:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            host.get_argparser().error(f"No files found matching {pattern}.")
+        durations_files.extend(matches)
+
+    try:
+        runner = host.run_test_shards(*extras, count=count, index=index, durations_files=durations_files)
+    except ValueError as e:
+        host.get_argparser().error(str(e))
+    if runner is None:
+        print("Build failed, no tests were run.")
+        sys.exit(1)
+    runner.print_summary()
+    if not runner.succeeded:
+        sys.exit(1)
+
+def handle_deferred_command(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
     """
-    host.run_builtin(args.command, *extras)
+    Handle a command declared in a module.json.
+    Loads the declaring module's plugins and dispatches to the handler they register.
+    """
+    host.load_deferred_command(args.command)
+    handler = host.handlers.get(args.command)
+    if handler is None or handler is handle_deferred_command:
+        host.get_argparser().error(f"The '{args.command}' command was declared but not registered by its module.")
+    handler(host, args, extras)
 
 def handle_bite_run(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
     """
@@ -24,12 +104,13 @@ def handle_bite_run(host: Host, args: argparse.Namespace, extras: List[str]) ->
     Passes any extra arguments to msbuild.
     """
     list_targets = getattr(args, 'list', False)
+    requested: List[str] = getattr(args, 'target', None) or ['help']
     if list_targets:
-        if getattr(args, 'target', 'help') != 'help' or extras:
+        if requested != ['help'] or extras or getattr(args, 'plan', False):
             host.get_argparser().error("The 'list' option cannot be used with other arguments.")
         
         dependant_targets: List[MSBuildTarget] = []
-        targets = host.get_bite_core_targets()
+        targets = host.get_bite_core_targets(refresh=getattr(args, 'refresh', False))
         print("Available independent targets:")
         for target in targets:
             if getattr(target, 'AfterTargets', None) is None and getattr(target, 'BeforeTargets', None) is None:
@@ -45,9 +126,169 @@ def handle_bite_run(host: Host, args: argparse.Namespace, extras: List[str]) ->
                 if getattr(target, 'BeforeTargets', None):
                     print(f"(before '{target.BeforeTargets}')", end=' ')
                 print()
+        sources = {
+            'cache': 'cached target list',
+            'msbuild': 'fresh MSBuild evaluation',
+            'scan': 'scan of .bite.targets files',
+        }
+        print(f"\nTargets loaded from {sources.get(host.bite_targets_source, 'unknown source')}.")
+        return
+    if getattr(args, 'plan', False):
+        if extras:
+            host.get_argparser().error("The 'plan' option does not accept extra arguments.")
+        graph = host.get_target_graph()
+        try:
+            plan = graph.plan(requested)
+        except ValueError as e:
+            host.get_argparser().error(str(e))
+        print(f"Execution plan for {', '.join(requested)}:")
+        for i, (name, runs) in enumerate(plan, 1):
+            deps = graph.dependencies(name)
+            line = f"  {i:>3}. {name}"
+            if deps:
+                line += f" (after {', '.join(deps)})"
+            if not runs:
+                line += " [skipped, condition is false]"
+            print(line)
+        return
+    try:
+        host.run_bite(
+            ';'.join(requested),
+            *extras,
+            incremental=getattr(args, 'incremental', False),
+            why=getattr(args, 'why', False),
+            use_hash=getattr(args, 'hash', False),
+            timing=getattr(args, 'timing', False),
+        )
+    except ValueError as e:
+        host.get_argparser().error(str(e))
+
+def handle_bite_perf(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'perf' command, showing the timing report of a saved MSBuild log.
+    """
+    if extras:
+        host.get_argparser().error(f"Invalid arguments: {extras}")
+
+    import os
+
+    if not os.path.isfile(args.log):
+        host.get_argparser().error(f"Log file '{args.log}' not found.")
+    if host.report_timing(args.log, references=True, count=args.top, json_path=args.json) is None:
+        print(f"No performance summary found in '{args.log}'. Run MSBuild with '-flp:PerformanceSummary' or use the --timing option.")
+        sys.exit(1)
+
+def handle_bite_stats(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'stats' command, showing the duration percentiles, trends and regressions of
+    the commands recorded in the history.
+    """
+    if extras:
+        host.get_argparser().error(f"Invalid arguments: {extras}")
+    if args.last < 2 or args.window < 1 or args.factor <= 1:
+        host.get_argparser().error("The 'last' option must be at least 2, 'window' at least 1 and 'factor' greater than 1.")
+
+    from .history import summarize
+
+    history = host.get_history()
+    keys = [' '.join(args.key)] if args.key else history.get_keys()
+    rows = []
+    for key in keys:
+        runs = history.get_runs(key, args.last, successful=False)
+        durations = [r['duration'] for r in runs if r['exit_code'] == 0]
+        if not runs:
+            continue
+        rows.append((key, len(runs) - len(durations), summarize(durations, args.factor, args.window)))
+    if not rows:
+        print(f"No history recorded{' for ' + repr(keys[0]) if args.key else ''}.")
+        return
+
+    def seconds(value: Any) -> str:
+        if value is None:
+            return '-'
+        return f"{value:.1f}s" if value >= 10 else f"{value:.2f}s"
+
+    def trend(stats: Dict[str, Any]) -> str:
+        return '-' if stats['trend'] is None else f"{stats['trend']:+.0%}"
+
+    def regression(stats: Dict[str, Any]) -> str:
+        if not stats['regression']:
+            return ''
+        return f"REGRESSION, {stats['last'] / stats['baseline']:.1f}x baseline {stats['baseline']:.1f}s"
+
+    width = max(len('Command'), *(len(key) for key, _, _ in rows))
+    print(f"{'Command'.ljust(width)}  {'Runs':>5}  {'Failed':>6}  {'p50':>7}  {'p90':>7}  {'p95':>7}  {'Last':>7}  {'Trend':>6}")
+    for key, failed, stats in rows:
+        line = (f"{key.ljust(width)}  {stats['count']:>5}  {failed:>6}  {seconds(stats.get('p50')):>7}  {seconds(stats.get('p90')):>7}"
+                f"  {seconds(stats.get('p95')):>7}  {seconds(stats.get('last')):>7}  {trend(stats):>6}  {regression(stats)}")
+        print(line.rstrip())
+
+    if not args.timings:
         return
-    target = getattr(args, 'target', 'help')
-    host.run_bite(target, *extras)
+    for key, _, _ in rows:
+        timings = history.get_timings(key, args.last)
+        if not timings:
+            continue
+        entries = sorted(
+            ((kind, name, summarize(values, args.factor, args.window)) for (kind, name), values in timings.items()),
+            key=lambda e: e[2]['p50'],
+            reverse=True,
+        )[:args.top]
+        width = max(len(key), *(len(f"{kind} {name}") for kind, name, _ in entries))
+        print(f"\n{key.ljust(width)}  {'Runs':>5}  {'p50':>7}  {'p90':>7}  {'Last':>7}  {'Trend':>6}")
+        for kind, name, stats in entries:
+            line = (f"{(kind + ' ' + name).ljust(width)}  {stats['count']:>5}  {seconds(stats['p50']):>7}  {seconds(stats['p90']):>7}"
+                    f"  {seconds(stats['last']):>7}  {trend(stats):>6}  {regression(stats)}")
+            print(line.rstrip())
+
+def handle_bite_results(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'results merge' command, combining TRX files or Cobertura reports into one.
+    """
+    if extras:
+        host.get_argparser().error(f"Invalid arguments: {extras}")
+
+    import glob
+    import os
+    import xml.etree.ElementTree as ET
+    from . import results
+
+    patterns = args.files or [os.path.join(host.CACHE_DIR, 'shards', '*.trx')]
+    files: List[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        files.extend(m for m in matches if m not in files)
+    if args.output:
+        files = [f for f in files if os.path.abspath(f) != os.path.abspath(args.output)]
+    if not files:
+        host.get_argparser().error(f"No files found matching {', '.join(patterns)}.")
+
+    formats = {}
+    for path in files:
+        if not os.path.isfile(path):
+            host.get_argparser().error(f"File '{path}' not found.")
+        formats[path] = results.detect_format(path)
+    unknown = [p for p, f in formats.items() if f is None]
+    if unknown:
+        host.get_argparser().error(f"Not a TRX file or Cobertura report: {', '.join(unknown)}")
+    if len(set(formats.values())) > 1:
+        host.get_argparser().error("TRX files and Cobertura reports must be merged separately.")
+
+    kind = formats[files[0]]
+    default_name = 'merged.trx' if kind == results.TRX else 'merged.cobertura.xml'
+    output = args.output or os.path.join(host.CACHE_DIR, 'results', default_name)
+    try:
+        if kind == results.TRX:
+            counters = results.merge_trx(files, output)
+            summary = f"{counters.get('total', 0)} tests, {counters.get('passed', 0)} passed, {counters.get('failed', 0)} failed"
+        else:
+            totals = results.merge_cobertura(files, output)
+            valid = totals['lines-valid']
+            summary = f"{totals['lines-covered']}/{valid} lines covered ({totals['lines-covered'] / valid if valid else 1:.1%})"
+    except (ET.ParseError, ValueError, OSError) as e:
+        print(f"Merge failed: {e}")
+        sys.exit(1)
+    print(f"Merged {len(files)} files into {os.path.relpath(output, host.BASE_DIR)}: {summary}")
 
 def handle_bite_list(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
     """
@@ -82,6 +323,209 @@ def handle_bite_list(host: Host, args: argparse.Namespace, extras: List[str]) ->
                     print(f"      - {file}")
             print()
 
+def handle_bite_projects(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'projects' command, listing the projects of the solution in build order.
+    """
+    if extras:
+        host.get_argparser().error("The 'projects' command does not accept any extra arguments.")
+
+    import os
+
+    verbose = getattr(args, 'verbose', False)
+    graph = host.get_solution_graph()
+    try:
+        order = graph.topological_order()
+    except ValueError as e:
+        host.get_argparser().error(str(e))
+
+    print(f"Projects of {os.path.basename(graph.solution)}:")
+    for node in order:
+        line = f"  {node.name}"
+        if node.is_test:
+            line += " (test)"
+        if not node.in_solution:
+            line += " (not in solution)"
+        print(line)
+        if verbose:
+            print(f"    Path: {os.path.relpath(node.path, host.BASE_DIR)}")
+            print(f"    Target frameworks: {', '.join(node.target_frameworks) or '-'}")
+            for dep in graph.dependencies(node.path):
+                print(f"    Project: {dep.name}")
+            for package, version in node.package_references.items():
+                print(f"    Package: {package}{f' {version}' if version else ''}")
+            print()
+
+def handle_bite_watch(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'watch' command, running build, pack or test again when files change.
+    Only the projects affected by the changes run again, and a run that is still in
+    progress when new changes arrive is cancelled and merged into the next one.
+    Passes any extra arguments to the dotnet CLI.
+    """
+    import os
+    import threading
+    from . import watch
+    from .scheduler import SUCCEEDED
+
+    command = args.watch_command
+    if args.parallel is not None and args.parallel < 1:
+        host.get_argparser().error("The 'parallel' option must be a positive number of processes.")
+    no_restore = '--no-restore' in extras
+    msbuild_suffixes = ('.sln', 'proj', '.props', '.targets', 'packages.lock.json')
+
+    def _run(projects: List[str], restore: bool, cancelled: threading.Event, state: Dict[str, Any]) -> None:
+        graph = host.get_solution_graph()
+        if restore and not no_restore:
+            if not host.restore_solution(*extras):
+                print("Restore failed.")
+                state['restore_failed'] = True
+                return
+        if cancelled.is_set():
+            return
+        scheduler = host.create_scheduler(command, *extras, max_workers=args.parallel, graph=graph.subset(projects))
+        state['scheduler'] = scheduler
+        if cancelled.is_set():
+            return
+        scheduler.run()
+        if scheduler.cancelled:
+            print("Run cancelled, files changed.")
+            return
+        scheduler.print_summary()
+        print("Watching for changes, press Ctrl+C to stop.")
+
+    def _start(projects: List[str], restore: bool) -> Dict[str, Any]:
+        state: Dict[str, Any] = {'projects': projects, 'restore': restore, 'cancelled': threading.Event()}
+        thread = threading.Thread(target=_run, args=(projects, restore, state['cancelled'], state), daemon=True)
+        state['thread'] = thread
+        thread.start()
+        return state
+
+    try:
+        graph = host.get_solution_graph()
+        graph.topological_order()
+    except ValueError as e:
+        host.get_argparser().error(str(e))
+
+    watcher = watch.create_watcher(*watch.get_watched_paths(graph, host.BASE_DIR), poll=args.poll)
+    print(f"Watching {len(graph.projects)} projects ({type(watcher).__name__}), running '{command}'.")
+    current = _start(list(graph.projects), True)
+    try:
+        while True:
+            changes = watcher.wait(None, args.debounce / 1000)
+            if not changes:
+                continue
+            graph = host.get_solution_graph()
+            restore = any(c == watch.OVERFLOW or c.endswith(msbuild_suffixes) for c in changes)
+            if restore:
+                # Project files changed, projects may have been added or removed
+                watcher.close()
+                watcher = watch.create_watcher(*watch.get_watched_paths(graph, host.BASE_DIR), poll=args.poll)
+            affected = watch.get_affected_projects(graph, changes)
+            if not affected:
+                continue
+
+            thread = current['thread']
+            if thread.is_alive():
+                current['cancelled'].set()
+                scheduler = current.get('scheduler')
+                if scheduler is not None:
+                    scheduler.cancel()
+                thread.join()
+            # Whatever didn't complete in the previous run has to run again
+            scheduler = current.get('scheduler')
+            results = scheduler.results if scheduler is not None else {}
+            unfinished = [p for p in current['projects'] if p not in results or results[p].status != SUCCEEDED]
+            restore = restore or current.get('restore_failed', False) or (current['restore'] and scheduler is None)
+
+            projects = graph.get_dependents_closure(affected + unfinished)
+            names = sorted({os.path.relpath(c, host.BASE_DIR) for c in changes if c != watch.OVERFLOW})
+            print(f"\nChanged: {', '.join(names[:5])}{' ...' if len(names) > 5 else ''}")
+            print(f"Running '{command}' for {', '.join(graph.projects[p].name for p in projects)}.")
+            current = _start(projects, restore)
+    except KeyboardInterrupt:
+        current['cancelled'].set()
+        scheduler = current.get('scheduler')
+        if scheduler is not None:
+            scheduler.cancel()
+        current['thread'].join()
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+
+def handle_bite_daemon(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
+    """
+    Handle the 'daemon' command, starting, stopping or querying the pybite daemon.
+    While the daemon runs, build.py forwards commands to it instead of running them itself.
+    """
+    if extras:
+        host.get_argparser().error(f"Invalid arguments: {extras}")
+
+    import os
+    import time
+    from . import daemon
+
+    if not daemon.is_supported():
+        host.get_argparser().error("The daemon is only supported on POSIX systems.")
+
+    socket_path = host.get_daemon_socket_path()
+    status = daemon.request(socket_path, 'status')
+    action = args.action
+
+    if action == 'status':
+        if status is None:
+            print("The pybite daemon is not running.")
+        else:
+            print(f"The pybite daemon is running (pid {status['pid']}, up {status['uptime']:.0f}s, "
+                  f"{status['commands']} commands, {status['reloads']} reloads, {status['running']} running).")
+        return
+
+    if action == 'stop':
+        if status is None:
+            print("The pybite daemon is not running.")
+            return
+        daemon.request(socket_path, 'stop')
+        for _ in range(100):
+            if not os.path.exists(socket_path):
+                break
+            time.sleep(0.1)
+        print("The pybite daemon was stopped.")
+        return
+
+    if status is not None:
+        print(f"The pybite daemon is already running (pid {status['pid']}).")
+        return
+
+    if args.foreground:
+        def create_host() -> Host:
+            new_host = type(host)(host.name, host.description)
+            new_host.load_modules()
+            new_host.get_argparser()
+            return new_host
+
+        server = daemon.DaemonServer(create_host, socket_path, host=host, idle_timeout=args.idle_timeout)
+        print(f"The pybite daemon is listening on {socket_path}")
+        sys.stdout.flush()
+        server.serve_forever()
+        return
+
+    import subprocess
+
+    cmd = [sys.executable, os.path.abspath(sys.argv[0]), 'daemon', 'start', '--foreground']
+    if args.idle_timeout is not None:
+        cmd += ['--idle-timeout', str(args.idle_timeout)]
+    os.makedirs(host.CACHE_DIR, exist_ok=True)
+    with open(os.path.join(host.CACHE_DIR, 'daemon.log'), 'ab') as log:
+        subprocess.Popen(cmd, cwd=host.BASE_DIR, stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    for _ in range(100):
+        status = daemon.request(socket_path, 'status')
+        if status is not None:
+            print(f"The pybite daemon was started (pid {status['pid']}).")
+            return
+        time.sleep(0.1)
+    print(f"The pybite daemon did not start, see {os.path.join(host.CACHE_DIR, 'daemon.log')}.")
+    sys.exit(1)
+
 def handle_bite_install(host: Host, args: argparse.Namespace, extras: List[str]) -> None:
     """
     Handle the 'install' command, installing module.
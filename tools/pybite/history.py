@@ -0,0 +1,333 @@
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Iterable, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    command TEXT NOT NULL,
+    key TEXT NOT NULL,
+    args TEXT NOT NULL,
+    git_commit TEXT,
+    duration REAL NOT NULL,
+    exit_code INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (key, started);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timings_name ON timings (kind, name);
+"""
+
+
+def get_git_commit(path: str) -> Optional[str]:
+    """
+    Get the commit checked out in the git repository containing path, by reading the
+    .git directory instead of starting git.
+
+    Returns:
+        Optional[str]: The commit hash, or None if it can't be determined.
+    """
+    path = os.path.abspath(path)
+    while True:
+        git_dir = os.path.join(path, '.git')
+        if os.path.exists(git_dir):
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+    try:
+        if os.path.isfile(git_dir):
+            # Worktrees and submodules: "gitdir: <path>"
+            with open(git_dir, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content.startswith('gitdir:'):
+                return None
+            git_dir = os.path.normpath(os.path.join(path, content[len('gitdir:'):].strip()))
+        with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+            head = f.read().strip()
+        if not head.startswith('ref:'):
+            return head or None
+        ref = head[len('ref:'):].strip()
+
+        # Refs of worktrees are stored in the common directory
+        common_dir = git_dir
+        commondir_file = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(commondir_file):
+            with open(commondir_file, 'r', encoding='utf-8') as f:
+                common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        for directory in dict.fromkeys([git_dir, common_dir]):
+            ref_file = os.path.join(directory, *ref.split('/'))
+            if os.path.isfile(ref_file):
+                with open(ref_file, 'r', encoding='utf-8') as f:
+                    return f.read().strip() or None
+        packed = os.path.join(common_dir, 'packed-refs')
+        if os.path.isfile(packed):
+            with open(packed, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split(' ', 1)
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Get a percentile of values with linear interpolation between the closest ranks.
+
+    Args:
+        values: The values, not necessarily sorted.
+        p: The percentile, between 0 and 100.
+    """
+    if not values:
+        raise ValueError('percentile of an empty list')
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(
+    durations: List[float],
+    factor: float,
+    window: int = 20,
+    min_runs: int = 5,
+    min_delta: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Compute the statistics shown by the stats command for durations in chronological order.
+
+    The trend compares the median of the newer half of the durations with the median of the
+    older half. The last duration is a regression when it is slower than the median of the
+    window of durations before it by more than factor.
+
+    Args:
+        durations: The durations, oldest first.
+        factor: The regression factor.
+        window: Number of previous durations the baseline is computed from.
+        min_runs: Minimum number of previous durations needed for a baseline.
+        min_delta: Minimum difference with the baseline for a regression, so noise in short durations is ignored.
+
+    Returns:
+        Dict[str, Any]: count, p50, p90, p95, max, last, trend (a ratio, or None) and
+        baseline (a duration, or None) and regression (bool).
+    """
+    stats: Dict[str, Any] = {'count': len(durations), 'trend': None, 'baseline': None, 'regression': False}
+    if not durations:
+        return stats
+    for p in (50, 90, 95):
+        stats[f'p{p}'] = percentile(durations, p)
+    stats['max'] = max(durations)
+    stats['last'] = durations[-1]
+    if len(durations) >= 4:
+        half = len(durations) // 2
+        older = percentile(durations[:half], 50)
+        if older > 0:
+            stats['trend'] = percentile(durations[-half:], 50) / older - 1
+    previous = durations[:-1][-window:]
+    if len(previous) >= min_runs:
+        baseline = percentile(previous, 50)
+        stats['baseline'] = baseline
+        stats['regression'] = baseline > 0 and durations[-1] > baseline * factor and durations[-1] - baseline >= min_delta
+    return stats
+
+
+class HistoryStore:
+    """
+    SQLite database with the duration of every dispatched command and the timings of the
+    targets and projects it ran.
+
+    The database uses write-ahead logging, so concurrent invocations can read while another
+    one writes, and every run is written in a single short transaction.
+    """
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        """
+        Args:
+            path: Path to the database file, created if missing.
+            timeout: Seconds to wait for a lock held by another invocation.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._conn: Optional["sqlite3.Connection"] = None
+
+    def _connect(self) -> "sqlite3.Connection":
+        if self._conn is None:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for statement in _SCHEMA.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def record(
+        self,
+        command: str,
+        key: str,
+        args: List[str],
+        duration: float,
+        exit_code: int,
+        git_commit: Optional[str] = None,
+        timings: Iterable[Tuple[str, str, float]] = (),
+        started: Optional[float] = None,
+    ) -> int:
+        """
+        Record a run.
+
+        Args:
+            command: The dispatched command.
+            key: The name runs are compared by, such as the command with its targets.
+            args: The command line arguments.
+            duration: Wall time in seconds.
+            exit_code: The exit code.
+            git_commit: The checked out commit.
+            timings: (kind, name, seconds) of the targets, projects or tasks of the run.
+            started: Start time as a Unix timestamp, defaults to now minus the duration.
+
+        Returns:
+            int: The id of the recorded run.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute(
+                'INSERT INTO runs (started, command, key, args, git_commit, duration, exit_code) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (started if started is not None else time.time() - duration, command, key, json.dumps(args), git_commit, duration, exit_code),
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO timings (run_id, kind, name, duration) VALUES (?, ?, ?, ?)',
+                [(run_id, kind, name, seconds) for kind, name, seconds in timings],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return int(run_id)
+
+    def get_keys(self) -> List[str]:
+        """
+        Get the keys of all recorded runs, most recently run first.
+        """
+        rows = self._connect().execute('SELECT key FROM runs GROUP BY key ORDER BY MAX(started) DESC').fetchall()
+        return [r[0] for r in rows]
+
+    def get_runs(self, key: str, limit: Optional[int] = None, successful: bool = True) -> List[Dict[str, Any]]:
+        """
+        Get the runs of a key, oldest first.
+
+        Args:
+            key: The key of the runs.
+            limit: Only return the most recent runs.
+            successful: If True, only return runs that exited with 0.
+        """
+        query = 'SELECT id, started, command, args, git_commit, duration, exit_code FROM runs WHERE key = ?'
+        if successful:
+            query += ' AND exit_code = 0'
+        query += ' ORDER BY started DESC'
+        params: List[Any] = [key]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [
+            {'id': r[0], 'started': r[1], 'command': r[2], 'args': json.loads(r[3]), 'git_commit': r[4], 'duration': r[5], 'exit_code': r[6]}
+            for r in reversed(rows)
+        ]
+
+    def get_timings(self, key: str, limit: Optional[int] = None) -> Dict[Tuple[str, str], List[float]]:
+        """
+        Get the timings recorded for the successful runs of a key, oldest first.
+
+        Returns:
+            Dict[Tuple[str, str], List[float]]: The durations by (kind, name).
+        """
+        query = (
+            'SELECT t.kind, t.name, t.duration FROM timings t JOIN '
+            '(SELECT id, started FROM runs WHERE key = ? AND exit_code = 0 ORDER BY started DESC LIMIT ?) r '
+            'ON t.run_id = r.id ORDER BY r.started'
+        )
+        result: Dict[Tuple[str, str], List[float]] = {}
+        for kind, name, duration in self._connect().execute(query, (key, limit or -1)):
+            result.setdefault((kind, name), []).append(duration)
+        return result
+
+    def get_recent_timings(self, kind: str, limit: int = 10) -> Dict[str, float]:
+        """
+        Get the median of the last recorded durations of every entry of a kind, across all keys.
+
+        Args:
+            kind: The kind of the entries, such as 'test'.
+            limit: Number of last durations per entry the median is computed from.
+
+        Returns:
+            Dict[str, float]: Seconds by entry name.
+        """
+        query = (
+            'SELECT t.name, t.duration FROM timings t JOIN runs r ON t.run_id = r.id '
+            'WHERE t.kind = ? ORDER BY r.started DESC'
+        )
+        values: Dict[str, List[float]] = {}
+        for name, duration in self._connect().execute(query, (kind,)):
+            recent = values.setdefault(name, [])
+            if len(recent) < limit:
+                recent.append(duration)
+        return {name: percentile(durations, 50) for name, durations in values.items()}
+
+    def check_regression(
+        self,
+        key: str,
+        factor: float,
+        window: int = 20,
+        min_runs: int = 5,
+        min_delta: float = 0.0,
+    ) -> Optional[float]:
+        """
+        Check whether the last successful run of a key is slower than its rolling baseline,
+        the median of the runs before it, by more than a factor.
+
+        Args:
+            key: The key of the runs.
+            factor: The regression factor.
+            window: Number of previous runs the baseline is computed from.
+            min_runs: Minimum number of previous runs needed for a baseline.
+            min_delta: Minimum difference with the baseline in seconds.
+
+        Returns:
+            Optional[float]: The baseline if the last run is a regression, otherwise None.
+        """
+        stats = summarize([r['duration'] for r in self.get_runs(key, window + 1)], factor, window, min_runs, min_delta)
+        return stats['baseline'] if stats['regression'] else None
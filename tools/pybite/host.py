@@ -2,14 +2,21 @@ import argparse
 import glob
 import importlib.util
 import os
-import platform
 import subprocess
-import urllib.request
-from typing import Optional, Dict, Any, List, Callable
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Callable, Tuple
 
 from .global_json import GlobalJson
-from .msbuild import MSBuildFile, MSBuildTarget
-from .module import Module
+from . import sdk
+
+if TYPE_CHECKING:
+    from .msbuild import MSBuildTarget, MSBuildEvaluation, MSBuildTargetGraph
+    from .module import Module, ModuleIndex
+    from .solution import SolutionGraph, ProjectNode
+    from .scheduler import ParallelScheduler
+    from .process import StreamingProcess
+    from .perf import PerfReport
+    from .history import HistoryStore
+    from .shard import ShardRunner, TestUnit
 
 
 class Host:
@@ -27,6 +34,9 @@ class Host:
     DOTNET_DIR: str = '.dotnet'
     """Relative or absolute path to the .NET SDK directory."""
 
+    CACHE_DIR: str = os.path.join('artifacts', 'pybite')
+    """Relative or absolute path to the pybite cache directory."""
+
     SOLUTION_PATH: Optional[str] = None
     """Optional override for the solution (.sln) file."""
 
@@ -53,6 +63,21 @@ class Host:
     ]
     """List of default dotnet commands and their help descriptions."""
 
+    PARALLEL_COMMANDS: List[str] = ['build', 'pack', 'test']
+    """Built-in dotnet commands that can be run per project with --parallel."""
+
+    HISTORY_IGNORED_COMMANDS: List[str] = ['stats', 'daemon', 'watch']
+    """Commands that are not recorded in the history, set the PYBITE_HISTORY environment variable to 0 to disable it."""
+
+    REGRESSION_FACTOR: float = 1.5
+    """A command is reported as a regression when it is slower than its rolling baseline by this factor."""
+
+    REGRESSION_WINDOW: int = 20
+    """Number of previous successful runs the rolling baseline is the median of."""
+
+    REGRESSION_MIN_SECONDS: float = 1.0
+    """Minimum slowdown in seconds reported after a command, so noise in short commands is ignored."""
+
     def __init__(
         self,
         app: str,
@@ -75,18 +100,21 @@ class Host:
             self.MODULES_DIR = os.path.join(self.BASE_DIR, self.MODULES_DIR)
         if not os.path.isabs(self.DOTNET_DIR):
             self.DOTNET_DIR = os.path.join(self.BASE_DIR, self.DOTNET_DIR)
+        if not os.path.isabs(self.CACHE_DIR):
+            self.CACHE_DIR = os.path.join(self.BASE_DIR, self.CACHE_DIR)
         if self.SOLUTION_PATH and not os.path.isabs(self.SOLUTION_PATH):
             self.SOLUTION_PATH = os.path.join(self.BASE_DIR, self.SOLUTION_PATH)
         if not os.path.isabs(self.BITE_PROJ_PATH):
             self.BITE_PROJ_PATH = os.path.join(self.BASE_DIR, self.BITE_PROJ_PATH)
 
-        self.DEFAULT_ARGS.append(f'/p:BiteModulesPath={self.msbuild_path(self.MODULES_DIR)}')
+        self.DEFAULT_ARGS = self.DEFAULT_ARGS + [f'/p:BiteModulesPath={self.msbuild_path(self.MODULES_DIR)}']
 
         try:
             self.global_json: Optional[GlobalJson] = GlobalJson(os.path.join(self.BASE_DIR, 'global.json'))
         except FileNotFoundError:
             self.global_json = None
 
+        self.ENVIRONMENT_VARIABLES = dict(self.ENVIRONMENT_VARIABLES)
         self.ENVIRONMENT_VARIABLES['PATH'] = (
             self.DOTNET_DIR + os.pathsep + os.environ.get('PATH', '')
         )
@@ -97,6 +125,16 @@ class Host:
         self.argparser: Optional[argparse.ArgumentParser] = None
         self.handlers: Dict[str, Callable[["Host", argparse.Namespace, List[str]], None]] = {}
         self._subparsers_action: Optional[argparse._SubParsersAction] = None
+        self._module_index: Optional["ModuleIndex"] = None
+        self._loaded_plugins: Dict[str, Any] = {}
+        self._deferred_commands: Dict[str, List[str]] = {}
+        self.bite_targets_source: Optional[str] = None
+        self.timings: List[Tuple[str, str, float]] = []
+        """(kind, name, seconds) of the projects and targets run by the current command, recorded in the history."""
+        self.failed_returncode: Optional[int] = None
+        """Exit code of the last dotnet process of the current command that failed."""
+        self._argv: Optional[List[str]] = None
+        self._history: Optional["HistoryStore"] = None
 
     # --- CLI and Command Registration ---
 
@@ -129,13 +167,22 @@ class Host:
 
         # Register built-in dotnet commands (sorted by name)
         for cmd in sorted(self.DOTNET_COMMANDS, key=lambda c: c['name']):
-            subparsers.add_parser(
+            cmd_parser = subparsers.add_parser(
                 cmd['name'],
                 help=cmd['help'],
                 epilog=self.argparser_epilog + ' (Dotnet CLI)',
                 usage=self.argparser_usage.replace('command', cmd['name']),
                 add_help=False,
             )
+            cmd_parser.add_argument('--timing', action='store_true', help='Print the slowest projects, targets and tasks and write them as JSON')
+            if cmd['name'] in self.PARALLEL_COMMANDS:
+                cmd_parser.add_argument('--parallel', nargs='?', const=0, type=int, metavar='N',
+                                        help='Run the command per project in dependency order, with up to N processes (default: CPU count)')
+            if cmd['name'] == 'test':
+                cmd_parser.add_argument('--shards', type=int, default=None, metavar='N', help='Split the tests into N shards balanced by their recorded durations and run them in parallel')
+                cmd_parser.add_argument('--shard', default=None, metavar='I/N', help='Only run shard I of N, to distribute the tests over machines')
+                cmd_parser.add_argument('--shard-durations', action='append', default=None, metavar='FILE',
+                                        help='Balance the shards by the test durations of these files instead of the local history. Without it, --shard balances by test count')
             self.register_handler(cmd['name'], handlers.handle_dotnet_builtin)
 
         subparsers.add_parser(
@@ -156,6 +203,74 @@ class Host:
         list_parser.add_argument('-v', '--verbose', action='store_true', help='Show verbose output')
         self.register_handler('list', handlers.handle_bite_list)
 
+        projects_parser = subparsers.add_parser(
+            'projects',
+            help='List the projects of the solution in build order',
+            usage=self.argparser_usage.replace('command', 'projects'),
+        )
+
+        projects_parser.add_argument('-v', '--verbose', action='store_true', help='Show project and package references')
+        self.register_handler('projects', handlers.handle_bite_projects)
+
+        watch_parser = subparsers.add_parser(
+            'watch',
+            help='Run a command again for the projects affected by each change',
+            usage=self.argparser_usage.replace('command', 'watch') + ' [build|pack|test]',
+        )
+
+        watch_parser.add_argument('watch_command', nargs='?', choices=self.PARALLEL_COMMANDS, default='build', metavar='command', help='Command to run, default is "build"')
+        watch_parser.add_argument('--parallel', type=int, default=None, metavar='N', help='Maximum number of concurrent processes (default: CPU count)')
+        watch_parser.add_argument('--debounce', type=int, default=300, metavar='MS', help='Wait until no file changed for this many milliseconds (default: 300)')
+        watch_parser.add_argument('--poll', action='store_true', help='Poll for changes instead of using inotify')
+        self.register_handler('watch', handlers.handle_bite_watch)
+
+        perf_parser = subparsers.add_parser(
+            'perf',
+            help='Show the timing report of a saved MSBuild log',
+            usage=self.argparser_usage.replace('command', 'perf') + ' [log]',
+        )
+
+        perf_parser.add_argument('log', help='MSBuild log containing a performance summary')
+        perf_parser.add_argument('-n', '--top', type=int, default=10, help='Number of entries shown per kind (default: 10)')
+        perf_parser.add_argument('--json', default=None, metavar='PATH', help='Where to write the JSON report, default is next to the log')
+        self.register_handler('perf', handlers.handle_bite_perf)
+
+        results_parser = subparsers.add_parser(
+            'results',
+            help='Merge test results and coverage reports of parallel runs',
+            usage=self.argparser_usage.replace('command', 'results') + ' merge [file ...]',
+        )
+
+        results_parser.add_argument('action', choices=['merge'], help='Action to perform')
+        results_parser.add_argument('files', nargs='*', help='TRX files or Cobertura reports, wildcards are expanded. Default is the TRX files of the last sharded test run')
+        results_parser.add_argument('-o', '--output', default=None, metavar='PATH', help='Path of the merged file, default is merged.trx or merged.cobertura.xml in the results directory of the cache')
+        self.register_handler('results', handlers.handle_bite_results)
+
+        stats_parser = subparsers.add_parser(
+            'stats',
+            help='Show the duration percentiles and trends of previous commands',
+            usage=self.argparser_usage.replace('command', 'stats') + ' [command ...]',
+        )
+
+        stats_parser.add_argument('key', nargs='*', metavar='command', help='Only show this command, such as "build" or "run Stamp"')
+        stats_parser.add_argument('-n', '--last', type=int, default=50, metavar='N', help='Number of recent successful runs considered (default: 50)')
+        stats_parser.add_argument('--factor', type=float, default=self.REGRESSION_FACTOR, help=f'Report a regression when the last run is slower than its baseline by this factor (default: {self.REGRESSION_FACTOR})')
+        stats_parser.add_argument('--window', type=int, default=self.REGRESSION_WINDOW, metavar='N', help=f'Number of runs the baseline is the median of (default: {self.REGRESSION_WINDOW})')
+        stats_parser.add_argument('--timings', action='store_true', help='Also show the projects and targets recorded with --timing or --parallel')
+        stats_parser.add_argument('--top', type=int, default=10, help='Number of projects and targets shown with --timings (default: 10)')
+        self.register_handler('stats', handlers.handle_bite_stats)
+
+        daemon_parser = subparsers.add_parser(
+            'daemon',
+            help='Manage the background process that runs commands without startup cost',
+            usage=self.argparser_usage.replace('command', 'daemon') + ' [start|stop|status]',
+        )
+
+        daemon_parser.add_argument('action', nargs='?', choices=['start', 'stop', 'status'], default='status', help='Action to perform, default is "status"')
+        daemon_parser.add_argument('--foreground', action='store_true', help='Run the daemon in this process instead of in the background')
+        daemon_parser.add_argument('--idle-timeout', type=float, default=None, metavar='SECONDS', help='Stop the daemon after this many seconds without commands')
+        self.register_handler('daemon', handlers.handle_bite_daemon)
+
         install_parser = subparsers.add_parser(
             'install',
             help='Install new bite module',
@@ -192,10 +307,16 @@ class Host:
                 'run',
                 help='Run a bite.core target',
                 epilog=self.argparser_epilog + ' (MSBuild)',
-                usage=self.argparser_usage.replace('command', 'run') + ' [target]',
+                usage=self.argparser_usage.replace('command', 'run') + ' [target ...]',
             )
-            run_parser.add_argument('target', nargs='?', default='help', help='bite.core target to run, default is "help"')
+            run_parser.add_argument('target', nargs='*', default=['help'], help='bite.core targets to run in a single MSBuild invocation, default is "help"')
             run_parser.add_argument('-l', '-ts', '--list', action='store_true', help='List available targets')
+            run_parser.add_argument('--plan', action='store_true', help='Show the execution order of the targets without running MSBuild')
+            run_parser.add_argument('-i', '--incremental', action='store_true', help='Skip the requested targets whose planned targets all declare Inputs and Outputs that are up to date, and MSBuild when none is left')
+            run_parser.add_argument('--why', action='store_true', help='Report why each target is out of date, implies --incremental')
+            run_parser.add_argument('--hash', action='store_true', help='Compare input content hashes instead of timestamps, implies --incremental')
+            run_parser.add_argument('--timing', action='store_true', help='Print the slowest targets and tasks and write them as JSON')
+            run_parser.add_argument('--refresh', action='store_true', help='Re-evaluate bite.proj instead of using the cached target list')
             self.register_handler('run', handlers.handle_bite_run)
 
         self.argparser = parser
@@ -219,6 +340,10 @@ class Host:
             help: Help string for the command.
             arguments: List of dicts with keys for add_argument (optional).
         """
+        if name in self._deferred_commands:
+            # The subparser was already created from the module.json declaration
+            self.register_handler(name, handler)
+            return
         self.get_argparser()
         subparsers = self._subparsers_action
         if subparsers is None:
@@ -239,6 +364,24 @@ class Host:
         """
         self.handlers[command] = handler
 
+    def execute(self, argv: Optional[List[str]] = None) -> None:
+        """
+        Parse a command line, install the required .NET SDK if needed and dispatch the command.
+
+        Args:
+            argv: The arguments, without the program name. Defaults to sys.argv[1:].
+        """
+        import sys
+
+        self._argv = list(sys.argv[1:] if argv is None else argv)
+        args, unknown = self.get_argparser().parse_known_args(self._argv)
+
+        if self.requested_sdk is not None:
+            print(f'Installing .NET SDK {self.requested_sdk}')
+            self._install_sdk()
+
+        self.dispatch(args, unknown)
+
     def dispatch(self, args: argparse.Namespace, unknown_args: Optional[List[str]] = None) -> None:
         """
         Dispatch the parsed arguments to the appropriate handler.
@@ -249,61 +392,637 @@ class Host:
         """
         extras = unknown_args or []
         command = getattr(args, 'command', None)
-        if command and command in self.handlers:
-            self.handlers[command](self, args, extras)
-        else:
+        if not command or command not in self.handlers:
             self.get_argparser().print_help()
+            return
+        if command in self.HISTORY_IGNORED_COMMANDS or os.environ.get('PYBITE_HISTORY') == '0':
+            self.handlers[command](self, args, extras)
+            return
+
+        import time
+
+        self.timings = []
+        self.failed_returncode = None
+        start = time.monotonic()
+        exit_code = 0
+        try:
+            self.handlers[command](self, args, extras)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            raise
+        except KeyboardInterrupt:
+            exit_code = 130
+            raise
+        except BaseException:
+            exit_code = 1
+            raise
+        finally:
+            if exit_code == 0 and self.failed_returncode:
+                exit_code = self.failed_returncode
+            self._record_history(command, args, extras, time.monotonic() - start, exit_code)
+
+    @staticmethod
+    def get_history_key(args: argparse.Namespace) -> str:
+        """
+        Get the name runs of a command are compared by: the command, with the targets for 'run'
+        and a marker for --parallel, since those change what is measured.
+        """
+        key = [args.command]
+        if args.command == 'run':
+            if getattr(args, 'list', False) or getattr(args, 'plan', False):
+                key.append('--list' if getattr(args, 'list', False) else '--plan')
+            key += getattr(args, 'target', None) or ['help']
+        if getattr(args, 'parallel', None) is not None:
+            key.append('--parallel')
+        if getattr(args, 'shards', None) is not None:
+            key.append('--shards')
+        if getattr(args, 'shard', None) is not None:
+            key.append('--shard')
+        return ' '.join(key)
+
+    def get_history(self) -> "HistoryStore":
+        """
+        Get the command history stored in CACHE_DIR.
+        """
+        if self._history is None:
+            from .history import HistoryStore
+            self._history = HistoryStore(os.path.join(self.CACHE_DIR, 'history.db'))
+        return self._history
+
+    def record_timing(self, kind: str, name: str, seconds: float) -> None:
+        """
+        Add the duration of a project, target or step of the current command to its history record.
+
+        Args:
+            kind: The kind of the entry, such as 'project' or 'target'.
+            name: The name of the entry.
+            seconds: The duration.
+        """
+        self.timings.append((kind, name, seconds))
+
+    def _record_history(self, command: str, args: argparse.Namespace, extras: List[str], duration: float, exit_code: int) -> None:
+        """
+        Record a dispatched command and warn when it is slower than its rolling baseline.
+        Failing to record never fails the command.
+        """
+        try:
+            import sqlite3
+        except ImportError:
+            # Python built without SQLite
+            return
+        from .history import get_git_commit
+
+        key = self.get_history_key(args)
+        try:
+            history = self.get_history()
+            history.record(
+                command,
+                key,
+                self._argv if self._argv is not None else [command] + extras,
+                duration,
+                exit_code,
+                get_git_commit(self.BASE_DIR),
+                self.timings,
+            )
+            baseline = None
+            if exit_code == 0:
+                baseline = history.check_regression(key, self.REGRESSION_FACTOR, self.REGRESSION_WINDOW, min_delta=self.REGRESSION_MIN_SECONDS)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not record the command history: {e}")
+            return
+        if baseline is not None:
+            print(f"Regression: '{key}' took {duration:.1f}s, {duration / baseline:.1f}x its baseline of {baseline:.1f}s. Run 'stats' for details.")
+
+    @classmethod
+    def get_daemon_socket_path(cls) -> str:
+        """
+        Get the path of the Unix socket the daemon listens on, inside CACHE_DIR.
+        This doesn't need a Host instance, so clients can connect without creating one.
+        """
+        from . import daemon
+
+        cache_dir = cls.CACHE_DIR if os.path.isabs(cls.CACHE_DIR) else os.path.join(cls.BASE_DIR, cls.CACHE_DIR)
+        return daemon.get_socket_path(cache_dir)
 
     # --- Dotnet/MSBuild Execution ---
 
-    def run(self, command: str, *args: str, capture_output: bool = False) -> Optional[subprocess.CompletedProcess]:
+    def run(
+        self,
+        command: str,
+        *args: str,
+        capture_output: bool = False,
+        on_line: Optional[Callable[[str], None]] = None,
+        log_path: Optional[str] = None,
+    ) -> Optional[subprocess.CompletedProcess]:
         """
         Run a dotnet command.
 
+        Without on_line or log_path the process writes directly to the console, or its whole
+        standard output and error are captured separately with capture_output, like subprocess.run.
+        With on_line or log_path, the combined output is streamed line by line and only the last
+        lines are kept in memory, capture_output then only stops echoing it to the console.
+
         Args:
             command: The dotnet CLI command to run.
             *args: Additional arguments to pass to the command.
-            capture_output: If True, capture and return the output.
+            capture_output: If True, capture the output instead of printing it.
+            on_line: Function called with every line of output as it arrives.
+            log_path: Optional path of a file the output is written to as well.
 
         Returns:
-            subprocess.CompletedProcess if capture_output is True, otherwise None.
+            subprocess.CompletedProcess with the exit code, the output as stdout and stderr if it was
+            captured, or the last lines of the combined output as stdout if it was streamed.
         """
         cmd = ['dotnet', command] + list(args)
-        if capture_output:
-            return subprocess.run(cmd, capture_output=True, text=True)
+        if on_line or log_path:
+            from . import process
+            result = process.run(cmd, on_line=on_line, log_path=log_path, echo=not capture_output)
+        elif capture_output:
+            result = subprocess.run(cmd, capture_output=True, text=True)
         else:
-            subprocess.call(cmd)
-            return None
+            result = subprocess.CompletedProcess(cmd, subprocess.call(cmd))
+        if result.returncode != 0:
+            self.failed_returncode = result.returncode
+        return result
 
-    def run_builtin(self, command: str, *args: str, capture_output: bool = False) -> Optional[subprocess.CompletedProcess]:
+    def stream(self, command: str, *args: str, **kwargs: Any) -> "StreamingProcess":
+        """
+        Start a dotnet command and read its output line by line as it arrives.
+
+        Args:
+            command: The dotnet CLI command to run.
+            *args: Additional arguments to pass to the command.
+            **kwargs: Options of StreamingProcess, such as on_line, log_path or tail_lines.
+
+        Returns:
+            StreamingProcess: The started process, iterate over it to get the lines.
+        """
+        from .process import StreamingProcess
+
+        return StreamingProcess(['dotnet', command] + list(args), **kwargs)
+
+    def start(self, command: str, *args: str) -> subprocess.Popen:
+        """
+        Start a dotnet command with its standard output piped as a binary stream.
+
+        Args:
+            command: The dotnet CLI command to run.
+            *args: Additional arguments to pass to the command.
+
+        Returns:
+            subprocess.Popen: The started process.
+        """
+        cmd = ['dotnet', command] + list(args)
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def run_builtin(
+        self,
+        command: str,
+        *args: str,
+        capture_output: bool = False,
+        on_line: Optional[Callable[[str], None]] = None,
+        log_path: Optional[str] = None,
+        timing: bool = False,
+    ) -> Optional[subprocess.CompletedProcess]:
         """
         Run a built-in dotnet command with the solution file and default arguments.
 
         Args:
             command: The dotnet command to run (e.g., 'build', 'restore').
             *args: Additional arguments to pass to the dotnet cli.
-            capture_output: If True, capture and return the output.
+            capture_output: If True, capture the output instead of printing it.
+            on_line: Function called with every line of output as it arrives.
+            log_path: Optional path of a file the output is written to as well.
+            timing: If True, log the MSBuild performance summary and print a timing report.
 
         Returns:
-            subprocess.CompletedProcess if capture_output is True, otherwise None.
+            subprocess.CompletedProcess with the exit code, and the output as described in run.
         """
         cmd = [self.solution] + self.DEFAULT_ARGS + list(args)
-        return self.run(command, *cmd, capture_output=capture_output)
+        timing_log = self._get_timing_log(command) if timing else None
+        if timing_log:
+            from .perf import get_logger_args
+            cmd += get_logger_args(timing_log)
+        result = self.run(command, *cmd, capture_output=capture_output, on_line=on_line, log_path=log_path)
+        if timing_log:
+            self._record_perf_timings(self.report_timing(timing_log, references=True))
+        return result
+
+    def run_parallel(self, command: str, *args: str, max_workers: Optional[int] = None) -> Optional["ParallelScheduler"]:
+        """
+        Run a built-in dotnet command per project of the solution, in parallel.
+
+        The solution is restored once, then every project is started as soon as the projects
+        it references succeeded, without restoring or building its references again, so
+        concurrent processes never write the same outputs. For 'test', projects that aren't
+        test projects are built instead, with only the configuration, verbosity and property
+        arguments.
+
+        Args:
+            command: The dotnet command to run (e.g., 'build', 'pack', 'test').
+            *args: Additional arguments to pass to the dotnet cli for every project.
+            max_workers: Maximum number of concurrent processes, defaults to the CPU count.
+
+        Returns:
+            Optional[ParallelScheduler]: The scheduler with the result of every project, or None if the restore failed.
+
+        Raises:
+            ValueError: If the project references contain a cycle.
+        """
+        if '--no-restore' not in args and not self.restore_solution(*args):
+            return None
+        scheduler = self.create_scheduler(command, *args, max_workers=max_workers)
+        scheduler.run()
+        from .scheduler import SKIPPED
+
+        for path, result in scheduler.results.items():
+            if result.status != SKIPPED:
+                self.record_timing('project', os.path.relpath(path, self.BASE_DIR), result.duration)
+        return scheduler
+
+    def restore_solution(self, *args: str) -> bool:
+        """
+        Restore the solution once, with the MSBuild property switches of the given arguments.
 
-    def run_bite(self, target: str, *args: str, capture_output: bool = False) -> Optional[subprocess.CompletedProcess]:
+        Args:
+            *args: The arguments of the command the restore is for.
+
+        Returns:
+            bool: True if the restore succeeded.
+        """
+        properties = [a for a in self._get_build_args(args) if a.split(':', 1)[0].lstrip('-/').lower() in ('p', 'property')]
+        restore = self.run_builtin('restore', *properties)
+        return restore is None or restore.returncode == 0
+
+    def create_scheduler(
+        self,
+        command: str,
+        *args: str,
+        max_workers: Optional[int] = None,
+        graph: Optional["SolutionGraph"] = None,
+    ) -> "ParallelScheduler":
+        """
+        Create a scheduler that runs a built-in dotnet command per project, without restoring.
+        See run_parallel.
+
+        Args:
+            command: The dotnet command to run (e.g., 'build', 'pack', 'test').
+            *args: Additional arguments to pass to the dotnet cli for every project.
+            max_workers: Maximum number of concurrent processes, defaults to the CPU count.
+            graph: The projects to run the command for, defaults to the solution graph.
+
+        Returns:
+            ParallelScheduler: The scheduler, not started yet.
+        """
+        from .scheduler import ParallelScheduler
+
+        build_args = self._get_build_args(args)
+
+        def get_command(node: "ProjectNode") -> List[str]:
+            if command == 'test' and not node.is_test:
+                cmd, extra = 'build', build_args
+            else:
+                cmd, extra = command, [a for a in args if a != '--no-restore']
+            return ['dotnet', cmd, node.path] + self.DEFAULT_ARGS + ['--no-restore', '-p:BuildProjectReferences=false'] + list(extra)
+
+        return ParallelScheduler(graph or self.get_solution_graph(), get_command, max_workers)
+
+    def run_test_shards(
+        self,
+        *args: str,
+        count: int,
+        index: Optional[int] = None,
+        durations_files: Optional[List[str]] = None,
+    ) -> Optional["ShardRunner"]:
+        """
+        Run the tests of the solution split into shards, every shard in its own processes.
+
+        The solution is built once, then the tests of every test project are listed, cached per
+        assembly hash, and grouped by test class. Classes are distributed over the shards by
+        their durations, or by test count when none are known, and the durations of this run are
+        recorded for the next one from the TRX results, and written to durations.json next to them.
+
+        Every machine running a single shard must compute the same partition, so the durations
+        only come from the given files then, never from the history of the machine.
+
+        Args:
+            *args: Additional arguments to pass to dotnet test. A --filter is combined with the shard filter.
+            count: Number of shards.
+            index: 1-based shard to run, or None to run all shards in parallel.
+            durations_files: Files written by earlier runs with the durations to balance by.
+                Defaults to the recorded history when running all shards, to test counts otherwise.
+
+        Returns:
+            Optional[ShardRunner]: The runner with the result of every shard, or None if the build failed.
+
+        Raises:
+            ValueError: If the project references contain a cycle, or a durations file is invalid.
+        """
+        from . import shard
+
+        if durations_files:
+            durations = shard.read_durations(durations_files)
+        elif index is None:
+            try:
+                durations = self.get_history().get_recent_timings('test')
+            except Exception:
+                durations = {}
+        else:
+            durations = {}
+
+        build_args = self._get_build_args(args)
+        test_args: List[str] = []
+        user_filter: Optional[str] = None
+        it = iter(args)
+        for arg in it:
+            if arg == '--filter':
+                user_filter = next(it, None)
+            elif arg.startswith('--filter='):
+                user_filter = arg.split('=', 1)[1]
+            elif arg not in ('--no-build', '--no-restore'):
+                test_args.append(arg)
+
+        if '--no-build' not in args:
+            build = self.run_builtin('build', *build_args, *(['--no-restore'] if '--no-restore' in args else []))
+            if build is not None and build.returncode != 0:
+                return None
+
+        configuration = self.get_msbuild_properties(build_args).get('Configuration', 'Debug')
+        it = iter(build_args)
+        for arg in it:
+            name, sep, value = arg.replace('=', ':', 1).partition(':')
+            if name in ('-c', '--configuration'):
+                configuration = value if sep else next(it, configuration)
+
+        graph = self.get_solution_graph()
+        catalog = shard.TestCatalog(os.path.join(self.CACHE_DIR, 'tests.json'))
+        units: List["TestUnit"] = []
+        tests: Dict[str, List[str]] = {}
+        for node in graph.topological_order():
+            if not node.is_test:
+                continue
+
+            def list_tests(node: "ProjectNode" = node) -> Optional[List[str]]:
+                print(f"Listing the tests of {node.name}")
+                proc = self.stream('test', node.path, *self.DEFAULT_ARGS, '--no-build', '--list-tests', *build_args, tail_lines=0)
+                tests = shard.parse_test_list(proc)
+                return tests if proc.wait().returncode == 0 else None
+
+            assemblies = [p for p in node.get_output_files(configuration) if os.path.isfile(p)]
+            tests[node.path] = catalog.get_tests(assemblies[0] if assemblies else None, list_tests) or []
+            units += shard.create_units(node.path, node.name, tests[node.path])
+        try:
+            catalog.save()
+        except OSError:
+            pass
+
+        shard.estimate_weights(units, durations)
+        partitions = shard.partition(units, count)
+
+        results_dir = os.path.join(self.CACHE_DIR, 'shards')
+        os.makedirs(results_dir, exist_ok=True)
+        commands: Dict[int, List[List[str]]] = {}
+        results: Dict[str, str] = {}
+        for i in ([index] if index else range(1, count + 1)):
+            by_project: Dict[str, List["TestUnit"]] = {}
+            for unit in partitions[i - 1]:
+                by_project.setdefault(unit.project, []).append(unit)
+            commands[i] = []
+            for project, project_units in by_project.items():
+                node = graph.projects[project]
+                classes = [u.test_class for u in project_units if u.test_class]
+                everything = len(project_units) == sum(1 for u in units if u.project == project)
+                filters = [f for f in (user_filter, None if everything else shard.get_class_filter(classes, tests[project])) if f]
+                trx = os.path.join(results_dir, f"shard{i}-{node.name}.trx")
+                if os.path.exists(trx):
+                    os.remove(trx)
+                results[trx] = node.name
+                cmd = ['dotnet', 'test', project] + self.DEFAULT_ARGS + ['--no-build'] + test_args
+                if filters:
+                    cmd += ['--filter', '&'.join(f"({f})" for f in filters) if len(filters) > 1 else filters[0]]
+                commands[i].append(cmd + ['--logger', f'trx;LogFileName={trx}'])
+
+        weights = {i: sum(u.weight for u in partitions[i - 1]) for i in commands}
+        runner = shard.ShardRunner(commands, count, weights)
+        runner.run()
+        measured: Dict[str, float] = {}
+        for trx, name in results.items():
+            if not os.path.isfile(trx):
+                continue
+            try:
+                for test_class, seconds in shard.parse_trx_durations(trx).items():
+                    self.record_timing('test', f"{name}:{test_class}", seconds)
+                    measured[f"{name}:{test_class}"] = seconds
+            except Exception:
+                pass
+        try:
+            shard.write_durations(os.path.join(results_dir, 'durations.json'), measured)
+        except OSError:
+            pass
+        print(f"Test results written to {os.path.relpath(results_dir, self.BASE_DIR)}")
+        return runner
+
+    @staticmethod
+    def _get_build_args(args: Any) -> List[str]:
+        """
+        Keep the configuration, verbosity and MSBuild property switches of dotnet arguments.
+        """
+        result: List[str] = []
+        it = iter(args)
+        for arg in it:
+            name = arg.split('=', 1)[0].split(':', 1)[0]
+            if name in ('-c', '--configuration', '-v', '--verbosity'):
+                result.append(arg)
+                if '=' not in arg and ':' not in arg:
+                    value = next(it, None)
+                    if value is not None:
+                        result.append(value)
+            elif ':' in arg and name.lstrip('-/').lower() in ('p', 'property'):
+                result.append(arg)
+        return result
+
+    def run_bite(
+        self,
+        target: str,
+        *args: str,
+        capture_output: bool = False,
+        incremental: bool = False,
+        why: bool = False,
+        use_hash: bool = False,
+        on_line: Optional[Callable[[str], None]] = None,
+        log_path: Optional[str] = None,
+        timing: bool = False,
+    ) -> Optional[subprocess.CompletedProcess]:
         """
         Run bite.core with the specified target and default arguments.
 
+        In incremental mode, the Inputs and Outputs of the targets in the execution plan of every
+        requested target are checked in Python first. A requested target is left out when all the
+        targets of its plan are up to date, and MSBuild is not started when none is left. Targets
+        without Inputs and Outputs always run, like in MSBuild. Only the targets of bite.proj are
+        checked, the targets imported into project builds are skipped by MSBuild itself.
+
         Args:
-            target: The bite.core target to run.
+            target: The bite.core target to run, multiple targets can be separated with ';'.
             *args: Additional arguments to pass to msbuild.
-            capture_output: If True, capture and return the output.
+            capture_output: If True, capture the output instead of printing it.
+            incremental: If True, skip the requested targets that are up to date.
+            why: If True, report why each target runs or is up to date. Implies incremental.
+            use_hash: If True, compare input content hashes instead of timestamps. Implies incremental.
+            on_line: Function called with every line of output as it arrives.
+            log_path: Optional path of a file the output is written to as well.
+            timing: If True, log the MSBuild performance summary and print a timing report.
 
         Returns:
-            subprocess.CompletedProcess if capture_output is True, otherwise None.
+            subprocess.CompletedProcess with the exit code, and the output as described in run.
+
+        Raises:
+            ValueError: In incremental mode, if a target doesn't exist.
         """
         cmd = self.DEFAULT_ARGS + [f'-t:{target}', self.BITE_PROJ_PATH] + list(args)
-        return self.run('msbuild', *cmd, capture_output=capture_output)
+        run_options: Dict[str, Any] = {'capture_output': capture_output, 'on_line': on_line, 'log_path': log_path}
+        from .perf import get_logger_args
+
+        timing_log = self._get_timing_log('run') if timing else None
+        msbuild_cmd = cmd + (get_logger_args(timing_log) if timing_log else [])
+        if not (incremental or why or use_hash):
+            result = self.run('msbuild', *msbuild_cmd, **run_options)
+            if timing_log:
+                self._record_perf_timings(self.report_timing(timing_log))
+            return result
+
+        from .incremental import UpToDateChecker
+
+        properties = self.get_msbuild_properties(args)
+        graph = self.get_target_graph(properties=properties)
+        checker = UpToDateChecker(
+            self.evaluate_project(properties=properties),
+            os.path.join(self.CACHE_DIR, 'uptodate.json'),
+            use_hash=use_hash,
+        )
+
+        reasons: Dict[str, Optional[str]] = {}
+        targets: List["MSBuildTarget"] = []
+        requested = [t.strip() for t in target.split(';') if t.strip()]
+        remaining: List[str] = []
+        for name in requested:
+            stale = False
+            for planned, runs in graph.plan([name]):
+                if not runs:
+                    continue
+                t = graph.get(planned)
+                key = (t.Name or '').lower()
+                if key not in reasons:
+                    targets.append(t)
+                    reasons[key] = checker.check(t)
+                    if why:
+                        if t.Inputs is None and t.Outputs is None:
+                            print(f"  {t.Name}: always runs, it has no Inputs and Outputs")
+                        else:
+                            print(f"  {t.Name}: {'out of date, ' + reasons[key] if reasons[key] else 'up to date'}")
+                stale = stale or reasons[key] is not None
+            if stale:
+                remaining.append(name)
+
+        if not remaining:
+            print("All targets are up to date, skipping MSBuild.")
+            output = '' if capture_output else None
+            return subprocess.CompletedProcess(['dotnet', 'msbuild'] + cmd, 0, output, None if on_line or log_path else output)
+        if len(remaining) < len(requested):
+            print(f"Skipping up to date targets: {', '.join(t for t in requested if t not in remaining)}")
+            cmd = self.DEFAULT_ARGS + [f"-t:{';'.join(remaining)}", self.BITE_PROJ_PATH] + list(args)
+            msbuild_cmd = cmd + (get_logger_args(timing_log) if timing_log else [])
+
+        result = self.run('msbuild', *msbuild_cmd, **run_options)
+        if result is not None and result.returncode == 0 and use_hash:
+            checker.record(targets)
+        if timing_log:
+            self._record_perf_timings(self.report_timing(timing_log))
+        return result
+
+    def _get_timing_log(self, name: str) -> str:
+        import time
+
+        return os.path.join(self.CACHE_DIR, 'perf', f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.log")
+
+    def _record_perf_timings(self, report: Optional["PerfReport"]) -> None:
+        """
+        Add the projects and targets of a timing report to the history record of the current command.
+        """
+        if report is None:
+            return
+        for project in report.projects:
+            name = os.path.relpath(project.name, self.BASE_DIR) if os.path.isabs(project.name) else project.name
+            self.record_timing('project', name, project.exclusive_ms / 1000)
+        for target in report.targets:
+            self.record_timing('target', target.name, target.time_ms / 1000)
+
+    def report_timing(
+        self,
+        log_path: str,
+        references: bool = False,
+        count: int = 10,
+        json_path: Optional[str] = None,
+    ) -> Optional["PerfReport"]:
+        """
+        Parse the MSBuild performance summary of a log file, print the slowest projects,
+        targets and tasks and write the report as JSON.
+
+        Args:
+            log_path: The log file written with the PerformanceSummary parameter.
+            references: If True, compute exclusive project times from the solution's project references.
+            count: Number of entries shown per kind.
+            json_path: Where to write the JSON report, defaults to the log path with a .json extension.
+
+        Returns:
+            Optional[PerfReport]: The report, or None if the log has no performance summary.
+        """
+        from .perf import PerfReport
+
+        try:
+            report = PerfReport.from_file(log_path)
+        except OSError:
+            return None
+        if not (report.projects or report.targets or report.tasks):
+            return None
+        if references:
+            try:
+                graph = self.get_solution_graph()
+                report.apply_references({path: node.project_references for path, node in graph.projects.items()})
+            except Exception:
+                pass
+
+        json_path = json_path or os.path.splitext(log_path)[0] + '.json'
+        print("\nTiming report:")
+        print(report.format_table(count, self.BASE_DIR))
+        try:
+            report.write_json(json_path)
+            print(f"Report written to {os.path.relpath(json_path, self.BASE_DIR)}")
+        except OSError as e:
+            print(f"Could not write the report: {e}")
+        return report
+
+    @staticmethod
+    def get_msbuild_properties(args: Any) -> Dict[str, str]:
+        """
+        Extract the global properties passed with -p:, /p: or -property: from MSBuild arguments.
+
+        Args:
+            args: The MSBuild command line arguments.
+
+        Returns:
+            Dict[str, str]: The property names and values.
+        """
+        properties: Dict[str, str] = {}
+        for arg in args:
+            prefix, sep, value = arg.partition(':')
+            if not sep or prefix.lstrip('-/').lower() not in ('p', 'property'):
+                continue
+            for pair in value.split(';'):
+                name, eq, val = pair.partition('=')
+                if eq and name.strip():
+                    properties[name.strip()] = val.strip().strip('"')
+        return properties
 
     # --- SDK Installation ---
 
@@ -322,6 +1041,8 @@ class Host:
         if self.requested_sdk is None:
             raise RuntimeError("No .NET SDK install required")
 
+        import platform
+
         os.makedirs(self.DOTNET_DIR, exist_ok=True)
         system = platform.system().lower()
 
@@ -337,6 +1058,8 @@ class Host:
         if self.requested_sdk is None:
             raise RuntimeError("No .NET SDK install required")
 
+        import urllib.request
+
         installer = os.path.join(self.DOTNET_DIR, 'dotnet-install.ps1')
         url = 'https://dot.net/v1/dotnet-install.ps1'
 
@@ -357,6 +1080,8 @@ class Host:
         if self.requested_sdk is None:
             raise RuntimeError("No .NET SDK install required")
 
+        import urllib.request
+
         installer = os.path.join(self.DOTNET_DIR, 'dotnet-install.sh')
         url = 'https://dot.net/v1/dotnet-install.sh'
 
@@ -402,16 +1127,39 @@ class Host:
             if self.global_json and self.global_json.version
             else 'latest'
         )
+        installed = self.get_installed_sdks()
+        if installed is None:
+            return required
+        if required != 'latest' and self.global_json:
+            if any(self.global_json.is_compatible(s) for s in installed):
+                return None
+            return required
+        return None
+
+    def get_installed_sdks(self) -> Optional[List[str]]:
+        """
+        Get the installed .NET SDK versions.
+        Reads the sdk directories of the dotnet installation directly and only falls back
+        to 'dotnet --list-sdks' when no SDK could be found that way.
+
+        Returns:
+            Optional[List[str]]: The installed SDK versions, or None if dotnet is not available.
+        """
+        extra_files = [self.global_json.path] if self.global_json else []
+        installed = sdk.find_installed_sdks(
+            self.DOTNET_DIR,
+            cache_path=os.path.join(self.CACHE_DIR, 'sdks.json'),
+            extra_files=extra_files,
+        )
+        if installed:
+            return installed
+
         try:
-            sdks = subprocess.check_output(['dotnet', '--list-sdks'], stderr=subprocess.DEVNULL)
-            installed = [line.split()[0] for line in sdks.decode().splitlines()]
-            if required != 'latest' and self.global_json:
-                if any(self.global_json.is_compatible(s) for s in installed):
-                    return None
-                return required
+            proc = self.stream('--list-sdks', merge_stderr=False)
+        except OSError:
             return None
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return required
+        sdks = [line.split()[0] for line in proc if line.strip()]
+        return sdks if proc.wait().returncode == 0 else None
 
     # --- Utility ---
 
@@ -434,26 +1182,144 @@ class Host:
             msbuild_path = f'"{msbuild_path}"'
         return msbuild_path
 
-    def get_bite_core_targets(self) -> List[MSBuildTarget]:
+    def evaluate_project(self, path: Optional[str] = None, properties: Optional[Dict[str, str]] = None) -> "MSBuildEvaluation":
+        """
+        Evaluate an MSBuild project in-process, without starting MSBuild.
+        The BiteModulesPath global property is set like in run_bite, and results are
+        memoized per file content, so repeated queries are cheap.
+
+        Args:
+            path: The project to evaluate, defaults to bite.proj.
+            properties: Additional global properties.
+
+        Returns:
+            MSBuildEvaluation: The evaluated properties, imports, items and targets.
+        """
+        from .msbuild import evaluate
+
+        global_properties = {'BiteModulesPath': os.path.join(self.MODULES_DIR, '')}
+        if properties:
+            global_properties.update(properties)
+        return evaluate(path or self.BITE_PROJ_PATH, global_properties)
+
+    def get_target_graph(self, path: Optional[str] = None, properties: Optional[Dict[str, str]] = None) -> "MSBuildTargetGraph":
+        """
+        Build the target dependency graph of a project from its in-process evaluation.
+
+        Args:
+            path: The project to evaluate, defaults to bite.proj.
+            properties: Additional global properties.
+
+        Returns:
+            MSBuildTargetGraph: The graph, with property references and conditions evaluated.
+        """
+        from .msbuild import MSBuildTargetGraph
+
+        evaluation = self.evaluate_project(path, properties)
+        return MSBuildTargetGraph(evaluation.targets.values(), evaluation.expand, evaluation.evaluate_condition)
+
+    def get_solution_graph(self) -> "SolutionGraph":
+        """
+        Load the project dependency graph of the solution.
+        Projects are evaluated in-process and the graph is cached in CACHE_DIR,
+        so only projects whose files changed are evaluated again.
+
+        Returns:
+            SolutionGraph: The project graph.
+        """
+        from .solution import SolutionGraph
+
+        return SolutionGraph.load(
+            self.solution,
+            lambda path: self.evaluate_project(path),
+            cache_path=os.path.join(self.CACHE_DIR, 'solution.json'),
+        )
+
+    def get_bite_targets_key(self) -> str:
+        """
+        Compute the cache key of the bite.core target list.
+        It is a content hash of bite.proj, Directory.Build.props and every .bite.targets
+        and .props file in the modules directory.
+
+        Returns:
+            str: The hex digest of the key.
+        """
+        import hashlib
+
+        index = self.get_module_index()
+        paths = [self.BITE_PROJ_PATH, os.path.join(self.BASE_DIR, 'Directory.Build.props')]
+        for rel, entry in sorted(index.entries.items()):
+            for f in entry['files']:
+                if f.endswith('.bite.targets') or f.endswith('.props'):
+                    paths.append(os.path.join(self.MODULES_DIR, rel, f))
+
+        digest = hashlib.sha256(self.MODULES_DIR.encode())
+        for path in paths:
+            digest.update(b'\0' + path.encode() + b'\0')
+            try:
+                with open(path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                digest.update(b'missing')
+        return digest.hexdigest()
+
+    def get_bite_core_targets(self, refresh: bool = False) -> List["MSBuildTarget"]:
         """
         Retrieve all available MSBuild targets from bite.core or .bite.targets files.
+        Targets evaluated by MSBuild are cached in CACHE_DIR and reused until one of the files
+        covered by get_bite_targets_key changes. The origin of the returned list is stored in
+        bite_targets_source ('cache', 'msbuild' or 'scan').
+
+        Args:
+            refresh: If True, ignore the cache and evaluate bite.proj again.
 
         Returns:
             List[MSBuildTarget]: List of discovered MSBuildTarget objects.
         """
+        import json
+        from .msbuild import MSBuildFile, MSBuildTarget, iterparse
+
         targets: List[MSBuildTarget] = []
+        cache_path = os.path.join(self.CACHE_DIR, 'targets.json')
+        key = self.get_bite_targets_key()
 
-        # Try to get targets from bite.core msbuild output
-        output = self.run_bite('help', '-pp', capture_output=True)
-        if output and output.stdout:
+        if not refresh:
             try:
-                # Parse the XML output directly if possible
-                targets = MSBuildFile(xml_string=output.stdout).get_targets()
-                return targets
-            except Exception:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('key') == key:
+                    self.bite_targets_source = 'cache'
+                    return [MSBuildTarget.from_xml(t) for t in cached['targets']]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        # Try to get targets from bite.core msbuild output, streaming the preprocessed
+        # project instead of holding the whole document in memory
+        proc = self.start('msbuild', *self.DEFAULT_ARGS, '-t:help', self.BITE_PROJ_PATH, '-pp')
+        assert proc.stdout is not None
+        try:
+            targets = [r for r in iterparse(proc.stdout) if isinstance(r, MSBuildTarget)]
+            proc.wait()
+        except Exception:
+            targets = []
+            proc.kill()
+            proc.wait()
+        finally:
+            proc.stdout.close()
+
+        if targets and proc.returncode == 0:
+            self.bite_targets_source = 'msbuild'
+            try:
+                os.makedirs(self.CACHE_DIR, exist_ok=True)
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump({'key': key, 'targets': [t.to_xml() for t in targets]}, f)
+            except OSError:
                 pass
+            return targets
+        targets = []
 
         # Fallback: scan all .bite.targets files in the modules directory
+        self.bite_targets_source = 'scan'
         pattern = os.path.join(self.MODULES_DIR, '**', '*.bite.targets')
         for path in glob.glob(pattern, recursive=True):
             try:
@@ -464,43 +1330,103 @@ class Host:
 
         return targets
 
-    def get_modules(self) -> Dict[str, Module]:
+    def get_module_index(self, refresh: bool = False) -> "ModuleIndex":
+        """
+        Get the persisted index of the modules directory.
+        The index is revalidated on first use and when refresh is True.
+
+        Args:
+            refresh: If True, revalidate an already loaded index.
+
+        Returns:
+            ModuleIndex: The up-to-date module index.
+        """
+        if self._module_index is None:
+            from .module import ModuleIndex
+            self._module_index = ModuleIndex(self.MODULES_DIR, os.path.join(self.CACHE_DIR, 'modules.json'))
+        elif refresh:
+            self._module_index.refresh()
+        return self._module_index
+
+    def get_modules(self) -> Dict[str, "Module"]:
         """
         Get all modules from the modules directory.
         """
-        mods: Dict[str, Module] = {}
-        
-        for root, dirs, files in os.walk(self.MODULES_DIR):
-            for dir in dirs:
-                path = os.path.join(root, dir)
-                mod = Module(path, require_json=False)
-                mods[mod.id] = mod
-        
-        return mods
+        return self.get_module_index().get_modules()
 
     def load_modules(self) -> List[Any]:
         """
         Load all .bite.py modules from the modules directory.
 
+        Modules that declare their commands in module.json are not imported here, instead a
+        subparser is registered for each declared command and the module's plugins are
+        imported and initialized when one of these commands is dispatched.
+
         Returns:
             List[Any]: List of loaded module objects.
         """
+        from . import handlers
+
         mods: List[Any] = []
-        pattern = os.path.join(self.MODULES_DIR, '**', '*.bite.py')
-        for path in glob.glob(pattern, recursive=True):
-            name = os.path.splitext(os.path.basename(path))[0]
-            spec = importlib.util.spec_from_file_location(name, path)
-            if spec is None or spec.loader is None:
+        index = self.get_module_index()
+        for path in index.plugins:
+            commands = index.get_commands(os.path.dirname(path))
+            if commands:
+                plugins = [p for p in index.plugins if os.path.dirname(p) == os.path.dirname(path)]
+                for cmd in commands:
+                    if cmd['name'] in self._deferred_commands:
+                        continue
+                    self.add_command(
+                        cmd['name'],
+                        handlers.handle_deferred_command,
+                        description=cmd.get('description'),
+                        help=cmd.get('help', ''),
+                        arguments=cmd.get('arguments'),
+                    )
+                    self._deferred_commands[cmd['name']] = plugins
                 continue
-            mod = importlib.util.module_from_spec(spec)
+            result = self.load_plugin(path)
+            if result is not None:
+                mods.append(result)
+        return mods
+
+    def load_plugin(self, path: str) -> Optional[Any]:
+        """
+        Import a .bite.py plugin and call its load function, once per plugin.
+
+        Args:
+            path: Path to the .bite.py file.
+
+        Returns:
+            Optional[Any]: The value returned by the plugin's load function, if any.
+        """
+        if path in self._loaded_plugins:
+            return self._loaded_plugins[path]
+        self._loaded_plugins[path] = None
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            return None
+        mod = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(mod)
+        except Exception as e:
+            print(f"Failed to load module {name} from {path}: {e}")
+            return None
+        if hasattr(mod, 'load'):
             try:
-                spec.loader.exec_module(mod)
+                self._loaded_plugins[path] = mod.load(self)
             except Exception as e:
-                print(f"Failed to load module {name} from {path}: {e}")
-                continue
-            if hasattr(mod, 'load'):
-                try:
-                    mods.append(mod.load(self))
-                except Exception as e:
-                    print(f"Module '{name}' failed to initialize: {e}")
-        return mods
+                print(f"Module '{name}' failed to initialize: {e}")
+        return self._loaded_plugins[path]
+
+    def load_deferred_command(self, command: str) -> None:
+        """
+        Load the plugins that declared the given command in their module.json.
+
+        Args:
+            command: The command name.
+        """
+        for path in self._deferred_commands.get(command, []):
+            self.load_plugin(path)
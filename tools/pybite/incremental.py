@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from typing import Optional, Dict, List, Tuple
+
+from .msbuild import MSBuildEvaluation, MSBuildTarget
+
+
+class UpToDateChecker:
+    """
+    Decides in Python whether MSBuild targets are up to date from their Inputs and Outputs,
+    following the rules MSBuild uses to skip targets, so MSBuild doesn't need to be started
+    just to find out that nothing has to run.
+
+    By default inputs are compared to outputs by timestamp. In hash mode the content hashes
+    of the inputs are compared to the ones recorded after the last successful run.
+    """
+    def __init__(self, evaluation: MSBuildEvaluation, state_path: Optional[str] = None, use_hash: bool = False) -> None:
+        """
+        Args:
+            evaluation: The evaluation of the project the targets belong to.
+            state_path: Path to the JSON file that stores the recorded input hashes.
+            use_hash: If True, compare input content hashes instead of timestamps.
+        """
+        self.evaluation = evaluation
+        self.state_path = state_path
+        self.use_hash = use_hash
+        self._state: Optional[Dict[str, Dict[str, Dict[str, str]]]] = None
+
+    def _load_state(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        if self._state is None:
+            self._state = {}
+            if self.state_path:
+                try:
+                    with open(self.state_path, 'r', encoding='utf-8') as f:
+                        self._state = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._state
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_files(self, target: MSBuildTarget) -> Tuple[List[str], List[str]]:
+        """
+        Expand the Inputs and Outputs of a target to absolute file paths.
+
+        Raises:
+            ValueError: If they contain references the evaluator can't resolve, such as batching.
+        """
+        result: List[List[str]] = []
+        this_file = self.evaluation.target_files.get(target.Name or '')
+        for value in (target.Inputs, target.Outputs):
+            expanded = self.evaluation.expand(value or '', this_file)
+            if any(ref in expanded for ref in ('$(', '@(', '%(')):
+                raise ValueError(f"could not evaluate '{value}'")
+            result.append([
+                os.path.normpath(os.path.join(self.evaluation.project_dir, p.strip().replace('\\', os.sep)))
+                for p in expanded.split(';') if p.strip()
+            ])
+        return result[0], result[1]
+
+    def check(self, target: MSBuildTarget) -> Optional[str]:
+        """
+        Check whether a target is up to date.
+
+        Args:
+            target: The target to check.
+
+        Returns:
+            Optional[str]: None if the target is up to date, otherwise the reason it has to run.
+        """
+        if target.Inputs is None and target.Outputs is None:
+            return "target has no Inputs and Outputs"
+        try:
+            inputs, outputs = self.get_files(target)
+        except ValueError as e:
+            return str(e)
+        # MSBuild skips targets whose Inputs or Outputs are empty
+        if not inputs or not outputs:
+            return None
+
+        output_times: List[Tuple[float, str]] = []
+        for path in outputs:
+            try:
+                output_times.append((os.stat(path).st_mtime, path))
+            except OSError:
+                return f"output '{path}' does not exist"
+
+        if self.use_hash:
+            recorded = self._load_state().get(self.evaluation.path, {}).get(target.Name or '', {})
+            if not recorded:
+                return "no input hashes recorded from a previous run"
+            if set(recorded) != set(inputs):
+                return "the set of inputs changed since the last run"
+            for path in inputs:
+                try:
+                    if self._hash_file(path) != recorded[path]:
+                        return f"input '{path}' changed since the last run"
+                except OSError:
+                    return f"input '{path}' does not exist"
+            return None
+
+        oldest_output = min(output_times)
+        for path in inputs:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                return f"input '{path}' does not exist"
+            if mtime > oldest_output[0]:
+                return f"input '{path}' is newer than output '{oldest_output[1]}'"
+        return None
+
+    def record(self, targets: List[MSBuildTarget]) -> None:
+        """
+        Record the input hashes of targets after a successful run, for hash mode.
+
+        Args:
+            targets: The targets that were run.
+        """
+        state = self._load_state()
+        project = state.setdefault(self.evaluation.path, {})
+        for target in targets:
+            if target.Inputs is None or not target.Name:
+                continue
+            try:
+                inputs, _ = self.get_files(target)
+                project[target.Name] = {p: self._hash_file(p) for p in inputs}
+            except (ValueError, OSError):
+                project.pop(target.Name, None)
+        if self.state_path:
+            try:
+                os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+                with open(self.state_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+            except OSError:
+                pass
@@ -2,11 +2,9 @@
 import os
 import json
 import shutil
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from urllib.parse import urlparse
 
-from . import download
-
 class Module:
     """
     A class representing a module in the Bite build engine.
@@ -22,6 +20,7 @@ class Module:
         self.private: bool = False
         self.update_url: Optional[str] = None
         self.module_info: Optional[Dict[str, Any]] = None
+        self._entries: Optional[Tuple[List[str], List[str]]] = None
         
         try:
             self._load_json()
@@ -29,6 +28,26 @@ class Module:
             if require_json:
                 raise
 
+    @classmethod
+    def from_index(cls, path: str, entry: Dict[str, Any]) -> "Module":
+        """
+        Create a module from a ModuleIndex entry without touching the file system.
+        """
+        mod = cls.__new__(cls)
+        mod.path = path
+        mod.id = os.path.basename(path)
+        mod.name = None
+        mod.version = None
+        mod.description = None
+        mod.author = None
+        mod.private = False
+        mod.update_url = None
+        mod.module_info = None
+        mod._entries = (entry['files'], entry['dirs'])
+        if entry.get('info') is not None:
+            mod._apply_info(entry['info'])
+        return mod
+
     def _load_json(self) -> None:
         """
         Load the JSON file from the specified path and extract name and description.
@@ -39,15 +58,29 @@ class Module:
 
         with open(json_file_path, 'r') as json_file:
             data: Dict[str, Any] = json.load(json_file)
-            if data.get('id', None) is not None:
-                self.id = data['id']
-            self.name = data.get('name')
-            self.version = data.get('version')
-            self.description = data.get('description')
-            self.author = data.get('author')
-            self.private = data.get('private', False)
-            self.update_url = data.get('update_url')
-            self.module_info = data
+            self._apply_info(data)
+
+    def _apply_info(self, data: Dict[str, Any]) -> None:
+        """
+        Extract the module information from parsed module.json data.
+        """
+        if data.get('id', None) is not None:
+            self.id = data['id']
+        self.name = data.get('name')
+        self.version = data.get('version')
+        self.description = data.get('description')
+        self.author = data.get('author')
+        self.private = data.get('private', False)
+        self.update_url = data.get('update_url')
+        self.module_info = data
+
+    def _get_entries(self) -> Tuple[List[str], List[str]]:
+        """
+        Get the file and directory names of the module directory, listing it only once.
+        """
+        if self._entries is None:
+            self._entries = _scan_dir(self.path)
+        return self._entries
 
     @property
     def files(self) -> Dict[str, str]:
@@ -55,7 +88,7 @@ class Module:
         Get a dictionary of files in the module directory.
         The keys are the file names and the values are their paths.
         """
-        return {f: os.path.join(self.path, f) for f in os.listdir(self.path) if os.path.isfile(os.path.join(self.path, f))}
+        return {f: os.path.join(self.path, f) for f in self._get_entries()[0]}
 
     @property
     def valid(self) -> bool:
@@ -65,8 +98,7 @@ class Module:
         """
         if self.module_info is None:
             return False
-        folders = {f: os.path.join(self.path, f) for f in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, f)) and f != '__pycache__'}
-        return len(folders) == 0
+        return len(self._get_entries()[1]) == 0
     
     @property
     def updatable(self):
@@ -90,12 +122,161 @@ class Module:
 
         with open(json_file_path, 'w') as json_file:
             json.dump(data, json_file, indent=4)
+        self._entries = None
+
+def _scan_dir(path: str) -> Tuple[List[str], List[str]]:
+    """
+    List a directory once and return its sorted file and subdirectory names, ignoring __pycache__.
+    """
+    files: List[str] = []
+    dirs: List[str] = []
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_dir():
+                if e.name != '__pycache__':
+                    dirs.append(e.name)
+            elif e.is_file():
+                files.append(e.name)
+    return sorted(files), sorted(dirs)
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+class ModuleIndex:
+    """
+    Persistent index of the modules directory.
+    Records the metadata, file lists and plugin entry points of every module directory and
+    revalidates them from directory and module.json mtimes, so only changed modules are rescanned.
+    """
+    VERSION = 1
+
+    def __init__(self, modules_dir: str, cache_path: Optional[str] = None) -> None:
+        """
+        Load the index and bring it up to date with the modules directory.
+
+        Args:
+            modules_dir: The modules directory to index.
+            cache_path: Optional path to the JSON file the index is persisted to.
+        """
+        self.modules_dir = modules_dir
+        self.cache_path = cache_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.rescanned: List[str] = []
+        self.refresh()
+
+    def _read_cache(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != self.VERSION or data.get('root') != self.modules_dir:
+            return {}
+        return data.get('entries', {})
+
+    def _write_cache(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f'{self.cache_path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'root': self.modules_dir, 'entries': self.entries}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _scan(path: str, stamp: List[Optional[int]]) -> Dict[str, Any]:
+        files, dirs = _scan_dir(path)
+        info: Optional[Dict[str, Any]] = None
+        if 'module.json' in files:
+            try:
+                with open(os.path.join(path, 'module.json'), 'r') as json_file:
+                    info = json.load(json_file)
+            except (OSError, ValueError):
+                info = None
+        return {'stamp': stamp, 'info': info, 'files': files, 'dirs': dirs}
+
+    def refresh(self) -> None:
+        """
+        Revalidate the index against the file system.
+        Every indexed directory is checked with a stat call and rescanned only if its
+        mtime or the mtime of its module.json changed. The index is saved if anything changed.
+        """
+        cached = self._read_cache()
+        entries: Dict[str, Dict[str, Any]] = {}
+        self.rescanned = []
+
+        stack = [''] if os.path.isdir(self.modules_dir) else []
+        while stack:
+            rel = stack.pop()
+            path = os.path.join(self.modules_dir, rel) if rel else self.modules_dir
+            stamp = [_mtime(path), _mtime(os.path.join(path, 'module.json'))]
+            entry = cached.get(rel)
+            if entry is None or entry.get('stamp') != stamp:
+                try:
+                    entry = self._scan(path, stamp)
+                except OSError:
+                    continue
+                self.rescanned.append(rel)
+            entries[rel] = entry
+            stack.extend(os.path.join(rel, d) if rel else d for d in entry['dirs'])
+
+        changed = bool(self.rescanned) or set(cached) != set(entries)
+        self.entries = entries
+        if changed:
+            self._write_cache()
+
+    def get_modules(self) -> Dict[str, Module]:
+        """
+        Get a module for every directory below the modules directory, keyed by module id.
+        """
+        mods: Dict[str, Module] = {}
+        for rel in sorted(self.entries):
+            if not rel:
+                continue
+            mod = Module.from_index(os.path.join(self.modules_dir, rel), self.entries[rel])
+            mods[mod.id] = mod
+        return mods
+
+    def get_commands(self, path: str) -> List[Dict[str, Any]]:
+        """
+        Get the commands declared in the module.json of a module directory.
+
+        Each command is a dict with a 'name', an optional 'help' and 'description' and an
+        optional list of 'arguments' in the same format accepted by Host.add_command.
+        """
+        rel = os.path.relpath(path, self.modules_dir)
+        entry = self.entries.get('' if rel == '.' else rel)
+        if entry is None or not isinstance(entry.get('info'), dict):
+            return []
+        commands = entry['info'].get('commands') or []
+        return [c for c in commands if isinstance(c, dict) and c.get('name')]
+
+    @property
+    def plugins(self) -> List[str]:
+        """
+        Get the paths of all .bite.py plugin entry points, sorted by path.
+        """
+        plugins: List[str] = []
+        for rel, entry in self.entries.items():
+            path = os.path.join(self.modules_dir, rel) if rel else self.modules_dir
+            plugins.extend(os.path.join(path, f) for f in entry['files'] if f.endswith('.bite.py'))
+        return sorted(plugins)
 
 def install(url: str, modules_dir: str, upgrade: bool = False) -> None:
     """
     Install module from a URL to the specified modules directory.
     The URL can be a GitHub repository or a local path.
     """
+    from . import download
+
     parsed_url = urlparse(url)
     temp_id = parsed_url.path.split('/')[-1]
     # remove .zip suffix if present
@@ -1,23 +1,48 @@
+import glob
+import hashlib
+import os
+import re
+import threading
 import xml.etree.ElementTree as ET
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterator, Union, IO, Tuple, Iterable, Callable
 
 class MSBuildElement:
     """
     Base wrapper for an XML element in an MSBuild file.
     Provides attribute and child element lookup.
     """
+    __slots__ = ('_element', '_children')
+
     def __init__(self, element: ET.Element):
         self._element = element
+        self._children: Optional[Dict[str, Optional[str]]] = None
 
     def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
         # Try attribute first, then child element
         if name in self._element.attrib:
             return self._element.attrib[name]
-        child = self._element.find(name)
-        if child is not None:
-            return child.text
+        if self._children is None:
+            # Index the first child element of each tag once, like find() would return
+            children: Dict[str, Optional[str]] = {}
+            for child in self._element:
+                if child.tag not in children:
+                    children[child.tag] = child.text
+            self._children = children
+        if name in self._children:
+            return self._children[name]
         raise AttributeError(f"{self.__class__.__name__} has no attribute '{name}'")
 
+    @classmethod
+    def from_xml(cls, xml_string: str):
+        """Creates an element wrapper from its serialized XML."""
+        return cls(ET.fromstring(xml_string))
+
+    def to_xml(self) -> str:
+        """Serializes the wrapped element, including its children, to XML."""
+        return ET.tostring(self._element, encoding='unicode')
+
     @property
     def tag(self) -> str:
         """Returns the XML tag name."""
@@ -38,6 +63,13 @@ class MSBuildTarget(MSBuildElement):
     Represents an MSBuild <Target> element.
     Exposes common attributes and child elements as properties.
     """
+    __slots__ = ('_tasks', '_on_error')
+
+    def __init__(self, element: ET.Element):
+        super().__init__(element)
+        self._tasks: Optional[List[MSBuildElement]] = None
+        self._on_error: Optional[List[MSBuildElement]] = None
+
     @property
     def Name(self) -> Optional[str]:
         """The Name attribute of the target."""
@@ -87,20 +119,28 @@ class MSBuildTarget(MSBuildElement):
     def Tasks(self) -> List[MSBuildElement]:
         """
         Returns a list of child task elements (all direct children that are not PropertyGroup/ItemGroup/OnError).
+        The list is built once and shared between calls.
         """
-        return [MSBuildElement(e) for e in self._element if e.tag not in ("PropertyGroup", "ItemGroup", "OnError")]
+        if self._tasks is None:
+            self._tasks = [MSBuildElement(e) for e in self._element if e.tag not in ("PropertyGroup", "ItemGroup", "OnError")]
+        return self._tasks
 
     @property
     def OnError(self) -> List[MSBuildElement]:
         """
         Returns a list of <OnError> child elements.
+        The list is built once and shared between calls.
         """
-        return [MSBuildElement(e) for e in self._element.findall("OnError")]
+        if self._on_error is None:
+            self._on_error = [MSBuildElement(e) for e in self._element.findall("OnError")]
+        return self._on_error
 
 class MSBuildProperty(MSBuildElement):
     """
     Represents a property element in MSBuild.
     """
+    __slots__ = ()
+
     @property
     def name(self) -> str:
         """The property name (tag)."""
@@ -115,6 +155,8 @@ class MSBuildItem(MSBuildElement):
     """
     Represents an item element in MSBuild.
     """
+    __slots__ = ()
+
     @property
     def Include(self) -> Optional[str]:
         """The Include attribute."""
@@ -138,7 +180,11 @@ class MSBuildItem(MSBuildElement):
 class MSBuildFile:
     """
     Represents an MSBuild file and provides access to its structure.
+    The document is indexed in a single pass on the first query, later queries return the
+    same cached objects and should not be modified.
     """
+    __slots__ = ('tree', 'root', '_property_groups', '_item_groups', '_properties', '_items', '_targets', '_targets_by_name')
+
     def __init__(self, filepath: Optional[str] = None, xml_string: Optional[str] = None):
         """
         Initialize the MSBuildProject from a file or XML string.
@@ -154,41 +200,1036 @@ class MSBuildFile:
             self.tree = ET.ElementTree(self.root)
         else:
             raise ValueError("Either filepath or xml_string must be provided.")
+        self._targets: Optional[List[MSBuildTarget]] = None
+
+    def _index(self) -> None:
+        """
+        Walks the document once and builds the property, item and target maps.
+        """
+        property_groups: List[ET.Element] = []
+        item_groups: List[ET.Element] = []
+        properties: Dict[str, MSBuildProperty] = {}
+        items: Dict[str, List[MSBuildItem]] = {}
+        targets: List[MSBuildTarget] = []
+        by_name: Dict[str, MSBuildTarget] = {}
+        for e in self.root.iter():
+            tag = e.tag
+            if tag == 'PropertyGroup':
+                property_groups.append(e)
+                for prop in e:
+                    properties[prop.tag] = MSBuildProperty(prop)
+            elif tag == 'ItemGroup':
+                item_groups.append(e)
+                for item in e:
+                    items.setdefault(item.tag, []).append(MSBuildItem(item))
+            elif tag == 'Target' and e is not self.root:
+                target = MSBuildTarget(e)
+                targets.append(target)
+                if target.Name:
+                    by_name[target.Name.lower()] = target
+        self._property_groups = property_groups
+        self._item_groups = item_groups
+        self._properties = properties
+        self._items = items
+        self._targets_by_name = by_name
+        self._targets = targets
+
+    def _ensure_index(self) -> None:
+        if self._targets is None:
+            self._index()
 
     def get_property_groups(self) -> List[ET.Element]:
         """
         Returns a list of <PropertyGroup> elements.
         """
-        return self.root.findall(".//PropertyGroup")
+        self._ensure_index()
+        return self._property_groups
 
     def get_item_groups(self) -> List[ET.Element]:
         """
         Returns a list of <ItemGroup> elements.
         """
-        return self.root.findall(".//ItemGroup")
+        self._ensure_index()
+        return self._item_groups
 
     def get_properties(self) -> Dict[str, MSBuildProperty]:
         """
         Returns a dict of all properties in all <PropertyGroup>s as MSBuildProperty objects.
         """
-        props: Dict[str, MSBuildProperty] = {}
-        for pg in self.get_property_groups():
-            for prop in pg:
-                props[prop.tag] = MSBuildProperty(prop)
-        return props
+        self._ensure_index()
+        return self._properties
+
+    def get_property(self, name: str) -> Optional[MSBuildProperty]:
+        """
+        Returns the last definition of a property, if any.
+        """
+        self._ensure_index()
+        return self._properties.get(name)
 
     def get_items(self) -> Dict[str, List[MSBuildItem]]:
         """
         Returns a dict of item type to list of MSBuildItem objects in all <ItemGroup>s.
         """
-        items: Dict[str, List[MSBuildItem]] = {}
-        for ig in self.get_item_groups():
-            for item in ig:
-                items.setdefault(item.tag, []).append(MSBuildItem(item))
-        return items
+        self._ensure_index()
+        return self._items
 
     def get_targets(self) -> List[MSBuildTarget]:
         """
         Returns a list of MSBuildTarget objects for <Target> elements.
         """
-        return [MSBuildTarget(e) for e in self.root.findall(".//Target")]
+        self._ensure_index()
+        assert self._targets is not None
+        return self._targets
+
+    def get_target(self, name: str) -> Optional[MSBuildTarget]:
+        """
+        Returns the last <Target> with the given name (case-insensitive), if any.
+        """
+        self._ensure_index()
+        return self._targets_by_name.get(name.lower())
+
+
+def _local_name(tag: str) -> str:
+    """Strips the XML namespace from a tag."""
+    return tag.rsplit('}', 1)[-1] if tag[:1] == '{' else tag
+
+def iterparse(source: Union[str, IO[bytes]]) -> Iterator[MSBuildElement]:
+    """
+    Streams an MSBuild document and yields MSBuildTarget, MSBuildProperty and MSBuildItem
+    records as their elements close.
+
+    Processed elements are detached from the tree, so memory stays bounded by the size of
+    the largest target instead of the whole document. Elements inside a <Target> are kept
+    until the target closes, so the yielded MSBuildTarget is complete. Namespaces are
+    stripped from tags.
+
+    :param source: Path to the XML file or a binary file object, such as a subprocess's stdout.
+    """
+    stack: List[ET.Element] = []
+    in_target = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            elem.tag = _local_name(elem.tag)
+            if elem.tag == 'Target':
+                in_target += 1
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if elem.tag == 'Target':
+            in_target -= 1
+            yield MSBuildTarget(elem)
+        elif parent is not None and parent.tag == 'PropertyGroup':
+            yield MSBuildProperty(elem)
+        elif parent is not None and parent.tag == 'ItemGroup':
+            yield MSBuildItem(elem)
+
+        if parent is not None and not in_target:
+            parent.remove(elem)
+
+def iterelements(source: Union[str, IO[bytes]], max_depth: int) -> Iterator[Tuple[List[ET.Element], ET.Element]]:
+    """
+    Streams any XML document and yields the elements up to a depth as they close, with their
+    ancestors. The root element has depth 0.
+
+    Yielded elements are detached from their parent, so memory stays bounded by the size of
+    the largest element at max_depth. Ancestors are yielded after their children, with their
+    attributes but without the detached children. Namespaces are stripped from tags.
+
+    :param source: Path to the XML file or a binary file object.
+    :param max_depth: Depth of the deepest elements yielded, their descendants stay attached to them.
+    """
+    stack: List[ET.Element] = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            elem.tag = _local_name(elem.tag)
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if len(stack) > max_depth:
+            continue
+        yield stack, elem
+        if stack:
+            stack[-1].remove(elem)
+
+class MSBuildTargetGraph:
+    """
+    Dependency graph of MSBuild targets built from their DependsOnTargets, BeforeTargets
+    and AfterTargets attributes. Target names are case-insensitive.
+    """
+    def __init__(
+        self,
+        targets: Iterable[MSBuildTarget],
+        expand: Optional[Callable[[str], str]] = None,
+        condition: Optional[Callable[[Optional[str]], bool]] = None,
+    ):
+        """
+        :param targets: The targets, later definitions override earlier ones with the same name.
+        :param expand: Optional function expanding property references in target lists.
+        :param condition: Optional function evaluating target conditions, targets are assumed to run without it.
+        """
+        self._expand = expand or (lambda text: text)
+        self._condition = condition
+        self.targets: Dict[str, MSBuildTarget] = {}
+        for t in targets:
+            if t.Name:
+                self.targets[t.Name.lower()] = t
+        self.depends_on: Dict[str, List[str]] = {}
+        self.before: Dict[str, List[str]] = {}
+        self.after: Dict[str, List[str]] = {}
+        self.hooked_after: Dict[str, List[str]] = {}
+        for key, t in self.targets.items():
+            self.depends_on[key] = self._split(t.DependsOnTargets)
+            for hooked in self._split(t.BeforeTargets):
+                self.before.setdefault(hooked.lower(), []).append(t.Name)
+            self.hooked_after[key] = self._split(t.AfterTargets)
+            for hooked in self.hooked_after[key]:
+                self.after.setdefault(hooked.lower(), []).append(t.Name)
+
+    def _split(self, value: Optional[str]) -> List[str]:
+        if not value:
+            return []
+        return [v.strip() for v in self._expand(value).split(';') if v.strip()]
+
+    def get(self, name: str) -> Optional[MSBuildTarget]:
+        """Returns the target with the given name, if any."""
+        return self.targets.get(name.lower())
+
+    def dependencies(self, name: str) -> List[str]:
+        """
+        Returns the direct predecessors of the given target in the graph: its DependsOnTargets,
+        the targets hooked before it and the targets it is hooked after.
+        """
+        key = name.lower()
+        return self.depends_on.get(key, []) + self.before.get(key, []) + self.hooked_after.get(key, [])
+
+    def dependents(self, name: str) -> List[str]:
+        """Returns the targets that are hooked to run after the given target."""
+        return list(self.after.get(name.lower(), []))
+
+    def will_run(self, name: str) -> bool:
+        """Returns False if the target's condition evaluates to false."""
+        target = self.get(name)
+        if target is None:
+            return False
+        return self._condition(target.Condition) if self._condition else True
+
+    def plan(self, requested: Iterable[str]) -> List[Tuple[str, bool]]:
+        """
+        Computes the order MSBuild runs the requested targets in.
+        For every target, its DependsOnTargets run first (unless its condition is false),
+        then the targets hooked with BeforeTargets, the target itself and finally the targets
+        hooked with AfterTargets. Each target runs at most once.
+
+        :param requested: The requested target names, in order.
+        :return: A list of (target name, runs) tuples, runs is False for targets skipped by their condition.
+        :raises ValueError: If a target doesn't exist or a circular dependency is found.
+        """
+        order: List[Tuple[str, bool]] = []
+        done: set = set()
+        stack: List[str] = []
+
+        def _visit(name: str, required: bool) -> None:
+            key = name.lower()
+            if key in done:
+                return
+            target = self.targets.get(key)
+            if target is None:
+                if required:
+                    raise ValueError(f"Target '{name}' does not exist in the project.")
+                return
+            if key in stack:
+                cycle = ' -> '.join(stack[stack.index(key):] + [key])
+                raise ValueError(f"Circular dependency between targets: {cycle}")
+            stack.append(key)
+            runs = self.will_run(target.Name)
+            if runs:
+                for dep in self.depends_on.get(key, []):
+                    _visit(dep, True)
+            for hook in self.before.get(key, []):
+                _visit(hook, False)
+            done.add(key)
+            order.append((target.Name, runs))
+            for hook in self.after.get(key, []):
+                _visit(hook, False)
+            stack.pop()
+
+        for name in requested:
+            _visit(name, True)
+        return order
+
+# --- In-process evaluation ---
+
+_BOOL_TRUE = ('true', 'on', 'yes', '!false', '!off', '!no')
+_BOOL_FALSE = ('false', 'off', 'no', '!true', '!on', '!yes')
+_PROPERTY_NAME = re.compile(r'^[A-Za-z_][\w-]*$')
+_VERSION = re.compile(r'^\d+(\.\d+){1,3}$')
+
+_documents: Dict[str, Tuple[Tuple[int, int], str, ET.Element]] = {}
+_evaluations: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], "MSBuildEvaluation"] = {}
+# Guards _documents and _evaluations, files are read and evaluated outside of the lock
+_cache_lock = threading.Lock()
+
+def _load_document(path: str) -> Tuple[str, ET.Element]:
+    """
+    Parses an MSBuild file, memoized by its content hash.
+    The file is only read again when its mtime or size changed, and only parsed again when its content changed.
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _documents.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if cached is not None and cached[1] == digest:
+        root = cached[2]
+    else:
+        root = ET.fromstring(data)
+        for e in root.iter():
+            e.tag = _local_name(e.tag)
+    with _cache_lock:
+        _documents[path] = (stamp, digest, root)
+    return digest, root
+
+def _find_closing(text: str, start: int) -> int:
+    """Returns the index of the parenthesis closing the one at start, skipping quoted text, or -1."""
+    depth = 0
+    quote = None
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"`":
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _split_args(text: str) -> List[str]:
+    """Splits a comma separated argument list at the top level."""
+    args: List[str] = []
+    depth = 0
+    quote = None
+    current = ''
+    for c in text:
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"`":
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            args.append(current.strip())
+            current = ''
+            continue
+        current += c
+    if current.strip() or args:
+        args.append(current.strip())
+    return args
+
+def _unquote(text: str) -> Tuple[str, bool]:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"`":
+        return text[1:-1], True
+    return text, False
+
+def _to_number(text: str):
+    text = text.strip()
+    try:
+        return (0, float(int(text, 16) if text.lower().startswith('0x') else float(text)))
+    except ValueError:
+        pass
+    if _VERSION.match(text):
+        return (1, tuple(int(p) for p in text.split('.')))
+    return None
+
+def _native_path(path: str) -> str:
+    """Converts MSBuild path separators to the native ones."""
+    if os.sep != '\\':
+        path = path.replace('\\', '/')
+    return path
+
+class MSBuildItemInstance:
+    """
+    Represents an evaluated item, with its identity and metadata.
+    """
+    WELL_KNOWN_METADATA = ('FullPath', 'RootDir', 'Filename', 'Extension', 'RelativeDir', 'Directory', 'Identity', 'RecursiveDir')
+
+    def __init__(self, item_type: str, identity: str, base_dir: str, metadata: Optional[Dict[str, str]] = None):
+        self.item_type = item_type
+        self.identity = identity
+        self.base_dir = base_dir
+        self.metadata: Dict[str, str] = dict(metadata or {})
+
+    @property
+    def full_path(self) -> str:
+        """The absolute, normalized path of the item."""
+        return os.path.normpath(os.path.join(self.base_dir, _native_path(self.identity)))
+
+    def get_metadata(self, name: str) -> str:
+        """Returns a custom or well-known metadata value, or an empty string."""
+        for k, v in self.metadata.items():
+            if k.lower() == name.lower():
+                return v
+        lname = name.lower()
+        if lname == 'identity':
+            return self.identity
+        if lname == 'fullpath':
+            return self.full_path
+        if lname == 'rootdir':
+            drive = os.path.splitdrive(self.full_path)[0]
+            return drive + os.sep
+        if lname == 'filename':
+            return os.path.splitext(os.path.basename(_native_path(self.identity)))[0]
+        if lname == 'extension':
+            return os.path.splitext(_native_path(self.identity))[1]
+        if lname == 'relativedir':
+            d = os.path.dirname(_native_path(self.identity))
+            return d + os.sep if d else ''
+        if lname == 'directory':
+            d = os.path.dirname(os.path.splitdrive(self.full_path)[1]).lstrip(os.sep)
+            return d + os.sep if d else ''
+        return ''
+
+    def __repr__(self) -> str:
+        return f"MSBuildItemInstance({self.item_type!r}, {self.identity!r})"
+
+class MSBuildEvaluation:
+    """
+    Lightweight in-process evaluation of an MSBuild project.
+
+    Resolves <PropertyGroup> values in evaluation order, follows <Import> elements
+    (including wildcards and conditions) and <Choose> blocks, then evaluates items.
+    Properties expand $(Name) references, environment variables and a small set of
+    property functions. SDK imports and tasks are not evaluated, except that SDK-style
+    projects import the nearest Directory.Build.props, Directory.Packages.props and
+    Directory.Build.targets like Microsoft.Common.props/targets do.
+
+    Use evaluate() to get a memoized instance.
+    """
+    def __init__(self, path: str, global_properties: Optional[Dict[str, str]] = None):
+        """
+        :param path: Path to the project file.
+        :param global_properties: Global properties, as passed with /p: to MSBuild.
+        """
+        self.path = os.path.abspath(path)
+        self.project_dir = os.path.dirname(self.path)
+        self.global_properties: Dict[str, str] = dict(global_properties or {})
+        self._global_keys = {k.lower() for k in self.global_properties}
+        self.imports: List[str] = []
+        self.items: Dict[str, List[MSBuildItemInstance]] = {}
+        self.targets: Dict[str, MSBuildTarget] = {}
+        self.target_files: Dict[str, str] = {}
+        self._properties: Dict[str, Tuple[str, str]] = {}
+        self._this_file: List[str] = []
+        self._item_groups: List[Tuple[str, ET.Element]] = []
+        self._files: Dict[str, str] = {}
+        self._globs: Dict[str, List[str]] = {}
+        self._environment: Dict[str, Optional[str]] = {}
+        self._exists: Dict[str, bool] = {}
+
+    # --- Properties ---
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        """Returns all evaluated properties by name."""
+        return {name: value for name, value in self._properties.values()}
+
+    @property
+    def files(self) -> List[str]:
+        """Returns the project file and every file imported during evaluation."""
+        return list(self._files)
+
+    @property
+    def globs(self) -> Dict[str, List[str]]:
+        """Returns the wildcard patterns expanded during evaluation and their matches."""
+        return dict(self._globs)
+
+    @property
+    def environment(self) -> Dict[str, Optional[str]]:
+        """Returns the environment variables read during evaluation and their values, None when they were not set."""
+        return dict(self._environment)
+
+    @property
+    def probes(self) -> Dict[str, bool]:
+        """Returns the paths checked for existence during evaluation, such as Exists() conditions and implicit imports, and whether they existed."""
+        return dict(self._exists)
+
+    def get_property(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Returns the evaluated value of a property, or default if it is not defined."""
+        entry = self._properties.get(name.lower())
+        return entry[1] if entry is not None else default
+
+    def _set_property(self, name: str, value: str) -> None:
+        if name.lower() in self._global_keys:
+            return
+        self._properties[name.lower()] = (name, value)
+
+    def _lookup(self, name: str) -> str:
+        lname = name.lower()
+        if self._this_file and lname.startswith('msbuildthisfile'):
+            this = self._this_file[-1]
+            reserved = {
+                'msbuildthisfile': os.path.basename(this),
+                'msbuildthisfiledirectory': os.path.dirname(this) + os.sep,
+                'msbuildthisfilefullpath': this,
+                'msbuildthisfilename': os.path.splitext(os.path.basename(this))[0],
+                'msbuildthisfileextension': os.path.splitext(this)[1],
+            }
+            if lname in reserved:
+                return reserved[lname]
+        entry = self._properties.get(lname)
+        if entry is not None:
+            return entry[1]
+        for key in self._environment_keys(name):
+            value = os.environ.get(key)
+            self._environment[key] = value
+            if value is not None:
+                return value
+        return ''
+
+    @staticmethod
+    def _environment_keys(name: str) -> List[str]:
+        return [name] if os.name != 'nt' else [name, name.upper()]
+
+    # --- Expansion ---
+
+    def expand(self, text: Optional[str], this_file: Optional[str] = None) -> str:
+        """
+        Expands $(Property), @(Item) references and property functions in the given text.
+        Unsupported expressions are left unexpanded.
+
+        :param text: The text to expand.
+        :param this_file: The file the text is defined in, used for the MSBuildThisFile* properties.
+        """
+        if not text:
+            return ''
+        if this_file is not None:
+            self._this_file.append(this_file)
+            try:
+                return self.expand(text)
+            finally:
+                self._this_file.pop()
+        out: List[str] = []
+        i = 0
+        while True:
+            j = min((k for k in (text.find('$(', i), text.find('@(', i)) if k >= 0), default=-1)
+            if j < 0:
+                out.append(text[i:])
+                break
+            out.append(text[i:j])
+            end = _find_closing(text, j + 1)
+            if end < 0:
+                out.append(text[j:])
+                break
+            body = text[j + 2:end].strip()
+            if text[j] == '$':
+                value = self._expand_property(body)
+            else:
+                value = self._expand_items(body)
+            out.append(text[j:end + 1] if value is None else value)
+            i = end + 1
+        return ''.join(out)
+
+    def _expand_argument(self, arg: str) -> str:
+        return self.expand(_unquote(arg)[0])
+
+    def _expand_property(self, body: str) -> Optional[str]:
+        if _PROPERTY_NAME.match(body):
+            return self._lookup(body)
+        if body.startswith('['):
+            return self._expand_static_function(body)
+        m = re.match(r'^([A-Za-z_][\w-]*)\.(\w+)(?:\((.*)\))?$', body, re.S)
+        if m:
+            return self._expand_string_function(self._lookup(m.group(1)), m.group(2), m.group(3))
+        return None
+
+    def _expand_string_function(self, value: str, method: str, arglist: Optional[str]) -> Optional[str]:
+        args = [self._expand_argument(a) for a in _split_args(arglist or '')]
+        m = method.lower()
+        if m == 'tolower' or m == 'tolowerinvariant':
+            return value.lower()
+        if m == 'toupper' or m == 'toupperinvariant':
+            return value.upper()
+        if m == 'trim':
+            return value.strip(args[0] if args else None)
+        if m == 'trimend':
+            return value.rstrip(args[0] if args else None)
+        if m == 'trimstart':
+            return value.lstrip(args[0] if args else None)
+        if m == 'replace' and len(args) == 2:
+            return value.replace(args[0], args[1])
+        if m == 'contains' and args:
+            return str(args[0] in value).lower()
+        if m == 'startswith' and args:
+            return str(value.startswith(args[0])).lower()
+        if m == 'endswith' and args:
+            return str(value.endswith(args[0])).lower()
+        if m == 'length':
+            return str(len(value))
+        return None
+
+    def _expand_static_function(self, body: str) -> Optional[str]:
+        m = re.match(r'^\[([\w.]+)\]::(\w+)(?:\((.*)\))?$', body, re.S)
+        if not m:
+            return None
+        cls, func, arglist = m.group(1).lower(), m.group(2).lower(), m.group(3)
+        args = [self._expand_argument(a) for a in _split_args(arglist or '')]
+
+        def _dir(p: str) -> str:
+            p = os.path.normpath(os.path.join(self.project_dir, _native_path(p)))
+            return p if p.endswith(os.sep) else p + os.sep
+
+        if cls == 'msbuild':
+            if func == 'makerelative' and len(args) == 2:
+                base = os.path.join(self.project_dir, _native_path(args[0]))
+                target = os.path.join(self.project_dir, _native_path(args[1]))
+                rel = os.path.relpath(target, base)
+                if args[1].endswith(('/', '\\')) and not rel.endswith(os.sep):
+                    rel += os.sep
+                return rel
+            if func == 'ensuretrailingslash' and len(args) == 1:
+                return args[0] if not args[0] or args[0].endswith(('/', '\\')) else args[0] + os.sep
+            if func == 'normalizedirectory':
+                return _dir(os.path.join(*[_native_path(a) for a in args])) if args else ''
+            if func == 'normalizepath':
+                return os.path.normpath(os.path.join(self.project_dir, *[_native_path(a) for a in args])) if args else ''
+            if func == 'valueordefault' and len(args) == 2:
+                return args[0] or args[1]
+        elif cls == 'system.io.path':
+            if func == 'combine':
+                return os.path.join(*[_native_path(a) for a in args]) if args else ''
+            if func == 'getfullpath' and len(args) == 1:
+                return os.path.normpath(os.path.join(self.project_dir, _native_path(args[0])))
+            if func == 'getfilename' and len(args) == 1:
+                return os.path.basename(_native_path(args[0]))
+            if func == 'getdirectoryname' and len(args) == 1:
+                return os.path.dirname(_native_path(args[0]))
+        elif cls == 'system.string':
+            if func == 'isnullorempty' and len(args) == 1:
+                return str(not args[0]).lower()
+            if func == 'isnullorwhitespace' and len(args) == 1:
+                return str(not args[0].strip()).lower()
+            if func == 'copy' and len(args) == 1:
+                return args[0]
+        elif cls == 'system.environment' and func == 'getenvironmentvariable' and len(args) == 1:
+            value = os.environ.get(args[0])
+            self._environment[args[0]] = value
+            return value or ''
+        return None
+
+    def _expand_items(self, body: str) -> Optional[str]:
+        parts = _split_args(body)
+        if not parts or len(parts) > 2:
+            return None
+        expr = parts[0]
+        separator = self._expand_argument(parts[1]) if len(parts) == 2 else ';'
+        name, _, transform = expr.partition('->')
+        items = self.items.get(name.strip(), [])
+        transform = transform.strip()
+        if not transform:
+            values = [i.identity for i in items]
+        else:
+            xform, quoted = _unquote(transform)
+            if quoted:
+                values = [re.sub(r'%\((\w+)\)', lambda m, i=i: i.get_metadata(m.group(1)), xform) for i in items]
+            elif transform.lower() == 'distinct()':
+                seen = set()
+                values = []
+                for i in items:
+                    if i.identity.lower() not in seen:
+                        seen.add(i.identity.lower())
+                        values.append(i.identity)
+            else:
+                return None
+        return separator.join(values)
+
+    # --- Conditions ---
+
+    def evaluate_condition(self, condition: Optional[str]) -> bool:
+        """
+        Evaluates an MSBuild condition.
+        Supports ==, !=, <, >, <=, >=, and, or, !, parentheses, Exists() and HasTrailingSlash().
+        An empty condition is true, a condition that can't be parsed is false.
+        """
+        if condition is None or not condition.strip():
+            return True
+        try:
+            return _ConditionParser(self, condition).parse()
+        except ValueError:
+            return False
+
+    def exists(self, path: str) -> bool:
+        """Checks whether a file or directory exists, relative paths are resolved from the project directory."""
+        path = path.strip()
+        if not path:
+            return False
+        full = os.path.normpath(os.path.join(self.project_dir, _native_path(path)))
+        result = os.path.exists(full)
+        self._exists[full] = result
+        return result
+
+    # --- Evaluation ---
+
+    def _glob(self, pattern: str) -> List[str]:
+        results = sorted(glob.glob(pattern, recursive=True))
+        self._globs[pattern] = results
+        return results
+
+    def _evaluate(self) -> None:
+        for name, value in self.global_properties.items():
+            self._properties[name.lower()] = (name, value)
+        reserved = {
+            'MSBuildProjectFullPath': self.path,
+            'MSBuildProjectDirectory': self.project_dir,
+            'MSBuildProjectFile': os.path.basename(self.path),
+            'MSBuildProjectName': os.path.splitext(os.path.basename(self.path))[0],
+            'MSBuildProjectExtension': os.path.splitext(self.path)[1],
+        }
+        for name, value in reserved.items():
+            self._properties[name.lower()] = (name, value)
+
+        _, root = _load_document(self.path)
+        sdk_style = root.get('Sdk') is not None or root.find('Sdk') is not None
+        if sdk_style:
+            for name in ('Directory.Build.props', 'Directory.Packages.props'):
+                self._evaluate_implicit_import(name)
+        self._evaluate_file(self.path)
+        if sdk_style:
+            self._evaluate_implicit_import('Directory.Build.targets')
+
+        for this_file, element in self._item_groups:
+            self._this_file.append(this_file)
+            try:
+                self._evaluate_item_group(element)
+            finally:
+                self._this_file.pop()
+
+    def _evaluate_implicit_import(self, name: str) -> None:
+        """Imports the nearest file with the given name in the project directory or above."""
+        directory = self.project_dir
+        while True:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                if path not in self._files:
+                    self.imports.append(path)
+                    self._evaluate_file(path)
+                return
+            self._exists[path] = False
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return
+            directory = parent
+
+    def _evaluate_file(self, path: str) -> None:
+        digest, root = _load_document(path)
+        self._files[path] = digest
+        self._this_file.append(path)
+        try:
+            self._evaluate_children(root, path)
+        finally:
+            self._this_file.pop()
+
+    def _evaluate_children(self, element: ET.Element, path: str) -> None:
+        for child in element:
+            tag = child.tag
+            if not isinstance(tag, str):
+                continue
+            if tag == 'PropertyGroup':
+                if self.evaluate_condition(child.get('Condition')):
+                    for prop in child:
+                        if isinstance(prop.tag, str) and self.evaluate_condition(prop.get('Condition')):
+                            self._set_property(prop.tag, self.expand(prop.text).strip())
+            elif tag == 'ItemGroup':
+                self._item_groups.append((path, child))
+            elif tag == 'Import':
+                if self.evaluate_condition(child.get('Condition')):
+                    self._evaluate_import(child.get('Project', ''), path)
+            elif tag == 'ImportGroup':
+                if self.evaluate_condition(child.get('Condition')):
+                    self._evaluate_children(child, path)
+            elif tag == 'Choose':
+                self._evaluate_choose(child, path)
+            elif tag == 'Target':
+                name = child.get('Name')
+                if name:
+                    self.targets[name] = MSBuildTarget(child)
+                    self.target_files[name] = path
+
+    def _evaluate_choose(self, element: ET.Element, path: str) -> None:
+        for branch in element:
+            if branch.tag == 'When':
+                if self.evaluate_condition(branch.get('Condition')):
+                    self._evaluate_children(branch, path)
+                    return
+            elif branch.tag == 'Otherwise':
+                self._evaluate_children(branch, path)
+                return
+
+    def _evaluate_import(self, project: str, importing_file: str) -> None:
+        for spec in self.expand(project).split(';'):
+            spec = spec.strip()
+            if not spec:
+                continue
+            pattern = os.path.normpath(os.path.join(os.path.dirname(importing_file), _native_path(spec)))
+            paths = self._glob(pattern) if any(c in pattern for c in '*?') else [pattern]
+            for p in paths:
+                if p in self._files or p == self.path:
+                    continue
+                if not os.path.isfile(p):
+                    self._exists[p] = False
+                    continue
+                self.imports.append(p)
+                self._evaluate_file(p)
+
+    def _evaluate_item_group(self, group: ET.Element) -> None:
+        if not self.evaluate_condition(group.get('Condition')):
+            return
+        for item in group:
+            if not isinstance(item.tag, str) or not self.evaluate_condition(item.get('Condition')):
+                continue
+            items = self.items.setdefault(item.tag, [])
+            if item.get('Remove') is not None:
+                remove = {self._item_key(s) for s in self._expand_specs(item.get('Remove', ''))}
+                items[:] = [i for i in items if self._item_key(i.identity) not in remove]
+                continue
+            metadata = {k: self.expand(v) for k, v in item.attrib.items()
+                        if k not in ('Include', 'Exclude', 'Remove', 'Update', 'Condition', 'KeepMetadata', 'RemoveMetadata', 'KeepDuplicates')}
+            for m in item:
+                if isinstance(m.tag, str) and self.evaluate_condition(m.get('Condition')):
+                    metadata[m.tag] = self.expand(m.text).strip()
+            if item.get('Update') is not None:
+                update = {self._item_key(s) for s in self._expand_specs(item.get('Update', ''))}
+                for i in items:
+                    if self._item_key(i.identity) in update:
+                        i.metadata.update(metadata)
+                continue
+            exclude = {self._item_key(s) for s in self._expand_specs(item.get('Exclude', ''))}
+            for spec in self._expand_specs(item.get('Include', '')):
+                if self._item_key(spec) not in exclude:
+                    items.append(MSBuildItemInstance(item.tag, spec, self.project_dir, metadata))
+
+    def _expand_specs(self, text: str) -> List[str]:
+        specs: List[str] = []
+        for spec in self.expand(text).split(';'):
+            spec = spec.strip()
+            if not spec:
+                continue
+            if any(c in spec for c in '*?'):
+                pattern = os.path.join(self.project_dir, _native_path(spec))
+                specs.extend(os.path.relpath(p, self.project_dir) for p in self._glob(pattern))
+            else:
+                specs.append(spec)
+        return specs
+
+    def _item_key(self, spec: str) -> str:
+        return os.path.normcase(os.path.normpath(os.path.join(self.project_dir, _native_path(spec))))
+
+    def is_current(self) -> bool:
+        """
+        Checks whether this evaluation is still valid: no evaluated file changed its content,
+        no wildcard matches a different set of files and no used environment variable changed.
+        """
+        try:
+            for path, digest in self._files.items():
+                if _load_document(path)[0] != digest:
+                    return False
+        except (OSError, ET.ParseError):
+            return False
+        for pattern, results in self._globs.items():
+            if sorted(glob.glob(pattern, recursive=True)) != results:
+                return False
+        for name, value in self._environment.items():
+            if os.environ.get(name) != value:
+                return False
+        for path, exists in self._exists.items():
+            if os.path.exists(path) != exists:
+                return False
+        return True
+
+class _ConditionParser:
+    """
+    Recursive descent parser for MSBuild conditions.
+    """
+    def __init__(self, evaluation: MSBuildEvaluation, text: str):
+        self.evaluation = evaluation
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens: List[Tuple[str, str]] = []
+        i = 0
+        n = len(text)
+        while i < n:
+            c = text[i]
+            if c.isspace():
+                i += 1
+            elif c in "'\"`":
+                j = i + 1
+                while j < n and text[j] != c:
+                    if text[j] in '$@%' and j + 1 < n and text[j + 1] == '(':
+                        end = _find_closing(text, j + 1)
+                        if end < 0:
+                            raise ValueError(f"Unbalanced parenthesis in condition: {text}")
+                        j = end
+                    j += 1
+                if j >= n:
+                    raise ValueError(f"Unterminated string in condition: {text}")
+                tokens.append(('str', text[i + 1:j]))
+                i = j + 1
+            elif text.startswith(('==', '!=', '<=', '>='), i):
+                tokens.append(('op', text[i:i + 2]))
+                i += 2
+            elif c in '<>':
+                tokens.append(('op', c))
+                i += 1
+            elif c in '!(),':
+                tokens.append((c, c))
+                i += 1
+            else:
+                j = i
+                while j < n and not text[j].isspace() and text[j] not in "()=!<>,'\"`":
+                    if text[j] in '$@%' and j + 1 < n and text[j + 1] == '(':
+                        end = _find_closing(text, j + 1)
+                        if end < 0:
+                            raise ValueError(f"Unbalanced parenthesis in condition: {text}")
+                        j = end
+                    j += 1
+                word = text[i:j]
+                tokens.append((word.lower(), word) if word.lower() in ('and', 'or') else ('word', word))
+                i = j
+        return tokens
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise ValueError("Unexpected end of condition")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> bool:
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError("Unexpected token in condition")
+        return result
+
+    def _or(self) -> bool:
+        result = self._and()
+        while self._peek() == 'or':
+            self._next()
+            right = self._and()
+            result = result or right
+        return result
+
+    def _and(self) -> bool:
+        result = self._unary()
+        while self._peek() == 'and':
+            self._next()
+            right = self._unary()
+            result = result and right
+        return result
+
+    def _unary(self) -> bool:
+        if self._peek() == '!':
+            self._next()
+            return not self._unary()
+        return self._primary()
+
+    def _primary(self) -> bool:
+        if self._peek() == '(':
+            self._next()
+            result = self._or()
+            if self._next()[0] != ')':
+                raise ValueError("Expected ')' in condition")
+            return result
+        if self._peek() == 'word' and self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1][0] == '(':
+            return self._function()
+        left = self._operand()
+        if self._peek() == 'op':
+            op = self._next()[1]
+            return self._compare(left, op, self._operand())
+        value = left.strip().lower()
+        if value in _BOOL_TRUE:
+            return True
+        if value in _BOOL_FALSE:
+            return False
+        raise ValueError(f"Expected a boolean value in condition, got '{left}'")
+
+    def _function(self) -> bool:
+        name = self._next()[1].lower()
+        self._next()
+        args: List[str] = []
+        while self._peek() != ')':
+            args.append(self._operand())
+            if self._peek() == ',':
+                self._next()
+        self._next()
+        if name == 'exists' and len(args) == 1:
+            return self.evaluation.exists(args[0])
+        if name == 'hastrailingslash' and len(args) == 1:
+            return args[0].endswith(('/', '\\'))
+        raise ValueError(f"Unsupported condition function '{name}'")
+
+    def _operand(self) -> str:
+        kind, value = self._next()
+        if kind not in ('str', 'word'):
+            raise ValueError(f"Expected a value in condition, got '{value}'")
+        return self.evaluation.expand(value)
+
+    @staticmethod
+    def _compare(left: str, op: str, right: str) -> bool:
+        if op in ('==', '!='):
+            equal = left.lower() == right.lower()
+            if not equal:
+                ln, rn = _to_number(left), _to_number(right)
+                equal = ln is not None and ln == rn
+            return equal if op == '==' else not equal
+        ln, rn = _to_number(left), _to_number(right)
+        if ln is None or rn is None or ln[0] != rn[0]:
+            raise ValueError(f"Cannot compare '{left}' {op} '{right}'")
+        if op == '<':
+            return ln < rn
+        if op == '>':
+            return ln > rn
+        if op == '<=':
+            return ln <= rn
+        return ln >= rn
+
+def evaluate(path: str, global_properties: Optional[Dict[str, str]] = None) -> MSBuildEvaluation:
+    """
+    Evaluates an MSBuild project in-process.
+
+    Results are memoized per project and global properties, and reused as long as the
+    content hash of every evaluated file, the wildcard matches, the checked paths and the
+    used environment variables are unchanged.
+
+    :param path: Path to the project file.
+    :param global_properties: Global properties, as passed with /p: to MSBuild.
+    """
+    path = os.path.abspath(path)
+    key = (path, tuple(sorted((k.lower(), v) for k, v in (global_properties or {}).items())))
+    with _cache_lock:
+        cached = _evaluations.get(key)
+    if cached is not None and cached.is_current():
+        return cached
+    result = MSBuildEvaluation(path, global_properties)
+    result._evaluate()
+    with _cache_lock:
+        _evaluations[key] = result
+    return result
@@ -0,0 +1,231 @@
+import json
+import os
+import re
+from typing import Optional, Dict, List, Any, Iterable
+
+EVALUATION = 'evaluation'
+PROJECT = 'project'
+TARGET = 'target'
+TASK = 'task'
+
+_SECTIONS = {
+    'Project Evaluation Performance Summary:': EVALUATION,
+    'Project Performance Summary:': PROJECT,
+    'Target Performance Summary:': TARGET,
+    'Task Performance Summary:': TASK,
+}
+
+_ENTRY = re.compile(r'^(?P<indent>\s*)(?P<ms>\d+) ms\s+(?P<name>.+?)\s+(?P<calls>\d+) calls\s*$')
+_ELAPSED = re.compile(r'^\s*Time Elapsed (?P<h>\d+):(?P<m>\d+):(?P<s>\d+(?:\.\d+)?)\s*$')
+
+CONTAINER_TASKS = {'MSBuild', 'CallTarget'}
+"""Tasks whose time is spent waiting for other targets or projects, which are reported separately."""
+
+
+def get_logger_args(log_path: str) -> List[str]:
+    """
+    Get the MSBuild switches that write the performance summary to a log file.
+    The ninth file logger is used, so loggers passed by the user are not replaced.
+    """
+    return ['-fl9', f'-flp9:PerformanceSummary;Verbosity=quiet;LogFile={log_path}']
+
+
+class PerfEntry:
+    """
+    A line of the MSBuild performance summary.
+    """
+    def __init__(self, kind: str, name: str, time_ms: int, calls: int, project: Optional[str] = None) -> None:
+        self.kind = kind
+        self.name = name
+        self.time_ms = time_ms
+        """Time reported by MSBuild, in milliseconds."""
+        self.exclusive_ms = time_ms
+        """Time not spent waiting for other projects, targets or tasks, in milliseconds."""
+        self.calls = calls
+        self.project = project
+        """For the targets listed below a project, the project they were requested from."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'name': self.name,
+            'inclusive_ms': self.time_ms,
+            'exclusive_ms': self.exclusive_ms,
+            'calls': self.calls,
+        }
+        if self.project:
+            data['project'] = self.project
+        return data
+
+    def __repr__(self) -> str:
+        return f"PerfEntry({self.kind!r}, {self.name!r}, {self.time_ms})"
+
+
+class PerfReport:
+    """
+    Timing report parsed from the performance summary MSBuild writes with the
+    PerformanceSummary logger parameter.
+
+    Inclusive times are the times MSBuild reports. MSBuild already reports targets without the
+    targets they depend on. Exclusive times additionally leave out waiting for other builds:
+    for projects the time of the referenced projects built during the build is subtracted, and
+    tasks that only run other targets or projects, such as MSBuild and CallTarget, have none.
+    """
+    def __init__(self) -> None:
+        self.evaluations: List[PerfEntry] = []
+        self.projects: List[PerfEntry] = []
+        self.entry_targets: List[PerfEntry] = []
+        self.targets: List[PerfEntry] = []
+        self.tasks: List[PerfEntry] = []
+        self.elapsed_ms: Optional[int] = None
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> "PerfReport":
+        """
+        Parse the performance summary from the lines of an MSBuild log.
+        Lines outside of the summary sections are ignored, so complete console logs can be parsed.
+
+        Args:
+            lines: The lines of the log.
+
+        Returns:
+            PerfReport: The parsed report.
+        """
+        report = cls()
+        section: Optional[str] = None
+        project_indent: Optional[int] = None
+        current_project: Optional[str] = None
+        for raw in lines:
+            line = raw.rstrip('\r\n')
+            stripped = line.strip()
+            if stripped in _SECTIONS:
+                section = _SECTIONS[stripped]
+                project_indent = None
+                continue
+            elapsed = _ELAPSED.match(line)
+            if elapsed:
+                seconds = int(elapsed.group('h')) * 3600 + int(elapsed.group('m')) * 60 + float(elapsed.group('s'))
+                report.elapsed_ms = int(seconds * 1000)
+                section = None
+                continue
+            if section is None:
+                continue
+            m = _ENTRY.match(line)
+            if not m:
+                if stripped:
+                    section = None
+                continue
+
+            name, time_ms, calls = m.group('name'), int(m.group('ms')), int(m.group('calls'))
+            # Right aligned times: targets below a project end further right than the project
+            indent = len(m.group('indent')) + len(m.group('ms'))
+            if section == PROJECT:
+                if project_indent is None:
+                    project_indent = indent
+                if indent > project_indent and current_project is not None:
+                    report.entry_targets.append(PerfEntry(TARGET, name, time_ms, calls, current_project))
+                    continue
+                current_project = name
+                report.projects.append(PerfEntry(PROJECT, name, time_ms, calls))
+            elif section == EVALUATION:
+                report.evaluations.append(PerfEntry(EVALUATION, name, time_ms, calls))
+            elif section == TARGET:
+                report.targets.append(PerfEntry(TARGET, name, time_ms, calls))
+            elif section == TASK:
+                entry = PerfEntry(TASK, name, time_ms, calls)
+                if name in CONTAINER_TASKS:
+                    entry.exclusive_ms = 0
+                report.tasks.append(entry)
+        return report
+
+    @classmethod
+    def from_file(cls, path: str) -> "PerfReport":
+        """
+        Parse the performance summary of a saved log file.
+        """
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return cls.parse(f)
+
+    def apply_references(self, references: Dict[str, List[str]]) -> None:
+        """
+        Compute the exclusive time of projects from their project references.
+
+        Args:
+            references: The referenced project paths of every project path.
+        """
+        times = {os.path.normcase(os.path.normpath(p.name)): p.time_ms for p in self.projects}
+        for project in self.projects:
+            refs = references.get(project.name) or references.get(os.path.normpath(project.name)) or []
+            nested = sum(times.get(os.path.normcase(os.path.normpath(r)), 0) for r in refs)
+            project.exclusive_ms = max(0, project.time_ms - nested)
+
+    def slowest(self, kind: str, count: int = 10, exclusive: bool = False) -> List[PerfEntry]:
+        """
+        Get the slowest entries of a kind.
+
+        Args:
+            kind: One of 'evaluation', 'project', 'target' or 'task'.
+            count: Maximum number of entries.
+            exclusive: If True, sort by exclusive instead of inclusive time.
+        """
+        entries = {
+            EVALUATION: self.evaluations,
+            PROJECT: self.projects,
+            TARGET: self.targets,
+            TASK: self.tasks,
+        }[kind]
+        key = (lambda e: e.exclusive_ms) if exclusive else (lambda e: e.time_ms)
+        return sorted(entries, key=key, reverse=True)[:count]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'elapsed_ms': self.elapsed_ms,
+            'evaluations': [e.to_dict() for e in self.evaluations],
+            'projects': [e.to_dict() for e in self.projects],
+            'entry_targets': [e.to_dict() for e in self.entry_targets],
+            'targets': [e.to_dict() for e in self.targets],
+            'tasks': [e.to_dict() for e in self.tasks],
+        }
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the report as JSON.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self, count: int = 10, base_dir: Optional[str] = None) -> str:
+        """
+        Format the slowest projects, targets and tasks as a text table.
+
+        Args:
+            count: Number of entries shown per kind.
+            base_dir: Directory project paths are shown relative to.
+        """
+        lines: List[str] = []
+        sections = [
+            ('Projects', PROJECT),
+            ('Project evaluations', EVALUATION),
+            ('Targets', TARGET),
+            ('Tasks', TASK),
+        ]
+        for title, kind in sections:
+            entries = self.slowest(kind, count)
+            if not entries:
+                continue
+            names = []
+            for e in entries:
+                name = e.name
+                if base_dir and kind in (PROJECT, EVALUATION) and os.path.isabs(name):
+                    name = os.path.relpath(name, base_dir)
+                names.append(name)
+            width = max(len(title), *(len(n) for n in names))
+            lines.append(f"{title.ljust(width)}  {'Inclusive':>10}  {'Exclusive':>10}  {'Calls':>6}")
+            for name, e in zip(names, entries):
+                lines.append(f"{name.ljust(width)}  {e.time_ms:>8} ms  {e.exclusive_ms:>8} ms  {e.calls:>6}")
+            lines.append('')
+        if self.elapsed_ms is not None:
+            lines.append(f"Time elapsed: {self.elapsed_ms / 1000:.2f}s")
+        return '\n'.join(lines).rstrip('\n')
@@ -0,0 +1,173 @@
+import collections
+import subprocess
+import sys
+from typing import Optional, List, Callable, Iterator, TextIO, Deque
+
+DEFAULT_TAIL_LINES = 200
+"""Number of output lines kept in memory for error reports."""
+
+
+class StreamingProcess:
+    """
+    A process whose combined standard output and error are read line by line as they arrive.
+
+    Every line can be passed to callbacks, echoed, and written to a log file. Only the last
+    lines are kept in memory, in a ring buffer, so memory doesn't grow with the output size.
+
+    Iterate over the instance to get the lines, or call wait to consume them with the callbacks only.
+    """
+    def __init__(
+        self,
+        cmd: List[str],
+        on_line: Optional[Callable[[str], None]] = None,
+        log_path: Optional[str] = None,
+        echo: Optional[TextIO] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        merge_stderr: bool = True,
+        **popen_kwargs,
+    ) -> None:
+        """
+        Start the process.
+
+        Args:
+            cmd: The command line.
+            on_line: Function called with every line, without its line ending.
+            log_path: Optional path of a file the output is written to as well.
+            echo: Optional stream every line is written to, such as sys.stdout.
+            tail_lines: Number of last lines kept for the result.
+            merge_stderr: If True, standard error is read with standard output, otherwise it is discarded.
+            **popen_kwargs: Additional arguments for subprocess.Popen.
+
+        Raises:
+            OSError: If the process can't be started.
+        """
+        self.args = cmd
+        self.tail: Deque[str] = collections.deque(maxlen=max(0, tail_lines))
+        self.line_count = 0
+        self._callbacks: List[Callable[[str], None]] = [on_line] if on_line else []
+        self._echo = echo
+        self._log: Optional[TextIO] = None
+        if log_path:
+            self._log = open(log_path, 'w', encoding='utf-8')
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if merge_stderr else subprocess.DEVNULL,
+                stdin=popen_kwargs.pop('stdin', subprocess.DEVNULL),
+                text=True,
+                errors='replace',
+                bufsize=1,
+                **popen_kwargs,
+            )
+        except OSError:
+            self._close_log()
+            raise
+
+    def add_callback(self, callback: Callable[[str], None]) -> None:
+        """
+        Add a function called with every line read from now on.
+        """
+        self._callbacks.append(callback)
+
+    def __iter__(self) -> Iterator[str]:
+        stdout = self.process.stdout
+        if stdout is None:
+            return
+        for raw in stdout:
+            line = raw.rstrip('\r\n')
+            self.line_count += 1
+            self.tail.append(line)
+            if self._log is not None:
+                self._log.write(line + '\n')
+            if self._echo is not None:
+                self._echo.write(line + '\n')
+                self._echo.flush()
+            for callback in self._callbacks:
+                callback(line)
+            yield line
+
+    def wait(self) -> subprocess.CompletedProcess:
+        """
+        Read the remaining output and wait for the process to exit.
+
+        Returns:
+            subprocess.CompletedProcess: The exit code, with the last lines of output as stdout.
+        """
+        try:
+            for _ in self:
+                pass
+            returncode = self.process.wait()
+        finally:
+            self._close()
+        return subprocess.CompletedProcess(self.args, returncode, '\n'.join(self.tail))
+
+    def terminate(self) -> None:
+        """
+        Ask the process to exit.
+        """
+        if self.process.poll() is None:
+            self.process.terminate()
+
+    def kill(self) -> None:
+        """
+        Kill the process and release its resources.
+        """
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._close()
+
+    @property
+    def truncated(self) -> bool:
+        """
+        Whether older lines were dropped from the tail.
+        """
+        return self.line_count > len(self.tail)
+
+    def _close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _close(self) -> None:
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+        self._close_log()
+
+    def __enter__(self) -> "StreamingProcess":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.kill()
+        else:
+            self.wait()
+
+
+def run(
+    cmd: List[str],
+    on_line: Optional[Callable[[str], None]] = None,
+    log_path: Optional[str] = None,
+    echo: bool = True,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+) -> subprocess.CompletedProcess:
+    """
+    Run a command to completion, streaming its output.
+
+    Args:
+        cmd: The command line.
+        on_line: Function called with every line.
+        log_path: Optional path of a file the output is written to as well.
+        echo: If True, every line is written to stdout as it arrives.
+        tail_lines: Number of last lines returned as stdout of the result.
+
+    Returns:
+        subprocess.CompletedProcess: The exit code, with the last lines of output as stdout.
+    """
+    proc = StreamingProcess(cmd, on_line=on_line, log_path=log_path, echo=sys.stdout if echo else None, tail_lines=tail_lines)
+    try:
+        return proc.wait()
+    except BaseException:
+        proc.kill()
+        raise
@@ -0,0 +1,381 @@
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Optional, Dict, List, Any, Iterable, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from .msbuild import iterelements
+
+TRX = 'trx'
+COBERTURA = 'cobertura'
+
+TRX_NAMESPACE = 'http://microsoft.com/schemas/VisualStudio/TeamTest/2010'
+
+_TRX_SPOOLED = ('Results', 'TestDefinitions', 'TestEntries', 'TestLists')
+"""TRX sections whose children are written to temporary files while the inputs are read."""
+
+_OUTCOMES = ['Completed', 'Warning', 'Inconclusive', 'Timeout', 'Aborted', 'Error', 'Failed']
+"""Run outcomes from best to worst, the merged run gets the worst outcome of its inputs."""
+
+_CONDITION_COVERAGE = re.compile(r'\((\d+)/(\d+)\)')
+_FRACTION = re.compile(r'(\.\d{6})\d+')
+
+
+def detect_format(path: str) -> Optional[str]:
+    """
+    Detect the format of a test result or coverage file from its root element.
+
+    Returns:
+        Optional[str]: 'trx', 'cobertura', or None for other files.
+    """
+    try:
+        for _, elem in ET.iterparse(path, events=('start',)):
+            tag = elem.tag.rsplit('}', 1)[-1]
+            return {'TestRun': TRX, 'coverage': COBERTURA}.get(tag)
+    except (ET.ParseError, OSError):
+        pass
+    return None
+
+
+class XmlWriter:
+    """
+    Writes an XML document incrementally: start and end tags are written as they are
+    requested and complete elements are serialized one at a time.
+    """
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.stream.write('<?xml version="1.0" encoding="utf-8"?>\n')
+
+    def start(self, tag: str, attrib: Optional[Dict[str, Any]] = None) -> None:
+        self.stream.write(f"<{tag}{self._attributes(attrib)}>\n")
+
+    def end(self, tag: str) -> None:
+        self.stream.write(f"</{tag}>\n")
+
+    def empty(self, tag: str, attrib: Optional[Dict[str, Any]] = None) -> None:
+        self.stream.write(f"<{tag}{self._attributes(attrib)} />\n")
+
+    def element(self, elem: ET.Element) -> None:
+        self.stream.write(ET.tostring(elem, encoding='unicode').strip() + '\n')
+
+    def text(self, tag: str, value: str, attrib: Optional[Dict[str, Any]] = None) -> None:
+        self.stream.write(f"<{tag}{self._attributes(attrib)}>{escape(value)}</{tag}>\n")
+
+    def raw(self, source: TextIO) -> None:
+        """
+        Copy serialized elements from a temporary file.
+        """
+        import shutil
+
+        source.seek(0)
+        shutil.copyfileobj(source, self.stream)
+
+    @staticmethod
+    def _attributes(attrib: Optional[Dict[str, Any]]) -> str:
+        if not attrib:
+            return ''
+        return ''.join(f" {name}={quoteattr(str(value))}" for name, value in attrib.items() if value is not None)
+
+
+def _parse_time(value: str) -> Any:
+    """
+    Parse a TRX timestamp for comparison. TRX files have 7 fractional digits, which
+    datetime doesn't accept, and timestamps that can't be parsed compare as strings.
+    """
+    import datetime
+
+    try:
+        return datetime.datetime.fromisoformat(_FRACTION.sub(r'\1', value))
+    except ValueError:
+        return value
+
+
+def merge_trx(inputs: Iterable[str], output: str) -> Dict[str, int]:
+    """
+    Merge TRX test result files into one.
+
+    Every input is read once with a streaming parser. Results, test definitions and entries
+    are written to temporary files as they are read, so memory doesn't grow with the number
+    or size of the inputs; only the ids of the test definitions are kept to skip duplicates.
+    Counters are summed, the run spans from the earliest start to the latest finish, and the
+    outcome is the worst of the inputs.
+
+    Args:
+        inputs: Paths of the TRX files.
+        output: Path of the merged file.
+
+    Returns:
+        Dict[str, int]: The summed counters, such as total, passed and failed.
+
+    Raises:
+        ET.ParseError: If an input is not well-formed XML.
+        ValueError: If an input is not a TRX file.
+    """
+    import uuid
+
+    counters: Dict[str, int] = {}
+    times: Dict[str, Tuple[Any, str]] = {}
+    outcome = _OUTCOMES[0]
+    settings: Optional[ET.Element] = None
+    settings_children: List[ET.Element] = []
+    seen_ids: Dict[str, set] = {'TestDefinitions': set(), 'TestLists': set()}
+    spools = {section: tempfile.TemporaryFile('w+', encoding='utf-8') for section in _TRX_SPOOLED + ('RunInfos',)}
+    try:
+        for path in inputs:
+            for ancestors, elem in iterelements(path, 2):
+                depth = len(ancestors)
+                if depth == 0:
+                    if elem.tag != 'TestRun':
+                        raise ValueError(f"'{path}' is not a TRX file.")
+                    continue
+                parent = ancestors[-1].tag
+                if depth == 2 and parent in _TRX_SPOOLED:
+                    ids = seen_ids.get(parent)
+                    if ids is not None:
+                        if elem.get('id') in ids:
+                            continue
+                        ids.add(elem.get('id'))
+                    spools[parent].write(ET.tostring(elem, encoding='unicode').strip() + '\n')
+                elif depth == 2 and parent == 'TestSettings':
+                    if settings is None:
+                        settings_children.append(elem)
+                elif depth == 2 and parent == 'ResultSummary':
+                    if elem.tag == 'Counters':
+                        for name, value in elem.attrib.items():
+                            if value.isdigit():
+                                counters[name] = counters.get(name, 0) + int(value)
+                    elif elem.tag == 'RunInfos':
+                        for info in elem:
+                            spools['RunInfos'].write(ET.tostring(info, encoding='unicode').strip() + '\n')
+                elif depth == 1 and elem.tag == 'Times':
+                    for name, value in elem.attrib.items():
+                        parsed = _parse_time(value)
+                        current = times.get(name)
+                        later = name == 'finish'
+                        try:
+                            better = current is None or (parsed > current[0] if later else parsed < current[0])
+                        except TypeError:
+                            better = False
+                        if better:
+                            times[name] = (parsed, value)
+                elif depth == 1 and elem.tag == 'TestSettings' and settings is None:
+                    elem.extend(settings_children)
+                    settings = elem
+                elif depth == 1 and elem.tag == 'ResultSummary':
+                    result = elem.get('outcome', _OUTCOMES[0])
+                    if result in _OUTCOMES and _OUTCOMES.index(result) > _OUTCOMES.index(outcome):
+                        outcome = result
+
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            writer = XmlWriter(f)
+            writer.start('TestRun', {'id': str(uuid.uuid4()), 'name': 'Merged test run', 'xmlns': TRX_NAMESPACE})
+            if times:
+                writer.empty('Times', {name: value for name, (_, value) in times.items()})
+            if settings is not None:
+                writer.element(settings)
+            for section in _TRX_SPOOLED:
+                writer.start(section)
+                writer.raw(spools[section])
+                writer.end(section)
+            writer.start('ResultSummary', {'outcome': outcome})
+            writer.empty('Counters', counters)
+            if spools['RunInfos'].tell():
+                writer.start('RunInfos')
+                writer.raw(spools['RunInfos'])
+                writer.end('RunInfos')
+            writer.end('ResultSummary')
+            writer.end('TestRun')
+    finally:
+        for spool in spools.values():
+            spool.close()
+    return counters
+
+
+class _ClassCoverage:
+    __slots__ = ('complexity', 'lines', 'methods')
+
+    def __init__(self) -> None:
+        self.complexity = 0.0
+        self.lines: Dict[int, List[int]] = {}
+        """[hits, is branch, covered conditions, total conditions] by line number."""
+        self.methods: Dict[Tuple[str, str], Tuple[float, List[int]]] = {}
+        """Complexity and line numbers by method name and signature."""
+
+    def add_line(self, line: ET.Element) -> int:
+        number = int(line.get('number', '0'))
+        entry = self.lines.get(number)
+        if entry is None:
+            entry = self.lines[number] = [0, 0, 0, 0]
+        entry[0] += int(line.get('hits', '0'))
+        if line.get('branch', '').lower() == 'true':
+            entry[1] = 1
+            m = _CONDITION_COVERAGE.search(line.get('condition-coverage', ''))
+            if m:
+                # Shards can't tell which conditions they covered, so the best one is kept
+                entry[2] = max(entry[2], int(m.group(1)))
+                entry[3] = max(entry[3], int(m.group(2)))
+        return number
+
+
+def _rates(lines: Iterable[List[int]]) -> Tuple[int, int, int, int]:
+    covered = valid = branches_covered = branches_valid = 0
+    for hits, _, conditions_covered, conditions in lines:
+        valid += 1
+        covered += 1 if hits else 0
+        branches_covered += conditions_covered
+        branches_valid += conditions
+    return covered, valid, branches_covered, branches_valid
+
+
+def _rate(covered: int, valid: int) -> str:
+    return f"{covered / valid:.4g}" if valid else '1'
+
+
+def merge_cobertura(inputs: Iterable[str], output: str) -> Dict[str, int]:
+    """
+    Merge Cobertura coverage reports into one.
+
+    Every input is read once with a streaming parser, one class at a time. Hits of the same
+    line of the same class and file are summed, and branch coverage keeps the most covered
+    conditions of any input, since reports don't say which conditions were covered. Memory is
+    bounded by the number of distinct lines, not by the number of reports. Rates are computed
+    again from the merged lines.
+
+    Args:
+        inputs: Paths of the Cobertura XML files.
+        output: Path of the merged file.
+
+    Returns:
+        Dict[str, int]: lines-covered, lines-valid, branches-covered and branches-valid of the merged report.
+
+    Raises:
+        ET.ParseError: If an input is not well-formed XML.
+        ValueError: If an input is not a Cobertura report.
+    """
+    packages: Dict[str, Dict[Tuple[str, str], _ClassCoverage]] = {}
+    package_complexity: Dict[str, float] = {}
+    sources: Dict[str, None] = {}
+    version: Optional[str] = None
+    timestamp = 0
+    for path in inputs:
+        for ancestors, elem in iterelements(path, 4):
+            depth = len(ancestors)
+            if depth == 0:
+                if elem.tag != 'coverage':
+                    raise ValueError(f"'{path}' is not a Cobertura report.")
+                version = version or elem.get('version')
+                stamp = elem.get('timestamp', '')
+                timestamp = max(timestamp, int(stamp) if stamp.isdigit() else 0)
+            elif depth == 2 and ancestors[1].tag == 'sources':
+                if elem.text and elem.text.strip():
+                    sources[elem.text.strip()] = None
+            elif depth == 2 and elem.tag == 'package':
+                name = elem.get('name', '')
+                package_complexity[name] = max(package_complexity.get(name, 0.0), float(elem.get('complexity', '0') or 0))
+            elif depth == 4 and elem.tag == 'class':
+                package = ancestors[2].get('name', '')
+                key = (elem.get('name', ''), elem.get('filename', ''))
+                coverage = packages.setdefault(package, {}).get(key)
+                if coverage is None:
+                    coverage = packages[package][key] = _ClassCoverage()
+                coverage.complexity = max(coverage.complexity, float(elem.get('complexity', '0') or 0))
+                for line in elem.iterfind('lines/line'):
+                    coverage.add_line(line)
+                for method in elem.iterfind('methods/method'):
+                    method_key = (method.get('name', ''), method.get('signature', ''))
+                    numbers = [int(line.get('number', '0')) for line in method.iterfind('lines/line')]
+                    for line in method.iterfind('lines/line'):
+                        # Lines of methods are normally repeated in the lines of their class
+                        if int(line.get('number', '0')) not in coverage.lines:
+                            coverage.add_line(line)
+                    previous = coverage.methods.get(method_key)
+                    if previous is not None:
+                        numbers = sorted(set(previous[1]) | set(numbers))
+                    complexity = float(method.get('complexity', '0') or 0)
+                    coverage.methods[method_key] = (max(complexity, previous[0] if previous else 0.0), numbers)
+
+    def line_attributes(number: int, entry: List[int]) -> Dict[str, Any]:
+        attrib: Dict[str, Any] = {'number': number, 'hits': entry[0], 'branch': 'True' if entry[1] else 'False'}
+        if entry[1] and entry[3]:
+            attrib['condition-coverage'] = f"{entry[2] * 100 // entry[3]}% ({entry[2]}/{entry[3]})"
+        return attrib
+
+    all_lines = [e for classes in packages.values() for c in classes.values() for e in c.lines.values()]
+    covered, valid, branches_covered, branches_valid = _rates(all_lines)
+    del all_lines
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        writer = XmlWriter(f)
+        writer.start('coverage', {
+            'line-rate': _rate(covered, valid),
+            'branch-rate': _rate(branches_covered, branches_valid),
+            'lines-covered': covered,
+            'lines-valid': valid,
+            'branches-covered': branches_covered,
+            'branches-valid': branches_valid,
+            'complexity': f"{sum(package_complexity.values()):g}",
+            'version': version or '1.9',
+            'timestamp': timestamp,
+        })
+        writer.start('sources')
+        for source in sources:
+            writer.text('source', source)
+        writer.end('sources')
+        writer.start('packages')
+        for package in sorted(packages):
+            classes = packages[package]
+            p = _rates(e for c in classes.values() for e in c.lines.values())
+            writer.start('package', {
+                'name': package,
+                'line-rate': _rate(p[0], p[1]),
+                'branch-rate': _rate(p[2], p[3]),
+                'complexity': f"{package_complexity.get(package, 0.0):g}",
+            })
+            writer.start('classes')
+            for (name, filename), coverage in sorted(classes.items()):
+                c = _rates(coverage.lines.values())
+                writer.start('class', {
+                    'name': name,
+                    'filename': filename,
+                    'line-rate': _rate(c[0], c[1]),
+                    'branch-rate': _rate(c[2], c[3]),
+                    'complexity': f"{coverage.complexity:g}",
+                })
+                writer.start('methods')
+                for (method_name, signature), (complexity, numbers) in sorted(coverage.methods.items()):
+                    m = _rates(coverage.lines[n] for n in numbers)
+                    writer.start('method', {
+                        'name': method_name,
+                        'signature': signature,
+                        'line-rate': _rate(m[0], m[1]),
+                        'branch-rate': _rate(m[2], m[3]),
+                        'complexity': f"{complexity:g}",
+                    })
+                    writer.start('lines')
+                    for n in numbers:
+                        writer.empty('line', line_attributes(n, coverage.lines[n]))
+                    writer.end('lines')
+                    writer.end('method')
+                writer.end('methods')
+                writer.start('lines')
+                for n in sorted(coverage.lines):
+                    writer.empty('line', line_attributes(n, coverage.lines[n]))
+                writer.end('lines')
+                writer.end('class')
+            writer.end('classes')
+            writer.end('package')
+        writer.end('packages')
+        writer.end('coverage')
+    return {
+        'lines-covered': covered,
+        'lines-valid': valid,
+        'branches-covered': branches_covered,
+        'branches-valid': branches_valid,
+    }
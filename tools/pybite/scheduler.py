@@ -0,0 +1,248 @@
+import os
+import sys
+import threading
+import time
+from typing import Optional, Dict, List, Callable, TextIO, Tuple
+
+from .process import StreamingProcess
+from .solution import SolutionGraph, ProjectNode
+
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+CANCELLED = 'cancelled'
+
+
+class ProjectResult:
+    """
+    Outcome of running the command of one project.
+    """
+    def __init__(
+        self,
+        node: ProjectNode,
+        status: str,
+        returncode: Optional[int] = None,
+        start: float = 0.0,
+        end: float = 0.0,
+        tail: Optional[List[str]] = None,
+    ) -> None:
+        self.node = node
+        self.status = status
+        self.returncode = returncode
+        self.start = start
+        self.end = end
+        self.tail: List[str] = tail or []
+        """Last lines of the output of the project's process."""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"ProjectResult({self.node.name!r}, {self.status!r})"
+
+
+class ParallelScheduler:
+    """
+    Runs one process per project of a solution graph, starting a project once all the
+    projects it references succeeded, with at most max_workers processes at a time.
+
+    The output of every process is streamed line by line with the project name as prefix.
+    Projects that reference a failed project, directly or not, are skipped.
+    """
+    TAIL_LINES = 20
+    """Number of output lines of each project kept for the summary of failed projects."""
+
+    def __init__(
+        self,
+        graph: SolutionGraph,
+        get_command: Callable[[ProjectNode], List[str]],
+        max_workers: Optional[int] = None,
+        output: Optional[TextIO] = None,
+    ) -> None:
+        """
+        Args:
+            graph: The project graph to schedule.
+            get_command: Function returning the command line to run for a project.
+            max_workers: Maximum number of concurrent processes, defaults to the CPU count.
+            output: Stream the prefixed output is written to, defaults to stdout.
+        """
+        self.graph = graph
+        self.get_command = get_command
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.output = output or sys.stdout
+        self.results: Dict[str, ProjectResult] = {}
+        self.elapsed: float = 0.0
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._processes: Dict[str, StreamingProcess] = {}
+        self._width = max((len(n.name) for n in graph.projects.values()), default=0)
+
+    def _write(self, node: ProjectNode, line: str) -> None:
+        with self._lock:
+            self.output.write(f"[{node.name.ljust(self._width)}] {line.rstrip()}\n")
+            self.output.flush()
+
+    def _run_project(self, node: ProjectNode) -> ProjectResult:
+        cmd = self.get_command(node)
+        start = time.monotonic()
+        if self._cancelled:
+            return ProjectResult(node, CANCELLED, None, start, start)
+        self._write(node, ' '.join(cmd))
+        try:
+            proc = StreamingProcess(cmd, on_line=lambda line: self._write(node, line), tail_lines=self.TAIL_LINES)
+        except OSError as e:
+            self._write(node, f"error: {e}")
+            return ProjectResult(node, FAILED, None, start, time.monotonic())
+
+        with self._lock:
+            self._processes[node.path] = proc
+            if self._cancelled:
+                proc.terminate()
+        try:
+            returncode = proc.wait().returncode
+        finally:
+            with self._lock:
+                self._processes.pop(node.path, None)
+        if self._cancelled:
+            status = CANCELLED
+        else:
+            status = SUCCEEDED if returncode == 0 else FAILED
+        return ProjectResult(node, status, returncode, start, time.monotonic(), list(proc.tail))
+
+    def _priorities(self) -> Dict[str, int]:
+        """
+        Number of projects that depend on each project, directly or not, so the projects
+        that unblock the most work are started first.
+        """
+        dependents: Dict[str, List[str]] = {p: [] for p in self.graph.projects}
+        for path, node in self.graph.projects.items():
+            for ref in node.project_references:
+                if ref in dependents:
+                    dependents[ref].append(path)
+
+        priorities: Dict[str, int] = {}
+        for path in self.graph.projects:
+            seen = set()
+            stack = list(dependents[path])
+            while stack:
+                p = stack.pop()
+                if p not in seen:
+                    seen.add(p)
+                    stack.extend(dependents[p])
+            priorities[path] = len(seen)
+        return priorities
+
+    def run(self) -> Dict[str, ProjectResult]:
+        """
+        Run the command of every project.
+
+        Returns:
+            Dict[str, ProjectResult]: The result of every project, by project path.
+
+        Raises:
+            ValueError: If the project references contain a cycle.
+        """
+        import concurrent.futures
+
+        order = self.graph.topological_order()
+        priorities = self._priorities()
+        pending: List[ProjectNode] = list(order)
+        running: Dict[concurrent.futures.Future, ProjectNode] = {}
+        started = time.monotonic()
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                if self._cancelled:
+                    pending = []
+                ready: List[ProjectNode] = []
+                for node in list(pending):
+                    refs = [self.results.get(r) for r in node.project_references if r in self.graph.projects]
+                    if any(r is not None and r.status != SUCCEEDED for r in refs):
+                        pending.remove(node)
+                        now = time.monotonic()
+                        self.results[node.path] = ProjectResult(node, SKIPPED, None, now, now)
+                        self._write(node, "skipped, a referenced project failed")
+                    elif all(r is not None for r in refs):
+                        ready.append(node)
+
+                ready.sort(key=lambda n: priorities[n.path], reverse=True)
+                for node in ready[:self.max_workers - len(running)]:
+                    pending.remove(node)
+                    running[pool.submit(self._run_project, node)] = node
+
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    self.results[node.path] = future.result()
+        except BaseException:
+            with self._lock:
+                for proc in self._processes.values():
+                    proc.terminate()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            self.elapsed = time.monotonic() - started
+        return self.results
+
+    def cancel(self) -> None:
+        """
+        Stop starting projects and terminate the running processes.
+        Can be called from another thread, run returns once the processes exited.
+        """
+        with self._lock:
+            self._cancelled = True
+            for proc in self._processes.values():
+                proc.terminate()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def critical_path(self) -> Tuple[float, List[ProjectNode]]:
+        """
+        Find the longest chain of dependent projects by the time their commands took.
+
+        Returns:
+            Tuple[float, List[ProjectNode]]: The duration of the chain and its projects in build order.
+        """
+        best: Dict[str, Tuple[float, List[ProjectNode]]] = {}
+        for node in self.graph.topological_order():
+            result = self.results.get(node.path)
+            if result is None or result.status in (SKIPPED, CANCELLED):
+                continue
+            chains = [best[r] for r in node.project_references if r in best]
+            longest = max(chains, key=lambda c: c[0], default=(0.0, []))
+            best[node.path] = (longest[0] + result.duration, longest[1] + [node])
+        return max(best.values(), key=lambda c: c[0], default=(0.0, []))
+
+    def print_summary(self) -> None:
+        """
+        Print the status and duration of every project, the total time and the critical path.
+        """
+        print(f"\nParallel summary ({self.max_workers} workers):")
+        for node in self.graph.topological_order():
+            result = self.results.get(node.path)
+            if result is None:
+                continue
+            duration = f"{result.duration:8.1f}s" if result.status != SKIPPED else f"{'-':>9}"
+            print(f"  {node.name.ljust(self._width)}  {result.status:<9} {duration}")
+
+        for result in self.results.values():
+            if result.status == FAILED and result.tail:
+                print(f"\nLast output of {result.node.name}:")
+                for line in result.tail:
+                    print(f"  {line}")
+
+        serial = sum(r.duration for r in self.results.values())
+        length, chain = self.critical_path()
+        print(f"Total time: {self.elapsed:.1f}s (serial {serial:.1f}s)")
+        if chain:
+            print(f"Critical path: {length:.1f}s ({' -> '.join(n.name for n in chain)})")
+
+    @property
+    def succeeded(self) -> bool:
+        return all(r.status == SUCCEEDED for r in self.results.values())
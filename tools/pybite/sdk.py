@@ -0,0 +1,116 @@
+import json
+import os
+from typing import Optional, Dict, List
+
+CACHE_VERSION = 1
+
+
+def _dotnet_executable() -> str:
+    return 'dotnet.exe' if os.name == 'nt' else 'dotnet'
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _candidate_dirs(dotnet_dir: str) -> List[str]:
+    """
+    Return the directories that may contain the dotnet muxer, in lookup order.
+    """
+    dirs: List[str] = []
+    for d in [dotnet_dir] + os.environ.get('PATH', '').split(os.pathsep):
+        if d and d not in dirs:
+            dirs.append(d)
+    return dirs
+
+
+def _compute_stamp(candidates: List[str], extra_files: List[str]) -> Dict[str, Optional[int]]:
+    """
+    Build the invalidation stamp: mtimes of every candidate directory, the resolved
+    dotnet roots and their sdk directories, and any extra files (e.g. global.json).
+    """
+    stamp: Dict[str, Optional[int]] = {}
+    for d in candidates:
+        stamp[d] = _mtime(d)
+    for root in find_dotnet_roots(candidates):
+        stamp[root] = _mtime(root)
+        stamp[os.path.join(root, 'sdk')] = _mtime(os.path.join(root, 'sdk'))
+    for f in extra_files:
+        stamp[f] = _mtime(f)
+    return stamp
+
+
+def find_dotnet_roots(candidates: List[str]) -> List[str]:
+    """
+    Return the dotnet installation roots found in the given directories, in lookup order.
+    Symlinked muxers (e.g. /usr/bin/dotnet) are resolved to their installation root.
+    """
+    exe = _dotnet_executable()
+    roots: List[str] = []
+    for d in candidates:
+        path = os.path.join(d, exe)
+        if os.path.isfile(path):
+            root = os.path.dirname(os.path.realpath(path))
+            if root not in roots:
+                roots.append(root)
+    return roots
+
+
+def list_sdks(root: str) -> List[str]:
+    """
+    List the SDK versions installed under a dotnet root by reading its sdk/<version> directories.
+    """
+    sdk_dir = os.path.join(root, 'sdk')
+    try:
+        entries = os.listdir(sdk_dir)
+    except OSError:
+        return []
+    return sorted(
+        v for v in entries
+        if v[:1].isdigit() and os.path.isfile(os.path.join(sdk_dir, v, 'dotnet.dll'))
+    )
+
+
+def find_installed_sdks(dotnet_dir: str, cache_path: Optional[str] = None, extra_files: Optional[List[str]] = None) -> Optional[List[str]]:
+    """
+    Find the installed .NET SDKs without starting a dotnet process.
+
+    Mirrors 'dotnet --list-sdks': the SDKs are read from the root of the first dotnet
+    muxer found in dotnet_dir or on PATH. The result is cached on disk and reused as long
+    as the candidate directories, the dotnet roots and the extra files keep their mtimes.
+
+    Args:
+        dotnet_dir: The local .NET SDK directory, searched before PATH.
+        cache_path: Optional path to the JSON cache file.
+        extra_files: Additional files whose changes invalidate the cache.
+
+    Returns:
+        Optional[List[str]]: Installed SDK versions, or None if no dotnet root was found.
+    """
+    candidates = _candidate_dirs(dotnet_dir)
+    stamp = _compute_stamp(candidates, extra_files or [])
+
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == CACHE_VERSION and cached.get('stamp') == stamp:
+                return cached.get('sdks')
+        except (OSError, ValueError):
+            pass
+
+    roots = find_dotnet_roots(candidates)
+    sdks = list_sdks(roots[0]) if roots else None
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'stamp': stamp, 'sdks': sdks}, f)
+        except OSError:
+            pass
+
+    return sdks
@@ -0,0 +1,480 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional, Dict, List, Callable, Iterable, TextIO, Tuple
+
+from .process import StreamingProcess
+from .scheduler import SUCCEEDED, FAILED, CANCELLED
+
+_LIST_HEADER = 'The following Tests are available:'
+_TRX_NAMESPACE = '{http://microsoft.com/schemas/VisualStudio/TeamTest/2010}'
+_FILTER_SPECIAL = '\\()&|=!~'
+
+
+def parse_test_list(lines: Iterable[str]) -> List[str]:
+    """
+    Parse the output of 'dotnet test --list-tests'.
+
+    Args:
+        lines: The lines of the output.
+
+    Returns:
+        List[str]: The test names without duplicates, in order. Projects with several target
+        frameworks list their tests once per framework.
+    """
+    tests: Dict[str, None] = {}
+    listing = False
+    for line in lines:
+        if line.strip() == _LIST_HEADER:
+            listing = True
+            continue
+        if listing:
+            if line.startswith('    ') and line.strip():
+                tests[line.strip()] = None
+            else:
+                listing = False
+    return list(tests)
+
+
+def get_test_class(name: str) -> Optional[str]:
+    """
+    Get the class of a fully qualified test name such as 'Namespace.Class.Method(x: 1)'.
+
+    Returns:
+        Optional[str]: The fully qualified class name, or None if the name is not qualified,
+        like the display names of some test frameworks.
+    """
+    method = name.split('(', 1)[0].strip()
+    if '.' not in method or ' ' in method:
+        return None
+    return method.rsplit('.', 1)[0]
+
+
+def _get_test_method(name: str) -> str:
+    """
+    Get the fully qualified method of a listed test name, without the arguments of data driven tests.
+    """
+    return name.split('(', 1)[0].strip()
+
+
+def get_class_filter(classes: Iterable[str], tests: Optional[Iterable[str]] = None) -> str:
+    """
+    Get a 'dotnet test --filter' expression selecting the tests of classes.
+
+    Classes are matched by name prefix, which keeps the filter short. The prefix of a class
+    also matches classes that end with its name, such as 'Other.Ns.Foo' for 'Ns.Foo'. When
+    it matches another test of the project, the tests of the class are selected by their exact
+    names instead, so no test runs in two shards.
+
+    Args:
+        classes: The fully qualified classes to select.
+        tests: All listed tests of the project the filter is used for.
+    """
+    def escape(value: str) -> str:
+        return ''.join('\\' + c if c in _FILTER_SPECIAL else c for c in value)
+
+    methods: Dict[str, List[str]] = {}
+    for test in tests or []:
+        method = _get_test_method(test)
+        test_class = get_test_class(test)
+        if test_class is not None and method not in methods.setdefault(test_class, []):
+            methods[test_class].append(method)
+
+    conditions: List[str] = []
+    for c in sorted(classes):
+        prefix = f"{c}."
+        if any(prefix in m for other, others in methods.items() if other != c for m in others):
+            conditions += [f"FullyQualifiedName={escape(m)}" for m in methods[c]]
+        else:
+            conditions.append(f"FullyQualifiedName~{escape(prefix)}")
+    return '|'.join(conditions)
+
+
+def parse_trx_durations(path: str) -> Dict[str, float]:
+    """
+    Sum the durations of the test results of a TRX file per test class.
+
+    Returns:
+        Dict[str, float]: Seconds by fully qualified class name.
+    """
+    import xml.etree.ElementTree as ET
+
+    durations: Dict[str, float] = {}
+    results: Dict[str, float] = {}
+    for _, elem in ET.iterparse(path, events=('end',)):
+        tag = elem.tag.replace(_TRX_NAMESPACE, '')
+        if tag == 'UnitTestResult':
+            h, m, s = (elem.get('duration') or '0:0:0').split(':')
+            test_id = elem.get('testId', '')
+            results[test_id] = results.get(test_id, 0.0) + int(h) * 3600 + int(m) * 60 + float(s)
+            elem.clear()
+        elif tag == 'UnitTest':
+            method = elem.find(f'{_TRX_NAMESPACE}TestMethod')
+            class_name = method.get('className') if method is not None else None
+            if class_name and elem.get('id') in results:
+                # className may be assembly qualified
+                class_name = class_name.split(',', 1)[0].strip()
+                durations[class_name] = durations.get(class_name, 0.0) + results[elem.get('id', '')]
+            elem.clear()
+    return durations
+
+
+class TestCatalog:
+    """
+    Cache of the tests of test assemblies, by content hash of the assembly, stored as JSON.
+    Listing tests needs a dotnet process, so it is only done for assemblies that changed.
+    """
+    def __init__(self, cache_path: str) -> None:
+        self.cache_path = cache_path
+        self._data: Dict[str, Dict] = {'tests': {}, 'hashes': {}}
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data.get('tests'), dict) and isinstance(data.get('hashes'), dict):
+                self._data = data
+        except (OSError, ValueError):
+            pass
+        self._changed = False
+
+    def _hash(self, path: str) -> Optional[str]:
+        """
+        Get the SHA-256 of a file, reusing the previous hash while its timestamp and size are unchanged.
+        """
+        import hashlib
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = [st.st_mtime_ns, st.st_size]
+        cached = self._data['hashes'].get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        self._data['hashes'][path] = [stamp, digest.hexdigest()]
+        self._changed = True
+        return digest.hexdigest()
+
+    def get_tests(self, assembly: Optional[str], list_tests: Callable[[], Optional[List[str]]]) -> Optional[List[str]]:
+        """
+        Get the tests of an assembly, listing them only if the assembly is not in the cache.
+
+        Args:
+            assembly: Path of the test assembly, None if it is unknown, then nothing is cached.
+            list_tests: Function listing the tests, returning None if listing failed.
+
+        Returns:
+            Optional[List[str]]: The test names, or None if they couldn't be listed.
+        """
+        key = self._hash(assembly) if assembly else None
+        if key is not None and key in self._data['tests']:
+            return self._data['tests'][key]
+        tests = list_tests()
+        if tests is not None and key is not None:
+            self._data['tests'][key] = tests
+            self._changed = True
+        return tests
+
+    def save(self) -> None:
+        if not self._changed:
+            return
+        live = {h for _, h in self._data['hashes'].values()}
+        self._data['tests'] = {k: v for k, v in self._data['tests'].items() if k in live}
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f)
+        self._changed = False
+
+
+class TestUnit:
+    """
+    The smallest piece of work assigned to a shard: a test class, or a whole test project
+    when its tests couldn't be grouped by class.
+    """
+    def __init__(self, project: str, name: str, test_class: Optional[str] = None, tests: int = 0) -> None:
+        self.project = project
+        """Path of the test project."""
+        self.name = name
+        """Name of the test project."""
+        self.test_class = test_class
+        self.tests = tests
+        self.weight = 0.0
+        """Estimated duration in seconds, or number of tests when no durations are known."""
+
+    @property
+    def key(self) -> str:
+        """Name the durations of the unit are recorded under."""
+        return f"{self.name}:{self.test_class}" if self.test_class else self.name
+
+    def __repr__(self) -> str:
+        return f"TestUnit({self.key!r}, {self.weight:.2f})"
+
+
+def create_units(project: str, name: str, tests: Optional[List[str]]) -> List[TestUnit]:
+    """
+    Split the tests of a project into one unit per test class.
+
+    Args:
+        project: Path of the test project.
+        name: Name of the test project.
+        tests: The listed tests, None if they are unknown.
+
+    Returns:
+        List[TestUnit]: The units, a single unit for the whole project if any test has no class.
+    """
+    if not tests:
+        return [TestUnit(project, name, None, len(tests or []))]
+    counts: Dict[str, int] = {}
+    for test in tests:
+        test_class = get_test_class(test)
+        if test_class is None:
+            return [TestUnit(project, name, None, len(tests))]
+        counts[test_class] = counts.get(test_class, 0) + 1
+    return [TestUnit(project, name, c, n) for c, n in sorted(counts.items())]
+
+
+def estimate_weights(units: List[TestUnit], durations: Dict[str, float]) -> None:
+    """
+    Set the weight of every unit from historical durations.
+
+    Units with a known duration use it. Others are estimated from the average duration per test
+    of the known units, and whole projects from the classes recorded for them. Without any
+    known duration, the number of tests is used, so shards are balanced by count.
+
+    Args:
+        units: The units to weigh.
+        durations: Historical seconds by unit key.
+    """
+    known = [(u, durations[u.key]) for u in units if u.key in durations]
+    known_tests = sum(u.tests for u, _ in known)
+    per_test = sum(d for _, d in known) / known_tests if known_tests else None
+    for unit in units:
+        if unit.key in durations:
+            unit.weight = durations[unit.key]
+            continue
+        if unit.test_class is None:
+            classes = [d for k, d in durations.items() if k.startswith(unit.name + ':')]
+            if classes:
+                unit.weight = sum(classes)
+                continue
+        if per_test is not None:
+            unit.weight = per_test * max(unit.tests, 1)
+        elif known:
+            unit.weight = sum(d for _, d in known) / len(known)
+        else:
+            unit.weight = float(max(unit.tests, 1))
+
+
+def read_durations(paths: Iterable[str]) -> Dict[str, float]:
+    """
+    Read test durations written by write_durations. Files written by separate shards are
+    combined, and a unit found in several files keeps the duration of the last one.
+
+    Raises:
+        ValueError: If a file can't be read or is not a durations file.
+    """
+    durations: Dict[str, float] = {}
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read the test durations '{path}': {e}") from None
+        if not isinstance(data, dict) or not all(isinstance(v, (int, float)) for v in data.values()):
+            raise ValueError(f"Invalid test durations '{path}', expected seconds by test class.")
+        durations.update({k: float(v) for k, v in data.items()})
+    return durations
+
+
+def write_durations(path: str, durations: Dict[str, float]) -> None:
+    """
+    Write test durations by unit key as JSON, sorted so the file can be committed.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({k: round(durations[k], 3) for k in sorted(durations)}, f, indent=2)
+        f.write('\n')
+
+
+def partition(units: List[TestUnit], count: int) -> List[List[TestUnit]]:
+    """
+    Distribute units over shards so their total weights are as equal as possible, by assigning
+    the heaviest units first, each to the lightest shard.
+
+    The result only depends on the units and their weights. Machines running one shard each
+    only compute the same partition if they weigh the units from the same input, such as
+    test counts or a shared durations file, and not from their own history.
+
+    Returns:
+        List[List[TestUnit]]: The units of every shard.
+    """
+    shards: List[List[TestUnit]] = [[] for _ in range(count)]
+    totals = [0.0] * count
+    for unit in sorted(units, key=lambda u: (-u.weight, u.project, u.test_class or '')):
+        index = min(range(count), key=lambda i: (totals[i], i))
+        shards[index].append(unit)
+        totals[index] += unit.weight
+    return shards
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard argument such as '2/4'.
+
+    Returns:
+        Tuple[int, int]: The 1-based shard index and the number of shards.
+
+    Raises:
+        ValueError: If the value is not a valid shard.
+    """
+    index, sep, count = value.partition('/')
+    try:
+        i, n = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected INDEX/COUNT such as 1/4.") from None
+    if not sep or n < 1 or not 1 <= i <= n:
+        raise ValueError(f"Invalid shard '{value}', expected INDEX/COUNT with 1 <= INDEX <= COUNT.")
+    return i, n
+
+
+class ShardResult:
+    """
+    Outcome of the commands of one shard.
+    """
+    def __init__(self, index: int, status: str, returncode: Optional[int], start: float, end: float, tail: Optional[List[str]] = None) -> None:
+        self.index = index
+        self.status = status
+        self.returncode = returncode
+        self.start = start
+        self.end = end
+        self.tail: List[str] = tail or []
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class ShardRunner:
+    """
+    Runs the commands of every shard, shards in parallel and the commands of a shard one after
+    another. The output is streamed line by line with the shard as prefix.
+    """
+    TAIL_LINES = 20
+    """Number of output lines of each shard kept for the summary of failed shards."""
+
+    def __init__(
+        self,
+        shards: Dict[int, List[List[str]]],
+        count: int,
+        weights: Optional[Dict[int, float]] = None,
+        output: Optional[TextIO] = None,
+    ) -> None:
+        """
+        Args:
+            shards: The command lines of every shard to run, by 1-based shard index.
+            count: The total number of shards, for the prefixes.
+            weights: The estimated duration or test count of every shard, shown in the summary.
+            output: Stream the prefixed output is written to, defaults to stdout.
+        """
+        self.shards = shards
+        self.count = count
+        self.weights: Dict[int, float] = weights or {}
+        self.output = output or sys.stdout
+        self.results: Dict[int, ShardResult] = {}
+        self.elapsed: float = 0.0
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._processes: Dict[int, StreamingProcess] = {}
+
+    def _write(self, index: int, line: str) -> None:
+        with self._lock:
+            self.output.write(f"[shard {index}/{self.count}] {line.rstrip()}\n")
+            self.output.flush()
+
+    def _run_shard(self, index: int) -> ShardResult:
+        start = time.monotonic()
+        returncode: Optional[int] = 0
+        tail: List[str] = []
+        for cmd in self.shards[index]:
+            if self._cancelled:
+                return ShardResult(index, CANCELLED, None, start, time.monotonic())
+            self._write(index, ' '.join(cmd))
+            try:
+                proc = StreamingProcess(cmd, on_line=lambda line: self._write(index, line), tail_lines=self.TAIL_LINES)
+            except OSError as e:
+                self._write(index, f"error: {e}")
+                return ShardResult(index, FAILED, None, start, time.monotonic())
+            with self._lock:
+                self._processes[index] = proc
+                if self._cancelled:
+                    proc.terminate()
+            try:
+                code = proc.wait().returncode
+            finally:
+                with self._lock:
+                    self._processes.pop(index, None)
+            if code != 0:
+                # Keep running the other test projects of the shard, like dotnet test does
+                returncode = code
+                tail = list(proc.tail)
+        if self._cancelled:
+            return ShardResult(index, CANCELLED, None, start, time.monotonic())
+        return ShardResult(index, SUCCEEDED if returncode == 0 else FAILED, returncode, start, time.monotonic(), tail)
+
+    def run(self) -> Dict[int, ShardResult]:
+        """
+        Run all shards.
+
+        Returns:
+            Dict[int, ShardResult]: The result of every shard, by shard index.
+        """
+        import concurrent.futures
+
+        started = time.monotonic()
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.shards)))
+        try:
+            futures = {pool.submit(self._run_shard, i): i for i in sorted(self.shards)}
+            for future in concurrent.futures.as_completed(futures):
+                self.results[futures[future]] = future.result()
+        except BaseException:
+            self.cancel()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            self.elapsed = time.monotonic() - started
+        return self.results
+
+    def cancel(self) -> None:
+        """
+        Stop starting commands and terminate the running processes.
+        """
+        with self._lock:
+            self._cancelled = True
+            for proc in self._processes.values():
+                proc.terminate()
+
+    def print_summary(self) -> None:
+        """
+        Print the status, duration and estimate of every shard and the total time.
+        """
+        print(f"\nShard summary ({len(self.shards)} of {self.count} shards):")
+        for index in sorted(self.results):
+            result = self.results[index]
+            estimate = f"  (estimated {self.weights[index]:.1f})" if index in self.weights else ''
+            print(f"  shard {index}/{self.count}  {result.status:<9} {result.duration:8.1f}s{estimate}")
+        for index in sorted(self.results):
+            result = self.results[index]
+            if result.status == FAILED and result.tail:
+                print(f"\nLast output of shard {index}/{self.count}:")
+                for line in result.tail:
+                    print(f"  {line}")
+        print(f"Total time: {self.elapsed:.1f}s")
+
+    @property
+    def succeeded(self) -> bool:
+        return all(r.status == SUCCEEDED for r in self.results.values())
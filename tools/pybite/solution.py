@@ -0,0 +1,316 @@
+import json
+import os
+import re
+from typing import Optional, Dict, List, Any, Callable, Iterable
+
+from .msbuild import MSBuildEvaluation
+
+SOLUTION_FOLDER_TYPE = '{2150E333-8FDC-42A3-9474-1A3956D46DE8}'
+"""Project type GUID of solution folders, which are not real projects."""
+
+_PROJECT_LINE = re.compile(r'^Project\("(?P<type>[^"]*)"\)\s*=\s*"(?P<name>[^"]*)"\s*,\s*"(?P<path>[^"]*)"\s*,\s*"(?P<guid>[^"]*)"')
+
+
+def _stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def parse_solution(path: str) -> List[Dict[str, str]]:
+    """
+    Parse a .sln file and return its projects, without solution folders.
+
+    Args:
+        path: Path to the solution file.
+
+    Returns:
+        List[Dict[str, str]]: Dicts with the 'name', absolute 'path', 'guid' and 'type' of each project.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    projects: List[Dict[str, str]] = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            m = _PROJECT_LINE.match(line.strip())
+            if not m or m.group('type').upper() == SOLUTION_FOLDER_TYPE:
+                continue
+            projects.append({
+                'name': m.group('name'),
+                'path': os.path.normpath(os.path.join(base, m.group('path').replace('\\', os.sep))),
+                'guid': m.group('guid'),
+                'type': m.group('type'),
+            })
+    return projects
+
+
+class ProjectNode:
+    """
+    A project in the solution graph, with the references found by evaluating it.
+    """
+    def __init__(self, path: str, name: str, data: Optional[Dict[str, Any]] = None) -> None:
+        self.path = path
+        self.name = name
+        self.guid: Optional[str] = None
+        self.in_solution: bool = False
+        self.project_references: List[str] = []
+        self.package_references: Dict[str, Optional[str]] = {}
+        self.target_frameworks: List[str] = []
+        self.assembly_name: Optional[str] = None
+        self.base_output_path: Optional[str] = None
+        self.is_test: bool = False
+        self.dependencies: Dict[str, Any] = {'files': {}, 'globs': {}, 'environment': {}, 'probes': {}}
+        if data:
+            for key, value in data.items():
+                setattr(self, key, value)
+
+    @classmethod
+    def from_evaluation(cls, evaluation: MSBuildEvaluation, name: str) -> "ProjectNode":
+        """
+        Create a node from the in-process evaluation of the project.
+        """
+        node = cls(evaluation.path, name)
+        for item in evaluation.items.get('ProjectReference', []):
+            ref = item.full_path
+            if ref not in node.project_references:
+                node.project_references.append(ref)
+
+        versions = {i.identity.lower(): i.get_metadata('Version') for i in evaluation.items.get('PackageVersion', [])}
+        for item in evaluation.items.get('PackageReference', []):
+            version = item.get_metadata('Version') or item.get_metadata('VersionOverride') or versions.get(item.identity.lower())
+            node.package_references[item.identity] = version or None
+
+        frameworks = evaluation.get_property('TargetFrameworks') or evaluation.get_property('TargetFramework') or ''
+        node.target_frameworks = [f.strip() for f in frameworks.split(';') if f.strip()]
+        node.assembly_name = evaluation.get_property('AssemblyName') or os.path.splitext(os.path.basename(evaluation.path))[0]
+        base_output = (evaluation.get_property('BaseOutputPath') or 'bin').replace('\\', os.sep)
+        node.base_output_path = os.path.normpath(os.path.join(evaluation.project_dir, base_output))
+        node.is_test = (
+            (evaluation.get_property('IsTestProject') or '').lower() == 'true'
+            or any(p.lower() == 'microsoft.net.test.sdk' for p in node.package_references)
+        )
+        node.dependencies = {
+            'files': {p: _stamp(p) for p in evaluation.files},
+            'globs': evaluation.globs,
+            'environment': evaluation.environment,
+            'probes': evaluation.probes,
+        }
+        return node
+
+    def get_output_files(self, configuration: str = 'Debug', extension: str = '.dll') -> List[str]:
+        """
+        Get the paths of the built assembly for every target framework, in the default
+        BaseOutputPath/Configuration/TargetFramework layout.
+        """
+        base = self.base_output_path or os.path.join(os.path.dirname(self.path), 'bin')
+        name = (self.assembly_name or os.path.splitext(os.path.basename(self.path))[0]) + extension
+        return [os.path.join(base, configuration, framework, name) for framework in self.target_frameworks]
+
+    def is_current(self) -> bool:
+        """
+        Check whether the project file, the files it imports, its wildcard imports, the environment
+        variables it read and the paths it checked for existence are unchanged. A path appearing
+        or disappearing can add a nearer Directory.Build.props or flip an Exists() condition.
+        """
+        import glob
+
+        for path, stamp in self.dependencies.get('files', {}).items():
+            if _stamp(path) != stamp:
+                return False
+        for pattern, results in self.dependencies.get('globs', {}).items():
+            if sorted(glob.glob(pattern, recursive=True)) != results:
+                return False
+        for name, value in self.dependencies.get('environment', {}).items():
+            if os.environ.get(name) != value:
+                return False
+        for path, exists in self.dependencies.get('probes', {}).items():
+            if os.path.exists(path) != exists:
+                return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"ProjectNode({self.name!r})"
+
+
+class SolutionGraph:
+    """
+    Dependency graph of the projects of a solution, built from their ProjectReference items.
+
+    The graph is persisted to a JSON file. When loading, only projects whose evaluation
+    inputs changed are evaluated again. Evaluation is pure Python and holds the GIL, so
+    projects are evaluated one after the other.
+    """
+    VERSION = 3
+
+    def __init__(self, solution: str) -> None:
+        self.solution = os.path.abspath(solution)
+        self.projects: Dict[str, ProjectNode] = {}
+        self.reloaded: List[str] = []
+
+    @classmethod
+    def load(
+        cls,
+        solution: str,
+        evaluate: Callable[[str], MSBuildEvaluation],
+        cache_path: Optional[str] = None,
+    ) -> "SolutionGraph":
+        """
+        Load the graph of a solution, reusing the cached nodes that are still current.
+
+        Args:
+            solution: Path to the .sln file.
+            evaluate: Function that evaluates a project file.
+            cache_path: Optional path to the JSON cache file.
+
+        Returns:
+            SolutionGraph: The loaded graph.
+        """
+        graph = cls(solution)
+        cached = graph._read_cache(cache_path)
+
+        sln_stamp = _stamp(graph.solution)
+        if cached.get('stamp') == sln_stamp and 'entries' in cached:
+            entries = cached['entries']
+        else:
+            entries = parse_solution(graph.solution)
+
+        nodes: Dict[str, ProjectNode] = {}
+        for path, data in cached.get('nodes', {}).items():
+            node = ProjectNode(path, data.get('name', ''), data)
+            if node.is_current():
+                nodes[path] = node
+
+        names = {e['path']: e['name'] for e in entries}
+        pending = list(dict.fromkeys(e['path'] for e in entries))
+        visited: set = set()
+        while pending:
+            missing = [p for p in pending if p not in nodes and os.path.isfile(p)]
+            for path in missing:
+                name = names.get(path) or os.path.splitext(os.path.basename(path))[0]
+                node = ProjectNode.from_evaluation(evaluate(path), name)
+                nodes[node.path] = node
+                graph.reloaded.append(node.path)
+            # Follow references, including to projects outside of the solution
+            visited.update(pending)
+            pending = list(dict.fromkeys(
+                r for p in pending if p in nodes for r in nodes[p].project_references if r not in visited
+            ))
+
+        # Keep only the projects reachable from the solution
+        reachable: Dict[str, ProjectNode] = {}
+        stack = [e['path'] for e in entries]
+        while stack:
+            path = stack.pop()
+            if path in reachable or path not in nodes:
+                continue
+            reachable[path] = nodes[path]
+            stack.extend(nodes[path].project_references)
+
+        for e in entries:
+            if e['path'] in reachable:
+                reachable[e['path']].in_solution = True
+                reachable[e['path']].guid = e['guid']
+        graph.projects = reachable
+
+        if cache_path and (graph.reloaded or set(reachable) != set(cached.get('nodes', {})) or cached.get('stamp') != sln_stamp):
+            graph._write_cache(cache_path, sln_stamp, entries)
+        return graph
+
+    def _read_cache(self, cache_path: Optional[str]) -> Dict[str, Any]:
+        if not cache_path:
+            return {}
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != self.VERSION or data.get('solution') != self.solution:
+            return {}
+        return data
+
+    def _write_cache(self, cache_path: str, stamp: Optional[List[int]], entries: List[Dict[str, str]]) -> None:
+        data = {
+            'version': self.VERSION,
+            'solution': self.solution,
+            'stamp': stamp,
+            'entries': entries,
+            'nodes': {path: node.to_dict() for path, node in self.projects.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+
+    def dependencies(self, path: str) -> List[ProjectNode]:
+        """
+        Get the projects the given project references directly.
+        """
+        node = self.projects.get(path)
+        if node is None:
+            return []
+        return [self.projects[r] for r in node.project_references if r in self.projects]
+
+    def dependents(self, path: str) -> List[ProjectNode]:
+        """
+        Get the projects that reference the given project directly.
+        """
+        return [n for n in self.projects.values() if path in n.project_references]
+
+    def get_dependents_closure(self, paths: Iterable[str]) -> List[str]:
+        """
+        Get the given projects and every project that references them, directly or not.
+        """
+        result = [p for p in dict.fromkeys(paths) if p in self.projects]
+        seen = set(result)
+        i = 0
+        while i < len(result):
+            for node in self.dependents(result[i]):
+                if node.path not in seen:
+                    seen.add(node.path)
+                    result.append(node.path)
+            i += 1
+        return result
+
+    def subset(self, paths: Iterable[str]) -> "SolutionGraph":
+        """
+        Get a graph with only the given projects. References to other projects are kept
+        on the nodes but are not followed.
+        """
+        graph = SolutionGraph(self.solution)
+        graph.projects = {p: self.projects[p] for p in paths if p in self.projects}
+        return graph
+
+    def topological_order(self) -> List[ProjectNode]:
+        """
+        Get the projects ordered so that every project comes after the projects it references.
+
+        Raises:
+            ValueError: If the references contain a cycle.
+        """
+        order: List[ProjectNode] = []
+        state: Dict[str, int] = {}
+
+        def _visit(path: str, chain: List[str]) -> None:
+            if state.get(path) == 2:
+                return
+            if state.get(path) == 1:
+                cycle = chain[chain.index(path):] + [path]
+                raise ValueError('Circular project references: ' + ' -> '.join(self.projects[p].name for p in cycle))
+            state[path] = 1
+            for dep in self.projects[path].project_references:
+                if dep in self.projects:
+                    _visit(dep, chain + [path])
+            state[path] = 2
+            order.append(self.projects[path])
+
+        for path in sorted(self.projects, key=lambda p: self.projects[p].name.lower()):
+            _visit(path, [])
+        return order
@@ -0,0 +1,295 @@
+import abc
+import os
+import time
+from typing import Optional, Dict, List, Set, Iterable, Tuple
+
+from .solution import SolutionGraph
+
+IGNORED_DIRS: Set[str] = {'bin', 'obj', '.git', '.vs', '.idea', 'node_modules', 'TestResults', '__pycache__'}
+"""Directory names that are never watched, because builds write to them or they hold no sources."""
+
+IGNORED_SUFFIXES: Tuple[str, ...] = ('~', '.swp', '.swx', '.tmp', '.TMP')
+"""Suffixes of editor temporary files whose changes are ignored."""
+
+# inotify event masks, see inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+            | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+
+OVERFLOW = '*'
+"""Reported instead of paths when events were lost and everything has to be considered changed."""
+
+
+def _is_ignored(name: str) -> bool:
+    return name in IGNORED_DIRS or name.endswith(IGNORED_SUFFIXES) or name.startswith('.#')
+
+
+class FileWatcher(abc.ABC):
+    """
+    Base class of file watchers.
+    Watches directories recursively and files in directories that are watched non-recursively,
+    and reports the paths that changed, debounced so bursts of events are coalesced.
+    """
+    def __init__(self, recursive: Iterable[str], files: Iterable[str] = ()) -> None:
+        """
+        Args:
+            recursive: Directories watched with all their subdirectories.
+            files: Single files to watch, their directories are watched non-recursively.
+        """
+        self.recursive = sorted(set(os.path.abspath(d) for d in recursive if os.path.isdir(d)))
+        self.files = set(os.path.abspath(f) for f in files)
+
+    def _is_relevant(self, path: str) -> bool:
+        if path in self.files:
+            return True
+        return any(path == d or path.startswith(d + os.sep) for d in self.recursive)
+
+    @abc.abstractmethod
+    def _read(self, timeout: Optional[float]) -> Set[str]:
+        """
+        Wait up to timeout seconds, or forever if None, and return the relevant paths that
+        changed, or an empty set if none did.
+        """
+
+    def wait(self, timeout: Optional[float] = None, debounce: float = 0.3) -> Set[str]:
+        """
+        Wait for changes.
+
+        Once a change is seen, changes are collected until none happened for the debounce
+        delay, so saving many files at once results in a single set of changes.
+
+        Args:
+            timeout: Maximum time to wait for the first change, None to wait forever.
+            debounce: Quiet period in seconds that ends a burst of changes.
+
+        Returns:
+            Set[str]: The changed paths, empty on timeout. Contains OVERFLOW if events were lost.
+        """
+        changes = self._read(timeout)
+        while changes:
+            more = self._read(debounce)
+            if not more:
+                break
+            changes |= more
+        return changes
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(FileWatcher):
+    """
+    Watcher that compares the timestamps and sizes of all watched files at an interval.
+    """
+    def __init__(self, recursive: Iterable[str], files: Iterable[str] = (), interval: float = 1.0) -> None:
+        super().__init__(recursive, files)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        paths: List[str] = list(self.files)
+        stack = list(self.recursive)
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if _is_ignored(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            paths.append(entry.path)
+            except OSError:
+                continue
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _read(self, timeout: Optional[float]) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self._scan()
+            changed = {p for p in set(snapshot) | set(self._snapshot) if snapshot.get(p) != self._snapshot.get(p)}
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+class InotifyWatcher(FileWatcher):
+    """
+    Watcher using the Linux inotify API through ctypes, with one watch per directory.
+    New directories are watched as they are created.
+    """
+    def __init__(self, recursive: Iterable[str], files: Iterable[str] = ()) -> None:
+        """
+        Raises:
+            OSError: If inotify is not available or the watch limit is reached.
+        """
+        import ctypes
+        import ctypes.util
+
+        super().__init__(recursive, files)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches: Dict[int, str] = {}
+        try:
+            for d in self.recursive:
+                self._add_tree(d)
+            for d in set(os.path.dirname(f) for f in self.files):
+                self._add(d)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, path: str) -> None:
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _IN_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno == 28:  # ENOSPC, out of watches
+                raise OSError(errno, 'inotify watch limit reached')
+            return
+        self._watches[wd] = path
+
+    def _add_tree(self, root: str) -> None:
+        for current, dirs, _ in os.walk(root):
+            dirs[:] = [d for d in dirs if not _is_ignored(d)]
+            self._add(current)
+
+    def _read(self, timeout: Optional[float]) -> Set[str]:
+        import select
+        import struct
+
+        changes: Set[str] = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changes
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+            if mask & _IN_Q_OVERFLOW:
+                changes.add(OVERFLOW)
+                continue
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            name_str = os.fsdecode(name)
+            if _is_ignored(name_str):
+                continue
+            path = os.path.join(directory, name_str)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and self._is_relevant(path):
+                    self._add_tree(path)
+                    # Files may have been written before the watch was added
+                    for current, dirs, files in os.walk(path):
+                        dirs[:] = [d for d in dirs if not _is_ignored(d)]
+                        changes.update(os.path.join(current, f) for f in files)
+                continue
+            if self._is_relevant(path):
+                changes.add(path)
+        return changes
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(recursive: Iterable[str], files: Iterable[str] = (), poll: bool = False) -> FileWatcher:
+    """
+    Create an inotify watcher where available, otherwise a polling watcher.
+
+    Args:
+        recursive: Directories watched with all their subdirectories.
+        files: Single files to watch.
+        poll: If True, always use a polling watcher.
+
+    Returns:
+        FileWatcher: The watcher.
+    """
+    recursive = list(recursive)
+    files = list(files)
+    if not poll and os.name == 'posix' and os.uname().sysname == 'Linux':
+        try:
+            return InotifyWatcher(recursive, files)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(recursive, files)
+
+
+def get_watched_paths(graph: SolutionGraph, root: str) -> Tuple[List[str], List[str]]:
+    """
+    Get what has to be watched for a solution: the directories of its projects and the files
+    below root they import, such as Directory.Build.props, plus the solution file itself.
+
+    Returns:
+        Tuple[List[str], List[str]]: The recursively watched directories and the single files.
+    """
+    root = os.path.abspath(root)
+    dirs = sorted(set(os.path.dirname(n.path) for n in graph.projects.values()))
+    files: Set[str] = {graph.solution}
+    for node in graph.projects.values():
+        for path in node.dependencies.get('files', {}):
+            if path.startswith(root + os.sep) and not any(path.startswith(d + os.sep) for d in dirs):
+                files.add(path)
+    return dirs, sorted(files)
+
+
+def get_affected_projects(graph: SolutionGraph, changes: Iterable[str]) -> List[str]:
+    """
+    Map changed paths to the projects that have to run again: the projects that import a
+    changed file or contain it in their directory, and every project that references them.
+
+    Args:
+        graph: The project graph.
+        changes: The changed paths, OVERFLOW or the solution file mark every project as affected.
+
+    Returns:
+        List[str]: The paths of the affected projects.
+    """
+    dirs = sorted(((os.path.dirname(n.path), n.path) for n in graph.projects.values()), key=lambda d: len(d[0]), reverse=True)
+    affected: List[str] = []
+    for path in changes:
+        if path == OVERFLOW or path == graph.solution:
+            return list(graph.projects)
+        importers = [n.path for n in graph.projects.values() if path in n.dependencies.get('files', {})]
+        if importers:
+            affected.extend(importers)
+            continue
+        for directory, project in dirs:
+            if path.startswith(directory + os.sep):
+                affected.append(project)
+                break
+    return graph.get_dependents_closure(affected)
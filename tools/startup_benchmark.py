@@ -0,0 +1,118 @@
+"""
+Startup benchmark for the PyBite command line interface.
+
+Runs 'python -X importtime build.py <command>' several times for the no-op '--help' path
+and for a real command that is dispatched and recorded in the command history, and fails
+when a command exits with an error or when the best total import time of a command exceeds
+the configured budget.
+
+Usage:
+    python tools/startup_benchmark.py [--budget-ms 50] [--runs 5] [--top 10] [command ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+DEFAULT_BUDGET_MS = 50.0
+"""Default import time budget in milliseconds, can be overridden with PYBITE_IMPORT_BUDGET_MS."""
+
+DEFAULT_COMMANDS = [['--help'], ['list']]
+"""Commands measured when none is given: the help output and a real command path."""
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CommandFailedError(Exception):
+    """
+    Raised when the measured command exits with a non-zero code, since its import time would not be representative.
+    """
+
+
+def measure(args: List[str], script: Optional[str] = 'build.py') -> List[Tuple[str, int]]:
+    """
+    Run build.py under -X importtime and return the top-level imports with their cumulative time in microseconds.
+
+    Args:
+        args: Arguments passed to build.py.
+        script: The script to run, or None to run an empty program and measure the interpreter startup.
+
+    Raises:
+        CommandFailedError: If build.py exits with a non-zero code.
+    """
+    cmd = [sys.executable, '-X', 'importtime'] + ([os.path.join(ROOT_DIR, script)] if script else ['-c', 'pass']) + args
+    proc = subprocess.run(cmd, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        raise CommandFailedError(f"'build.py {' '.join(args)}' exited with code {proc.returncode}" + ''.join(f"\n  {line}" for line in errors[-10:]))
+    imports: List[Tuple[str, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        # Nested imports are indented and already included in their parent's cumulative time
+        if name.startswith('  ', 1):
+            continue
+        imports.append((name.strip(), int(parts[1])))
+    return imports
+
+
+def benchmark(command: List[str], runs: int, budget_ms: float, top: int) -> bool:
+    """
+    Measure a command and print its fastest total import time and slowest imports.
+    Imports done by the interpreter before build.py runs, such as site and the .pth files of
+    installed packages, depend on the environment and are not counted.
+
+    Returns:
+        bool: True if the import time is within the budget.
+    """
+    # Warm-up run to populate the bytecode cache
+    measure(command)
+    startup = {name for name, _ in measure([], None)}
+    best: List[Tuple[str, int]] = []
+    best_total = -1
+    for _ in range(max(1, runs)):
+        imports = [(name, us) for name, us in measure(command) if name not in startup]
+        total = sum(us for _, us in imports)
+        if best_total < 0 or total < best_total:
+            best, best_total = imports, total
+
+    total_ms = best_total / 1000
+    print(f"build.py {' '.join(command)}: total import time {total_ms:.1f} ms (budget {budget_ms:.1f} ms)")
+    print("Slowest top-level imports:")
+    for name, us in sorted(best, key=lambda i: i[1], reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if total_ms > budget_ms:
+        print(f"Import time budget of 'build.py {' '.join(command)}' exceeded by {total_ms - budget_ms:.1f} ms", file=sys.stderr)
+        return False
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure the import time of the PyBite CLI startup paths')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('PYBITE_IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS)),
+                        help=f'Maximum allowed total import time in milliseconds (default: {DEFAULT_BUDGET_MS})')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs, the fastest one is reported')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    parser.add_argument('command', nargs='*',
+                        help='Arguments passed to build.py, by default "--help" and "list" are measured')
+    args = parser.parse_args()
+
+    ok = True
+    for command in [args.command] if args.command else DEFAULT_COMMANDS:
+        try:
+            ok = benchmark(command, args.runs, args.budget_ms, args.top) and ok
+        except CommandFailedError as e:
+            print(e, file=sys.stderr)
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import hashlib
+import http.server
+import json
+import os
+import re
+import socket
+import threading
+
+import pytest
+
+from pybite import download
+
+SIZE = 256 * 1024
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the data of the server with Range, If-Range and If-None-Match support. Paths
+    starting with /norange ignore Range headers, and paths starting with /ignorerange ignore
+    them while advertising Accept-Ranges. When 'cut' is set, the connection is closed
+    halfway through the next response, or the next range response starting at 'cut_start'.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        srv = self.server
+        srv.log.append({k: self.headers.get(k) for k in ('Range', 'If-Range', 'If-None-Match')})
+        if self.headers.get('If-None-Match') == srv.etag:
+            self.send_response(304)
+            self.send_header('ETag', srv.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        ranges = not self.path.startswith('/norange')
+        start, end, status = 0, len(srv.data) - 1, 200
+        rng = self.headers.get('Range')
+        honoured = ranges and not self.path.startswith('/ignorerange')
+        if honoured and rng and self.headers.get('If-Range') in (None, srv.etag):
+            m = re.match(r'bytes=(\d+)-(\d*)', rng)
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) else len(srv.data) - 1
+            if start >= len(srv.data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(srv.data)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        body = srv.data[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', srv.etag)
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(srv.data)}')
+        self.end_headers()
+        if srv.cut and (srv.cut_start is None or (status == 206 and start == srv.cut_start)):
+            srv.cut = 0
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    srv.data = os.urandom(SIZE)
+    srv.etag = '"v1"'
+    srv.cut = 0
+    srv.cut_start = None
+    srv.log = []
+    srv.url = f'http://127.0.0.1:{srv.server_port}'
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture(params=['requests', 'urllib'], autouse=True)
+def backend(request, monkeypatch):
+    """
+    Run every test with the requests session and with the http.client pool.
+    """
+    if request.param == 'requests':
+        pytest.importorskip('requests')
+    monkeypatch.setattr(download._has_requests_lib, '_result', request.param == 'requests', raising=False)
+    monkeypatch.setattr(download, '_http_pool', None)
+    monkeypatch.setattr(download, 'SEGMENT_MIN_SIZE', 1)
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    yield request.param
+    if download._http_pool is not None:
+        download._http_pool.close()
+
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+
+    result = download.download_file(server.url + '/file', dest, show_progress=False)
+
+    assert _read(dest) == server.data
+    assert result == {'sha256': hashlib.sha256(server.data).hexdigest(), 'etag': '"v1"', 'last_modified': None}
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+
+
+def test_resume(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+    server.cut = 1
+
+    with pytest.raises(Exception):
+        download.download_file(server.url + '/file', dest, show_progress=False)
+    offset = os.path.getsize(dest + '.part')
+    assert 0 < offset < SIZE
+
+    result = download.download_file(server.url + '/file', dest, show_progress=False)
+
+    assert server.log[-1]['Range'] == f'bytes={offset}-'
+    assert server.log[-1]['If-Range'] == '"v1"'
+    assert _read(dest) == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+    assert not os.path.exists(dest + '.part')
+
+
+def test_range_ignored(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+    server.cut = 1
+
+    with pytest.raises(Exception):
+        download.download_file(server.url + '/norange', dest, show_progress=False)
+    result = download.download_file(server.url + '/norange', dest, show_progress=False)
+
+    # The range was requested, but the whole file was sent with 200
+    assert server.log[-1]['Range'] is not None
+    assert _read(dest) == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+
+
+def test_segments_range_ignored(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+
+    result = download.download_file(server.url + '/ignorerange', dest, show_progress=False, segments=4)
+
+    # The first segment got the whole file, then the file was downloaded again in one stream
+    assert len(server.log) <= 6
+    assert server.log[-1]['Range'] is None
+    assert _read(dest) == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+
+
+def test_changed_if_range(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+    server.cut = 1
+
+    with pytest.raises(Exception):
+        download.download_file(server.url + '/file', dest, show_progress=False)
+    server.data = os.urandom(SIZE + 10)
+    server.etag = '"v2"'
+    result = download.download_file(server.url + '/file', dest, show_progress=False)
+
+    assert server.log[-1]['If-Range'] == '"v1"'
+    assert _read(dest) == server.data
+    assert result == {'sha256': hashlib.sha256(server.data).hexdigest(), 'etag': '"v2"', 'last_modified': None}
+
+
+def test_complete_part(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+    download.download_file(server.url + '/file', dest, show_progress=False)
+    # A download interrupted after the last byte was written, before the rename
+    os.replace(dest, dest + '.part')
+    with open(dest + '.part.json', 'w', encoding='utf-8') as f:
+        json.dump({'url': server.url + '/file', 'validator': '"v1"', 'etag': '"v1"'}, f)
+    count = len(server.log)
+
+    result = download.download_file(server.url + '/file', dest, show_progress=False)
+
+    assert server.log[count:] == [{'Range': f'bytes={SIZE}-', 'If-Range': '"v1"', 'If-None-Match': None}]
+    assert _read(dest) == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+
+
+def test_interrupted_segments(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+    segment = SIZE // 4
+    server.cut = 1
+    server.cut_start = segment
+
+    with pytest.raises(Exception):
+        download.download_file(server.url + '/file', dest, show_progress=False, segments=4)
+    with open(dest + '.part.json', 'r', encoding='utf-8') as f:
+        segments = json.load(f)['segments']
+    assert [s[:2] for s in segments] == [[i * segment, (i + 1) * segment - 1] for i in range(4)]
+    # The other segments completed, and the progress of the interrupted one was saved
+    assert [s[2] for s in segments if s is not segments[1]] == [segment] * 3
+    assert segments[1][2] < segment
+    count = len(server.log)
+
+    result = download.download_file(server.url + '/file', dest, show_progress=False, segments=4)
+
+    assert server.log[count:] == [{'Range': f'bytes={segment + segments[1][2]}-{2 * segment - 1}', 'If-Range': '"v1"', 'If-None-Match': None}]
+    assert _read(dest) == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+
+
+def test_not_modified(server, tmp_path):
+    dest = str(tmp_path / 'file.bin')
+
+    result = download.download_file(server.url + '/file', dest, show_progress=False, headers={'If-None-Match': '"v1"'})
+
+    assert result is None
+    assert server.log[-1]['If-None-Match'] == '"v1"'
+    assert os.listdir(tmp_path) == []
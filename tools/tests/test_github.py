@@ -0,0 +1,246 @@
+import http.server
+import json
+import os
+import threading
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+import pytest
+
+from pybite import download
+
+pytest.importorskip('requests')
+
+TOKEN = 'a' * 40
+FILES = {
+    'README.md': b'readme',
+    'build/modules/a/module.json': b'{"name": "a"}',
+    'build/modules/a/a.props': b'<Project />',
+    'build/modules/a/sub dir/file #1.txt': b'one',
+    'build/modules/b/b.props': b'<Project />',
+}
+TREE = [
+    {'path': 'README.md', 'type': 'blob', 'mode': '100644'},
+    {'path': 'build', 'type': 'tree', 'mode': '040000'},
+    {'path': 'build/modules', 'type': 'tree', 'mode': '040000'},
+    {'path': 'build/modules/a', 'type': 'tree', 'mode': '040000'},
+    {'path': 'build/modules/a/module.json', 'type': 'blob', 'mode': '100644'},
+    {'path': 'build/modules/a/a.props', 'type': 'blob', 'mode': '100644'},
+    {'path': 'build/modules/a/link', 'type': 'blob', 'mode': '120000'},
+    {'path': 'build/modules/a/lib', 'type': 'commit', 'mode': '160000'},
+    {'path': 'build/modules/a/sub dir', 'type': 'tree', 'mode': '040000'},
+    {'path': 'build/modules/a/sub dir/file #1.txt', 'type': 'blob', 'mode': '100644'},
+    {'path': 'build/modules/b', 'type': 'tree', 'mode': '040000'},
+    {'path': 'build/modules/b/b.props', 'type': 'blob', 'mode': '100644'},
+]
+
+
+class GitHubHandler(http.server.BaseHTTPRequestHandler):
+    """
+    A private repository 'owner/repo' behind a fake GitHub API under /api and raw file
+    server under /raw. Requests without the token are answered with 404 like GitHub does.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b'', headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        srv = self.server
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        srv.log.append((path, self.headers.get('Authorization')))
+        if self.headers.get('Authorization') != f'token {TOKEN}':
+            self._send(404, b'{"message": "Not Found"}')
+            return
+
+        if path == '/api/repos/owner/repo/git/trees/main':
+            assert parse_qs(url.query) == {'recursive': ['1']}
+            body = {'sha': '0' * 40, 'tree': TREE, 'truncated': srv.truncated}
+            self._send(200, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+        elif path.startswith('/api/repos/owner/repo/contents/'):
+            folder = path[len('/api/repos/owner/repo/contents/'):].strip('/')
+            entries = {}
+            for file_path in FILES:
+                if file_path.startswith(folder + '/'):
+                    name = file_path[len(folder) + 1:].split('/', 1)[0]
+                    full = f'{folder}/{name}'
+                    entries[name] = {
+                        'name': name,
+                        'path': full,
+                        'type': 'file' if full in FILES else 'dir',
+                        'download_url': f'{srv.url}/raw/owner/repo/main/{quote(full)}' if full in FILES else None,
+                    }
+            self._send(200, json.dumps(list(entries.values())).encode(), {'Content-Type': 'application/json'})
+        elif path.startswith('/raw/owner/repo/main/'):
+            path = path[len('/raw/owner/repo/main/'):]
+            if srv.failures.get(path):
+                srv.failures[path] -= 1
+                self._send(503, b'', {'Retry-After': '0'})
+            elif path in FILES:
+                self._send(200, FILES[path])
+            else:
+                self._send(404)
+        else:
+            self._send(404)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), GitHubHandler)
+    srv.url = f'http://127.0.0.1:{srv.server_port}'
+    srv.log = []
+    srv.truncated = False
+    srv.failures = {}
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(download, 'GITHUB_API_URL', srv.url + '/api')
+    monkeypatch.setattr(download, 'GITHUB_RAW_URL', srv.url + '/raw')
+    monkeypatch.setattr(download, 'GITHUB_TOKEN', TOKEN)
+    monkeypatch.setattr(download, '_http_pool', None)
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    yield srv
+    if download._http_pool is not None:
+        download._http_pool.close()
+    srv.shutdown()
+    srv.server_close()
+
+
+def _read_tree(root: str) -> dict:
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+    return files
+
+
+def test_list_tree(server):
+    files = download._list_github_tree('owner', 'repo', 'main', 'build/modules/a')
+
+    # Symbolic links and submodules are skipped
+    assert files == [
+        ('module.json', f'{server.url}/raw/owner/repo/main/build/modules/a/module.json'),
+        ('a.props', f'{server.url}/raw/owner/repo/main/build/modules/a/a.props'),
+        ('sub dir/file #1.txt', f'{server.url}/raw/owner/repo/main/build/modules/a/sub%20dir/file%20%231.txt'),
+    ]
+    assert server.log == [('/api/repos/owner/repo/git/trees/main', f'token {TOKEN}')]
+
+
+def test_list_tree_errors(server):
+    with pytest.raises(ValueError, match='not found'):
+        download._list_github_tree('owner', 'repo', 'main', 'build/missing')
+    # A prefix of a folder name is not the folder
+    with pytest.raises(ValueError, match='not found'):
+        download._list_github_tree('owner', 'repo', 'main', 'build/mod')
+    server.truncated = True
+    assert download._list_github_tree('owner', 'repo', 'main', 'build/modules') is None
+
+
+def test_download_private_repository(server, tmp_path):
+    dest = str(tmp_path / 'modules')
+
+    download._download_github_api('owner', 'repo', 'main', 'build/modules', dest)
+
+    assert _read_tree(dest) == {p[len('build/modules/'):]: c for p, c in FILES.items() if p.startswith('build/modules/')}
+    raw = [auth for path, auth in server.log if path.startswith('/raw/')]
+    assert raw == [f'token {TOKEN}'] * 4
+
+
+def test_download_truncated_tree(server, tmp_path):
+    dest = str(tmp_path / 'modules')
+    server.truncated = True
+
+    download._download_github_api('owner', 'repo', 'main', 'build/modules', dest)
+
+    assert _read_tree(dest) == {p[len('build/modules/'):]: c for p, c in FILES.items() if p.startswith('build/modules/')}
+    assert [p for p, _ in server.log if p.startswith('/api/repos/owner/repo/contents/')] == [
+        '/api/repos/owner/repo/contents/build/modules',
+        '/api/repos/owner/repo/contents/build/modules/a',
+        '/api/repos/owner/repo/contents/build/modules/a/sub dir',
+        '/api/repos/owner/repo/contents/build/modules/b',
+    ]
+
+
+def test_download_retries(server, tmp_path):
+    dest = str(tmp_path / 'modules')
+    server.failures = {'build/modules/b/b.props': 2}
+
+    download._download_github_api('owner', 'repo', 'main', 'build/modules/b', dest)
+
+    assert _read_tree(dest) == {'b.props': FILES['build/modules/b/b.props']}
+    assert [p for p, _ in server.log if p.startswith('/raw/')] == ['/raw/owner/repo/main/build/modules/b/b.props'] * 3
+
+
+def test_missing_file_is_not_retried(server, tmp_path):
+    engine = download.DownloadEngine(show_progress=False, headers={'Authorization': f'token {TOKEN}'})
+
+    failed = engine.download([(f'{server.url}/raw/owner/repo/main/missing', str(tmp_path / 'missing'))])
+
+    assert [url for url, _ in failed] == [f'{server.url}/raw/owner/repo/main/missing']
+    assert engine.retried == 0
+    assert len(server.log) == 1
+
+
+def test_local_error_is_not_retried(server, tmp_path):
+    (tmp_path / 'file').write_bytes(b'')
+    engine = download.DownloadEngine(show_progress=False, headers={'Authorization': f'token {TOKEN}'})
+
+    failed = engine.download([(f'{server.url}/raw/owner/repo/main/README.md', str(tmp_path / 'file' / 'README.md'))])
+
+    assert [type(error) for _, error in failed] == [NotADirectoryError]
+    assert engine.retried == 0
+
+
+@pytest.mark.parametrize('requests_lib', [True, False])
+def test_connection_error_is_retried(server, tmp_path, monkeypatch, requests_lib):
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(download._has_requests_lib, '_result', requests_lib, raising=False)
+    engine = download.DownloadEngine(show_progress=False, retries=2, backoff=0)
+
+    failed = engine.download([(f'http://127.0.0.1:{port}/file', str(tmp_path / 'file'))])
+
+    assert len(failed) == 1
+    assert engine.retried == 2
+
+
+def test_redirect_drops_authorization(server, monkeypatch):
+    class RedirectHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            other.log.append((self.path, self.headers.get('Authorization')))
+            self.send_response(302)
+            self.send_header('Location', f'http://localhost:{server.server_port}/raw/owner/repo/main/README.md')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    other = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RedirectHandler)
+    other.log = []
+    threading.Thread(target=other.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setattr(download._has_requests_lib, '_result', False, raising=False)
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1,localhost')
+    try:
+        with pytest.raises(Exception, match='404'):
+            download._http_get(f'http://127.0.0.1:{other.server_port}/file', {'Authorization': f'token {TOKEN}'})
+    finally:
+        other.shutdown()
+        other.server_close()
+
+    assert other.log == [('/file', f'token {TOKEN}')]
+    assert server.log == [('/raw/owner/repo/main/README.md', None)]
@@ -0,0 +1,91 @@
+import os
+
+from pybite.perf import PerfReport, EVALUATION, PROJECT, TARGET, TASK
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'perf_summary.log')
+LIB = '/src/Lib/Lib.csproj'
+APP = '/src/App/App.csproj'
+
+
+def _find(entries, name):
+    return next(e for e in entries if e.name == name)
+
+
+def test_parse_sections():
+    report = PerfReport.from_file(FIXTURE)
+
+    assert [(e.name, e.time_ms, e.calls) for e in report.evaluations] == [(LIB, 56, 2), (APP, 380, 3)]
+    assert [(e.name, e.time_ms, e.calls) for e in report.projects] == [(LIB, 3507, 8), (APP, 5123, 7)]
+    assert len(report.targets) == 172
+    assert len(report.tasks) == 71
+    assert report.elapsed_ms is None
+
+
+def test_entry_targets_are_not_projects():
+    report = PerfReport.from_file(FIXTURE)
+
+    assert [e.name for e in report.entry_targets if e.project == LIB] == [
+        '_GenerateRestoreProjectPathWalk',
+        '_IsProjectRestoreSupported',
+        '_GenerateRestoreGraphProjectEntry',
+        '_GenerateProjectRestoreGraph',
+        'GetTargetFrameworks',
+        'GetNativeManifest',
+        'GetCopyToOutputDirectoryItems',
+    ]
+    restore = _find(report.entry_targets, 'Restore')
+    assert (restore.kind, restore.project, restore.time_ms, restore.calls) == (TARGET, APP, 806, 1)
+    assert len(report.entry_targets) == 12
+
+
+def test_inclusive_and_exclusive_times():
+    report = PerfReport.from_file(FIXTURE)
+
+    compile_target = _find(report.targets, 'CoreCompile')
+    assert (compile_target.time_ms, compile_target.exclusive_ms, compile_target.calls) == (3432, 3432, 2)
+
+    csc = _find(report.tasks, 'Csc')
+    assert (csc.time_ms, csc.exclusive_ms) == (3428, 3428)
+    msbuild = _find(report.tasks, 'MSBuild')
+    assert (msbuild.time_ms, msbuild.exclusive_ms, msbuild.calls) == (3730, 0, 12)
+    call_target = _find(report.tasks, 'CallTarget')
+    assert (call_target.time_ms, call_target.exclusive_ms) == (17, 0)
+
+    # Without references, projects are only known inclusive
+    assert [(e.time_ms, e.exclusive_ms) for e in report.projects] == [(3507, 3507), (5123, 5123)]
+    report.apply_references({APP: [LIB], LIB: []})
+    assert [(e.time_ms, e.exclusive_ms) for e in report.projects] == [(3507, 3507), (5123, 1616)]
+
+
+def test_slowest():
+    report = PerfReport.from_file(FIXTURE)
+
+    assert [e.name for e in report.slowest(TASK, 2)] == ['MSBuild', 'Csc']
+    assert [e.name for e in report.slowest(TASK, 2, exclusive=True)] == ['Csc', 'RestoreTask']
+    assert [e.name for e in report.slowest(PROJECT, 1)] == [APP]
+    assert [e.name for e in report.slowest(EVALUATION, 1)] == [APP]
+
+
+def test_parse_console_log():
+    lines = [
+        '  Lib -> /src/Lib/bin/Debug/net8.0/Lib.dll',
+        '',
+        'Project Performance Summary:',
+        '      120 ms  /src/Lib/Lib.csproj                1 calls',
+        '                 118 ms  Build                                      1 calls',
+        '',
+        'Task Performance Summary:',
+        '      100 ms  Csc                                        1 calls',
+        '',
+        'Build succeeded.',
+        '    0 Warning(s)',
+        '    0 Error(s)',
+        '',
+        'Time Elapsed 00:01:02.50',
+    ]
+    report = PerfReport.parse(line + '\r\n' for line in lines)
+
+    assert [(e.name, e.time_ms) for e in report.projects] == [(LIB, 120)]
+    assert [(e.name, e.project) for e in report.entry_targets] == [('Build', LIB)]
+    assert [e.name for e in report.tasks] == ['Csc']
+    assert report.elapsed_ms == 62500
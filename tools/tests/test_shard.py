@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+from pybite.shard import create_units, estimate_weights, get_class_filter, partition, read_durations, write_durations
+
+TESTS = [
+    'Ns.Foo.A',
+    'Ns.Foo.B(x: 1)',
+    'Ns.Foo.B(x: 2)',
+    'Other.Ns.Foo.C',
+    'MyNs.Foo.D',
+    'Ns.Bar.E(value: "Ns.Foo.")',
+]
+
+
+def _select(expression, tests):
+    """
+    Evaluate a filter of '|' separated FullyQualifiedName conditions like dotnet test does.
+    """
+    selected = []
+    for test in tests:
+        name = test.split('(', 1)[0]
+        for condition in expression.split('|'):
+            prop, op, value = re.match(r'(\w+)([~=])(.*)', condition).groups()
+            value = re.sub(r'\\(.)', r'\1', value)
+            if (op == '~' and value in name) or (op == '=' and value == name):
+                selected.append(test)
+                break
+    return selected
+
+
+def test_class_filter_without_overlap():
+    assert get_class_filter(['Ns.Bar', 'MyNs.Foo'], TESTS) == 'FullyQualifiedName~MyNs.Foo.|FullyQualifiedName~Ns.Bar.'
+
+
+def test_class_filter_overlap_uses_exact_names():
+    expression = get_class_filter(['Ns.Foo'], TESTS)
+
+    assert expression == 'FullyQualifiedName=Ns.Foo.A|FullyQualifiedName=Ns.Foo.B'
+    assert _select(expression, TESTS) == ['Ns.Foo.A', 'Ns.Foo.B(x: 1)', 'Ns.Foo.B(x: 2)']
+
+
+def test_every_test_runs_in_one_shard():
+    units = create_units('/src/T.csproj', 'T', TESTS)
+    estimate_weights(units, {})
+    for count in (2, 3, 4):
+        selected = []
+        for shard in partition(units, count):
+            if shard:
+                selected += _select(get_class_filter([u.test_class for u in shard], TESTS), TESTS)
+        assert sorted(selected) == sorted(TESTS)
+
+
+def test_partition_is_deterministic_by_count():
+    units = create_units('/src/T.csproj', 'T', TESTS)
+    estimate_weights(units, {})
+    first = [[u.key for u in s] for s in partition(units, 2)]
+
+    units.reverse()
+    estimate_weights(units, {})
+    assert [[u.key for u in s] for s in partition(units, 2)] == first
+
+
+def test_durations_round_trip(tmp_path):
+    write_durations(str(tmp_path / 'shard1.json'), {'T:Ns.Foo': 1.23456, 'T:Ns.Bar': 2})
+    write_durations(str(tmp_path / 'shard2.json'), {'T:MyNs.Foo': 0.5})
+
+    durations = read_durations([str(tmp_path / 'shard1.json'), str(tmp_path / 'shard2.json')])
+    assert durations == {'T:Ns.Foo': 1.235, 'T:Ns.Bar': 2.0, 'T:MyNs.Foo': 0.5}
+
+
+def test_invalid_durations(tmp_path):
+    path = tmp_path / 'durations.json'
+    path.write_text('["T:Ns.Foo"]', encoding='utf-8')
+
+    with pytest.raises(ValueError, match='Invalid test durations'):
+        read_durations([str(path)])
+    with pytest.raises(ValueError, match='Cannot read'):
+        read_durations([str(tmp_path / 'missing.json')])